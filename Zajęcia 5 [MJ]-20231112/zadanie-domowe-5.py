@@ -1,7 +1,17 @@
+import argparse
+import glob
+import hashlib
 import json
+import os
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
 
+CLEAN_SUFFIX = ".czysty.ipynb"
+DEFAULT_MANIFEST = ".czysty-manifest.json"
+CHUNK_SIZE = 1 << 20
+
 
 def clear_output(cell):
     if cell["cell_type"] == "code":
@@ -23,8 +33,8 @@ def clear_code_after_exercise(acc, cell):
     return acc
 
 
-def process_notebook(input_file, output_file):
-    with open(input_file, "r") as file:
+def process_notebook(input_file, output_file, compact=False):
+    with open(input_file, "r", encoding="utf-8") as file:
         data = json.load(file)
 
     # Usuwamy outputy
@@ -37,15 +47,337 @@ def process_notebook(input_file, output_file):
         {"cells": [], "last_was_exercise": False},
     )["cells"]
 
-    with open(output_file, "w") as file:
-        json.dump(data, file, indent=4)
+    with open(output_file, "w", encoding="utf-8") as file:
+        if compact:
+            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(data, file, indent=4)
 
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Użycie: python script.py plik_wejściowy.ipynb")
+class JsonStream:
+    """Czytnik JSON-a z pliku porcjami, wartość po wartości.
+
+    W pamięci jest tylko nieprzeczytana część bieżącej porcji, a wartości
+    pomijane przez skip_value są przewijane bez dekodowania.
+    """
+
+    _WHITESPACE = re.compile(r"\s*")
+    _STRUCTURE = re.compile(r'["\[\]{}]')
+    _DECODER = json.JSONDecoder()
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def _fill(self, size=CHUNK_SIZE):
+        chunk = self.file.read(size)
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        self.eof = not chunk
+        return bool(chunk)
+
+    def peek(self):
+        while True:
+            self.position = self._WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill():
+                raise ValueError("Niespodziewany koniec pliku JSON")
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Oczekiwano {char!r} w pliku JSON")
+        self.position += 1
+
+    def next_item(self, closing):
+        # Przechodzi przez przecinek; False, gdy zamyka się obiekt lub lista
+        char = self.peek()
+        if char == closing:
+            self.position += 1
+            return False
+        if char == ",":
+            self.position += 1
+        return True
+
+    def read_value(self):
+        while True:
+            self.peek()
+            try:
+                value, end = self._DECODER.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # Wartość dłuższa niż bufor: bufor rośnie dwukrotnie, żeby
+                # długiej wartości nie dekodować od nowa po każdej porcji
+                if not self._fill(max(CHUNK_SIZE, len(self.buffer) - self.position)):
+                    raise
+                continue
+            # Liczba na końcu porcji mogła zostać ucięta
+            if end < len(self.buffer) or self.eof:
+                self.position = end
+                return value
+            self._fill()
+
+    def read_key(self):
+        key = self.read_value()
+        self.expect(":")
+        return key
+
+    def skip_value(self):
+        depth = 0
+        while True:
+            char = self.peek()
+            if char == '"':
+                self._skip_string()
+            elif char in "[{":
+                depth += 1
+                self.position += 1
+            elif char in "]}":
+                depth -= 1
+                self.position += 1
+            else:
+                self.read_value()  # liczba, true, false lub null
+            if depth == 0:
+                return
+            while True:
+                found = self._STRUCTURE.search(self.buffer, self.position)
+                if found:
+                    self.position = found.start()
+                    break
+                self.position = len(self.buffer)
+                if not self._fill():
+                    raise ValueError("Niespodziewany koniec pliku JSON")
+
+    def _skip_string(self):
+        # str.find jest dużo szybsze od wyrażenia regularnego na długich
+        # napisach, np. obrazkach w base64
+        self.position += 1
+        while True:
+            quote = self.buffer.find('"', self.position)
+            end = quote if quote != -1 else len(self.buffer)
+            backslash = self.buffer.find("\\", self.position, end)
+            if backslash != -1 and backslash + 1 < len(self.buffer):
+                self.position = backslash + 2
+            elif backslash == -1 and quote != -1:
+                self.position = quote + 1
+                return
+            else:
+                # Brak końca napisu albo znak ucieczki na końcu porcji
+                self.position = backslash if backslash != -1 else len(self.buffer)
+                if not self._fill():
+                    raise ValueError("Niespodziewany koniec pliku JSON")
+
+
+def _read_cell(stream):
+    # Komórka bez materializowania outputów kodu, z kluczami w tej samej
+    # kolejności, jak w pliku
+    cell = {}
+    stream.expect("{")
+    while stream.next_item("}"):
+        key = stream.read_key()
+        if key == "outputs" and cell.get("cell_type") == "code":
+            stream.skip_value()
+            cell[key] = []
+        else:
+            cell[key] = stream.read_value()
+    return clear_output(cell)
+
+
+def process_notebook_streaming(input_file, output_file, compact=False):
+    """Jak process_notebook, ale czyta i zapisuje notatnik komórka po komórce.
+
+    Outputy komórek kodu są przewijane bez dekodowania, więc zużycie
+    pamięci zależy od największej komórki bez outputów, a nie od rozmiaru
+    pliku. Wynik jest taki sam jak z process_notebook.
+    """
+    # Te same separatory i wcięcia, co json.dump w process_notebook
+    if compact:
+        options = {"ensure_ascii": False, "separators": (",", ":")}
+    else:
+        options = {"indent": 4}
+    key_separator = ":" if compact else ": "
+
+    def dumps(value, level):
+        text = json.dumps(value, **options)
+        return text if compact else text.replace("\n", "\n" + "    " * level)
+
+    def newline(level):
+        return "" if compact else "\n" + "    " * level
+
+    with open(input_file, "r", encoding="utf-8") as source, open(
+        output_file, "w", encoding="utf-8"
+    ) as target:
+        stream = JsonStream(source)
+        stream.expect("{")
+        target.write("{")
+        first_key = True
+        while stream.next_item("}"):
+            key = stream.read_key()
+            target.write(("" if first_key else ",") + newline(1))
+            target.write(json.dumps(key, **options) + key_separator)
+            first_key = False
+            if key != "cells":
+                target.write(dumps(stream.read_value(), 1))
+                continue
+
+            acc = {"cells": [], "last_was_exercise": False}
+            stream.expect("[")
+            target.write("[")
+            first_cell = True
+            while stream.next_item("]"):
+                cell = clear_code_after_exercise(acc, _read_cell(stream))["cells"].pop()
+                target.write(("" if first_cell else ",") + newline(2))
+                target.write(dumps(cell, 2))
+                first_cell = False
+            target.write("]" if first_cell else newline(1) + "]")
+        target.write("}" if first_key else newline(0) + "}")
+
+
+def output_name(input_file):
+    return input_file.rsplit(".", 1)[0] + CLEAN_SUFFIX
+
+
+def find_notebooks(paths):
+    # Katalogi są przeszukiwane rekurencyjnie, wzorce rozwijane przez glob;
+    # wyniki wcześniejszego czyszczenia są pomijane.
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, "**", "*.ipynb"), recursive=True)
+        else:
+            matches = glob.glob(path, recursive=True) or [path]
+        found.update(
+            os.path.normpath(match)
+            for match in matches
+            if match.endswith(".ipynb") and not match.endswith(CLEAN_SUFFIX)
+        )
+    return sorted(found)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_file):
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, manifest_file):
+    # Zapis przez plik tymczasowy, żeby przerwany zapis nie psuł manifestu
+    temporary_file = manifest_file + ".tmp"
+    with open(temporary_file, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(temporary_file, manifest_file)
+
+
+def _clean(input_file, streaming=False):
+    # Błąd jednego notatnika nie może przerwać całej partii, więc wraca jako
+    # opis zamiast wyjątku (z procesu roboczego przerwałby pool.map).
+    process = process_notebook_streaming if streaming else process_notebook
+    try:
+        process(input_file, output_name(input_file), compact=True)
+    except Exception as error:
+        return input_file, f"{type(error).__name__}: {error}"
+    return input_file, None
+
+
+def process_notebooks(
+    paths, manifest_file=DEFAULT_MANIFEST, workers=None, streaming=False
+):
+    """Czyści wszystkie notatniki z podanych ścieżek w puli procesów.
+
+    Notatnik jest pomijany, jeśli jego wynik istnieje, a czas modyfikacji
+    zgadza się z manifestem albo, gdy czas się zmienił, zgadza się skrót
+    SHA-256 treści. Zwraca listy wyczyszczonych i pominiętych plików oraz
+    listę par (plik, opis błędu) dla notatników, których nie udało się
+    przeczytać ani wyczyścić; manifest jest zapisywany dla pozostałych.
+    """
+    manifest = load_manifest(manifest_file)
+    to_clean, skipped, failed = {}, [], []
+    for input_file in find_notebooks(paths):
+        entry = manifest.get(input_file, {})
+        try:
+            mtime = os.stat(input_file).st_mtime_ns
+            if not os.path.exists(output_name(input_file)):
+                to_clean[input_file] = {
+                    "mtime": mtime,
+                    "sha256": file_hash(input_file),
+                }
+            elif entry.get("mtime") == mtime:
+                skipped.append(input_file)
+            else:
+                digest = file_hash(input_file)
+                if entry.get("sha256") == digest:
+                    manifest[input_file] = {"mtime": mtime, "sha256": digest}
+                    skipped.append(input_file)
+                else:
+                    to_clean[input_file] = {"mtime": mtime, "sha256": digest}
+        except OSError as error:
+            failed.append((input_file, f"{type(error).__name__}: {error}"))
+
+    if len(to_clean) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_clean, to_clean, [streaming] * len(to_clean)))
+    else:
+        results = [_clean(input_file, streaming) for input_file in to_clean]
+    cleaned = []
+    for input_file, error in results:
+        if error is None:
+            cleaned.append(input_file)
+            manifest[input_file] = to_clean[input_file]
+        else:
+            failed.append((input_file, error))
+    save_manifest(manifest, manifest_file)
+    return cleaned, skipped, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Usuwa outputy i rozwiązania ćwiczeń z notatników"
+    )
+    parser.add_argument("paths", nargs="+", help="pliki, katalogi lub wzorce glob")
+    parser.add_argument(
+        "--wsadowo",
+        action="store_true",
+        help="czyść wiele notatników naraz, pomijając niezmienione",
+    )
+    parser.add_argument(
+        "--strumieniowo",
+        action="store_true",
+        help="czytaj notatniki komórka po komórce, bez wczytywania outputów",
+    )
+    parser.add_argument("--procesy", type=int, default=None)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    if not args.wsadowo:
+        if len(args.paths) != 1:
+            print("Użycie: python script.py plik_wejściowy.ipynb")
+            sys.exit(1)
+        process = process_notebook_streaming if args.strumieniowo else process_notebook
+        process(args.paths[0], output_name(args.paths[0]))
+        return
+
+    cleaned, skipped, failed = process_notebooks(
+        args.paths, args.manifest, args.procesy, args.strumieniowo
+    )
+    for input_file, error in failed:
+        print(f"Błąd: {input_file}: {error}", file=sys.stderr)
+    print(
+        f"Wyczyszczono: {len(cleaned)}, pominięto bez zmian: {len(skipped)},"
+        f" błędy: {len(failed)}"
+    )
+    if failed:
         sys.exit(1)
 
-    input_filename = sys.argv[1]
-    output_filename = input_filename.rsplit(".", 1)[0] + ".czysty.ipynb"
-    process_notebook(input_filename, output_filename)
+
+if __name__ == "__main__":
+    main()
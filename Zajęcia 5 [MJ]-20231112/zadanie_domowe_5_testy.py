@@ -0,0 +1,134 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+# Nazwa pliku z zadaniem ma myślniki, więc nie da się go zaimportować wprost
+_spec = importlib.util.spec_from_file_location(
+    "zadanie_domowe_5",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "zadanie-domowe-5.py"),
+)
+zadanie = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(zadanie)
+
+
+def notatnik(obrazek="iVBORw0KGgo="):
+    return {
+        "cells": [
+            {
+                "cell_type": "markdown",
+                "attachments": {"a.png": {"image/png": obrazek}},
+                "metadata": {},
+                "source": ["# Ćwiczenie 1\n", 'Napis z "cudzysłowem", \\ i \\u0105'],
+            },
+            {
+                "cell_type": "code",
+                "execution_count": 3,
+                "metadata": {"tags": []},
+                "outputs": [
+                    {"output_type": "stream", "text": ['wynik "1" \\\n', "ą"]},
+                    {"data": {"image/png": obrazek}, "output_type": "display_data"},
+                ],
+                "source": ["print(1)"],
+            },
+            {
+                "cell_type": "code",
+                "execution_count": None,
+                "metadata": {},
+                "outputs": [],
+                "source": ["x = [1.5e-3, True, None]"],
+            },
+        ],
+        "metadata": {"kernelspec": {"name": "python3"}},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+
+
+def zapisz(sciezka, dane, **opcje):
+    with open(sciezka, "w", encoding="utf-8") as plik:
+        json.dump(dane, plik, **opcje)
+
+
+# Test zgodności wersji strumieniowej z wczytującą cały plik
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("rozmiar_porcji", [1, 7, 1 << 20])
+def test_strumieniowo_tak_samo(tmp_path, monkeypatch, compact, rozmiar_porcji):
+    monkeypatch.setattr(zadanie, "CHUNK_SIZE", rozmiar_porcji)
+    wejscie = tmp_path / "notatnik.ipynb"
+    zapisz(wejscie, notatnik(), indent=1, ensure_ascii=False)
+
+    zadanie.process_notebook(wejscie, tmp_path / "caly.ipynb", compact)
+    zadanie.process_notebook_streaming(wejscie, tmp_path / "strumien.ipynb", compact)
+
+    caly = (tmp_path / "caly.ipynb").read_bytes()
+    assert (tmp_path / "strumien.ipynb").read_bytes() == caly
+    komorki = json.loads(caly)["cells"]
+    assert komorki[1]["outputs"] == [] and komorki[1]["source"] == []
+    assert komorki[2]["source"] == ["x = [1.5e-3, True, None]"]
+
+
+def test_strumieniowo_duze_zalaczniki(tmp_path, monkeypatch):
+    monkeypatch.setattr(zadanie, "CHUNK_SIZE", 1 << 10)
+    wejscie = tmp_path / "notatnik.ipynb"
+    zapisz(wejscie, notatnik(obrazek="A" * (1 << 20)), separators=(",", ":"))
+
+    zadanie.process_notebook(wejscie, tmp_path / "caly.ipynb", compact=True)
+    zadanie.process_notebook_streaming(wejscie, tmp_path / "strumien.ipynb", True)
+
+    assert (tmp_path / "strumien.ipynb").read_bytes() == (
+        tmp_path / "caly.ipynb"
+    ).read_bytes()
+
+
+# Test trybu wsadowego z manifestem
+def test_wsadowo_pomija_niezmienione(tmp_path):
+    katalog = tmp_path / "notatniki"
+    katalog.mkdir()
+    pierwszy, drugi = katalog / "a.ipynb", katalog / "b.ipynb"
+    zapisz(pierwszy, notatnik())
+    zapisz(drugi, notatnik())
+    manifest = str(tmp_path / "manifest.json")
+
+    wyczyszczone, pominiete, bledy = zadanie.process_notebooks(
+        [str(katalog)], manifest, workers=1
+    )
+    assert len(wyczyszczone) == 2 and pominiete == [] and bledy == []
+    assert os.path.exists(zadanie.output_name(str(pierwszy)))
+
+    # Dotknięty, ale niezmieniony plik jest pomijany po skrócie treści
+    os.utime(pierwszy, ns=(0, 0))
+    zapisz(drugi, {**notatnik(), "nbformat_minor": 4})
+    os.utime(drugi, ns=(1, 1))
+    wyczyszczone, pominiete, bledy = zadanie.process_notebooks(
+        [str(katalog)], manifest, workers=1, streaming=True
+    )
+    assert wyczyszczone == [os.path.normpath(drugi)]
+    assert pominiete == [os.path.normpath(pierwszy)]
+
+    wyczyszczone, pominiete, bledy = zadanie.process_notebooks(
+        [str(katalog)], manifest, workers=1
+    )
+    assert wyczyszczone == [] and len(pominiete) == 2
+
+
+def test_wsadowo_bledny_notatnik_nie_przerywa_partii(tmp_path):
+    katalog = tmp_path / "notatniki"
+    katalog.mkdir()
+    dobry, zly = katalog / "a.ipynb", katalog / "b.ipynb"
+    zapisz(dobry, notatnik())
+    zly.write_text('{"cells": [', encoding="utf-8")
+    brakujacy = str(tmp_path / "brak.ipynb")
+    manifest = str(tmp_path / "manifest.json")
+
+    wyczyszczone, pominiete, bledy = zadanie.process_notebooks(
+        [str(katalog), brakujacy], manifest, workers=1
+    )
+    assert wyczyszczone == [os.path.normpath(dobry)] and pominiete == []
+    assert [plik for plik, _ in bledy] == [
+        os.path.normpath(brakujacy),
+        os.path.normpath(zly),
+    ]
+    assert "FileNotFoundError" in bledy[0][1]
+    assert list(zadanie.load_manifest(manifest)) == [os.path.normpath(dobry)]
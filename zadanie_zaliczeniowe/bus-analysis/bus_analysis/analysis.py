@@ -0,0 +1,584 @@
+"""Computations behind the bus analysis assets.
+
+Imported by the asset functions on first use, so loading the code location
+does not pay for pandas, numpy, scikit-learn and folium.
+"""
+
+import datetime
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import numpy as np
+import folium
+from dagster import get_dagster_logger, AssetExecutionContext
+from sklearn.metrics.pairwise import haversine_distances
+from .utils import metadata
+from .utils.cube import MetricCube
+from .utils.export import export_punctuality
+from .utils.geo_utils import haversine
+from .utils.headways import (
+    compute_headways,
+    headways_per_line_hour,
+    scheduled_departures,
+)
+from .utils.hll import HyperLogLogSet
+from .utils.quality import clean_positions
+from .utils.route_shapes import RouteShapes, route_speeds
+from .utils.stop_events import detect_stop_arrivals, line_stops
+from .utils.trajectory_store import TrajectoryStore
+from .utils.travel_times import (
+    save_travel_time_matrix,
+    segment_traversals,
+    stop_sequences,
+    travel_time_matrix,
+)
+
+log = get_dagster_logger()
+
+TRAJECTORY_STORE_PATH = "../data/trajectories"
+TRAVEL_TIME_MATRIX_PATH = "../data/travel_time_matrix"
+METRIC_CUBE_PATH = "../data/metric_cube"
+VEHICLE_SKETCHES_PATH = "../data/vehicle_sketches"
+PUNCTUALITY_EXPORT_PATH = "../data/punctuality"
+ARRIVAL_PUNCTUALITY_EXPORT_PATH = "../data/arrival_punctuality"
+
+
+def clean_buses_data(context: AssetExecutionContext, fetch_buses_data: pd.DataFrame):
+    """Drops stale, out-of-area, duplicate and teleporting fixes before analysis."""
+    cleaned, dropped = clean_positions(fetch_buses_data)
+    context.add_output_metadata(
+        {
+            "Rows in": len(fetch_buses_data),
+            "Rows out": len(cleaned),
+            **{f"Dropped ({rule})": count for rule, count in dropped.items()},
+        }
+    )
+    return cleaned
+
+
+def bus_trajectory_store(
+    context: AssetExecutionContext, clean_buses_data: pd.DataFrame
+) -> str:
+    """Packs bus fixes into a memory-mappable per-vehicle trajectory store."""
+    store = TrajectoryStore.from_frame(clean_buses_data)
+    store.save(TRAJECTORY_STORE_PATH)
+    context.add_output_metadata(
+        {
+            "Vehicles": len(store),
+            "Fixes": store.n_fixes,
+            "Size (bytes)": store.nbytes,
+            "Source frame size (bytes)": int(
+                clean_buses_data.memory_usage(deep=True).sum()
+            ),
+        }
+    )
+    return TRAJECTORY_STORE_PATH
+
+
+def analyze_speed_violation_by_location(
+    context: AssetExecutionContext,
+    analyze_bus_speed: pd.DataFrame,
+    buses_with_nearest_stops: pd.DataFrame,
+    fetch_stops_data: pd.DataFrame,
+    exact_counts: bool = False,
+):
+    """Analyzes speed violation by location and creates a map of significant violations."""
+    fetch_stops_data["szer_geo"] = pd.to_numeric(
+        fetch_stops_data["szer_geo"], errors="coerce"
+    )
+    fetch_stops_data["dlug_geo"] = pd.to_numeric(
+        fetch_stops_data["dlug_geo"], errors="coerce"
+    )
+    avg_coords_per_stop = (
+        fetch_stops_data.groupby("zespol")[["szer_geo", "dlug_geo"]]
+        .mean()
+        .reset_index()
+    )
+    too_fast_buses_with_stops = pd.merge(
+        analyze_bus_speed,
+        buses_with_nearest_stops[["VehicleNumber", "Time", "nearest_stop"]],
+        on=["VehicleNumber", "Time"],
+        how="left",
+    )
+    violations_per_location = too_fast_buses_with_stops.groupby("nearest_stop").size()
+    stop_sketches = save_capture_sketches(
+        buses_with_nearest_stops, too_fast_buses_with_stops
+    )
+    if exact_counts:
+        total_measurements = buses_with_nearest_stops.groupby("nearest_stop")[
+            "VehicleNumber"
+        ].nunique()
+    else:
+        total_measurements = (
+            stop_sketches.estimate().round().rename_axis("nearest_stop")
+        )
+    violation_summary = pd.DataFrame(
+        {
+            "Total Violations": violations_per_location,
+            "Total Measurements": total_measurements,
+        }
+    ).fillna(0)
+    violation_summary["Percentage"] = (
+        100
+        * violation_summary["Total Violations"]
+        / violation_summary["Total Measurements"]
+    )
+    significant_violations = violation_summary[
+        violation_summary["Percentage"] >= 20
+    ].reset_index()
+    significant_violations = significant_violations.merge(
+        avg_coords_per_stop, left_on="nearest_stop", right_on="zespol"
+    )
+    m = folium.Map(location=[52.2296756, 21.0122287], zoom_start=10)
+    for _, row in significant_violations.iterrows():
+        folium.Marker(
+            location=[row["szer_geo"], row["dlug_geo"]],
+            popup=f"""
+            Stop ID: {row['nearest_stop']}
+            \nViolations: {row['Total Violations']}
+            \nMeasurements: {row['Total Measurements']}
+            \nPercentage: {row['Percentage']}%",
+            """,
+            icon=folium.Icon(color="red", icon="info-sign"),
+        ).add_to(m)
+    m.save("../maps/significant_violations_map.html")
+    context.add_output_metadata(
+        {
+            "Significant violations": metadata.preview(
+                significant_violations, rows=20, sort_by="Total Violations"
+            ),
+            "Significant stops": len(significant_violations),
+            "All the violations": metadata.preview(
+                violation_summary.reset_index(), rows=20, sort_by="Total Violations"
+            ),
+            "Violation summary": metadata.summary(violation_summary),
+            "Violation percentage per stop": metadata.histogram(
+                violation_summary["Percentage"], value_range=(0, 100)
+            ),
+        }
+    )
+    return significant_violations
+
+
+def save_capture_sketches(
+    buses_df: pd.DataFrame, too_fast_df: pd.DataFrame
+) -> HyperLogLogSet:
+    """Stores per-stop and per-line vehicle sketches and violator sketches of a capture.
+
+    Every capture gets its own directory named after its last fix, so
+    re-materializing the same capture overwrites it instead of double counting.
+    A capture without a single valid timestamp cannot be named and is not stored.
+    """
+    last_fix = pd.to_datetime(
+        buses_df["Time"], format="%Y-%m-%d %H:%M:%S", errors="coerce"
+    ).max()
+    stop_sketches = HyperLogLogSet.from_frame(buses_df, "nearest_stop", "VehicleNumber")
+    if pd.isna(last_fix):
+        log.warning("No valid timestamps in the capture, sketches not stored")
+        return stop_sketches
+    path = os.path.join(VEHICLE_SKETCHES_PATH, last_fix.strftime("%Y%m%dT%H%M%S"))
+    stop_sketches.save(os.path.join(path, "stops"))
+    HyperLogLogSet.from_frame(buses_df, "Lines", "VehicleNumber").save(
+        os.path.join(path, "lines")
+    )
+    HyperLogLogSet.from_frame(too_fast_df, "nearest_stop", "VehicleNumber").save(
+        os.path.join(path, "violators")
+    )
+    return stop_sketches
+
+
+def merged_violation_summary(sketches_path: str = VEHICLE_SKETCHES_PATH):
+    """Combines stored captures into the share of speeding vehicles per stop.
+
+    Both counts are distinct vehicles over all the captures, so the
+    percentage stays between 0 and 100 however many captures are merged.
+    """
+    vehicles, violators = HyperLogLogSet(), HyperLogLogSet()
+    for capture in sorted(os.listdir(sketches_path)):
+        path = os.path.join(sketches_path, capture)
+        vehicles = vehicles.merge(HyperLogLogSet.load(os.path.join(path, "stops")))
+        violators = violators.merge(
+            HyperLogLogSet.load(os.path.join(path, "violators"))
+        )
+    summary = (
+        pd.DataFrame(
+            {
+                "Violating Vehicles": violators.estimate().round(),
+                "Vehicles": vehicles.estimate().round(),
+            }
+        )
+        .fillna(0)
+        .rename_axis("nearest_stop")
+    )
+    # Sketch errors could put a few more violators than vehicles at a stop
+    summary["Percentage"] = (
+        100 * summary["Violating Vehicles"] / summary["Vehicles"]
+    ).clip(upper=100)
+    return summary
+
+
+def analyze_bus_speed(context: AssetExecutionContext, clean_buses_data: pd.DataFrame):
+    """Analyzes bus speeds, identifying buses moving too fast."""
+    buses_data = clean_buses_data.sort_values(by=["VehicleNumber", "Time"])
+    speeds = [np.nan]
+    for i in range(1, len(buses_data)):
+        if (
+            buses_data.iloc[i]["VehicleNumber"]
+            == buses_data.iloc[i - 1]["VehicleNumber"]
+        ):
+            try:
+                dist = haversine(
+                    buses_data.iloc[i - 1]["Lon"],
+                    buses_data.iloc[i - 1]["Lat"],
+                    buses_data.iloc[i]["Lon"],
+                    buses_data.iloc[i]["Lat"],
+                )
+                time_diff = (
+                    pd.to_datetime(buses_data.iloc[i]["Time"])
+                    - pd.to_datetime(buses_data.iloc[i - 1]["Time"])
+                ).total_seconds() / 3600
+                speed = dist / time_diff if time_diff > 0 else 0
+                speeds.append(speed)
+            except Exception as e:
+                log.info(f"Error calculating speed: {e}")
+                speeds.append(np.nan)
+        else:
+            speeds.append(np.nan)
+    speeds = [speed if speed < 100 else np.nan for speed in speeds]
+    buses_data["Speed"] = speeds
+    too_fast_buses = buses_data[
+        (buses_data["Speed"] > 50)
+    ]
+    help_df = buses_data[(buses_data["Speed"] > 3)]
+    average_bus_speed = float(help_df["Speed"].mean())
+    context.add_output_metadata(
+        {
+            "Too fast buses": metadata.preview(too_fast_buses, sort_by="Speed"),
+            "All the buses": metadata.preview(buses_data),
+            "Speed histogram": metadata.histogram(
+                buses_data["Speed"], value_range=(0, 100)
+            ),
+            "Average bus speed (not standing)": average_bus_speed,
+        }
+    )
+    return too_fast_buses
+
+
+def find_nearest_stop(stops_df: pd.DataFrame, buses_data: pd.DataFrame) -> pd.DataFrame:
+    """Finds the nearest stop for each bus."""
+    stops_df["lat_rad"], stops_df["lon_rad"] = np.radians(
+        pd.to_numeric(stops_df["szer_geo"], errors="coerce")
+    ), np.radians(pd.to_numeric(stops_df["dlug_geo"], errors="coerce"))
+    buses_data["lat_rad"], buses_data["lon_rad"] = np.radians(
+        pd.to_numeric(buses_data["Lat"], errors="coerce")
+    ), np.radians(pd.to_numeric(buses_data["Lon"], errors="coerce"))
+    buses_data["nearest_stop"] = np.full(len(buses_data), np.nan, dtype=object)
+    buses_data["nearest_stop_number"] = np.full(len(buses_data), np.nan, dtype=object)
+    buses_data["distance_to_stop"] = np.nan
+    buses_data["is_at_stop"] = False
+    for line, group in stops_df.groupby("route"):
+        line_buses = buses_data[
+            (buses_data["Lines"] == line)
+            & buses_data["lat_rad"].notna()
+            & buses_data["lon_rad"].notna()
+        ]
+        if (
+            line_buses.empty
+            or group.empty
+            or group["lat_rad"].isna().all()
+            or group["lon_rad"].isna().all()
+        ):
+            continue
+        # Parked and waiting vehicles report the same position poll after
+        # poll, so every distinct position is searched once and the result
+        # is broadcast back to all fixes sharing it.
+        positions, inverse = np.unique(
+            line_buses[["lat_rad", "lon_rad"]].to_numpy(),
+            axis=0,
+            return_inverse=True,
+        )
+        inverse = inverse.reshape(-1)
+        stop_coords = group[["lat_rad", "lon_rad"]].dropna().to_numpy()
+        distances = (
+            haversine_distances(positions, stop_coords) * 6371000
+        )  # Earth radius in meters
+        nearest_stop_idx = distances.argmin(axis=1)
+        nearest_distance = distances[np.arange(len(positions)), nearest_stop_idx]
+        nearest_stop_idx = nearest_stop_idx[inverse]
+        nearest_distance = nearest_distance[inverse]
+        buses_data.loc[line_buses.index, "nearest_stop"] = group[
+            "nr_zespolu"
+        ].to_numpy()[nearest_stop_idx]
+        buses_data.loc[line_buses.index, "nearest_stop_number"] = group[
+            "nr_przystanku"
+        ].to_numpy()[nearest_stop_idx]
+        buses_data.loc[line_buses.index, "distance_to_stop"] = nearest_distance
+        buses_data.loc[line_buses.index, "is_at_stop"] = (
+            nearest_distance <= 15
+        )  # 15 meters threshold for being at a stop
+    return buses_data
+
+
+def buses_with_nearest_stops(
+    context: AssetExecutionContext,
+    clean_buses_data,
+    fetch_stops_data,
+    fetch_timetables_data,
+):
+    """Combines bus data with nearest stops and timetables for punctuality analysis."""
+    routes_df = pd.merge(
+        fetch_timetables_data,
+        fetch_stops_data,
+        how="left",
+        left_on=["nr_zespolu", "nr_przystanku"],
+        right_on=["zespol", "slupek"],
+    )
+    buses_df = find_nearest_stop(routes_df, clean_buses_data)
+    context.add_output_metadata(
+        {
+            "Nearest stops": metadata.preview(buses_df),
+            "Distance to stop histogram": metadata.histogram(
+                buses_df["distance_to_stop"], value_range=(0, 500)
+            ),
+        }
+    )
+    return buses_df
+
+
+def map_matched_buses(
+    context: AssetExecutionContext,
+    clean_buses_data: pd.DataFrame,
+    fetch_stops_data: pd.DataFrame,
+    fetch_routes_data: pd.DataFrame,
+):
+    """Map-matches bus fixes onto the stop sequence shapes of their lines."""
+    shapes = RouteShapes.from_routes(fetch_routes_data, fetch_stops_data)
+    matched = shapes.match(clean_buses_data)
+    buses_df = clean_buses_data.join(matched)
+    buses_df["route_speed"] = route_speeds(clean_buses_data, matched)
+    context.add_output_metadata(
+        {
+            "Map-matched buses": metadata.preview(buses_df),
+            "Matched share": float(matched["direction"].notna().mean()),
+            "Median offset (m)": float(matched["offset_m"].median()),
+            "At stop": int(matched["is_at_stop"].sum()),
+        }
+    )
+    return buses_df
+
+
+def bus_stop_arrivals(
+    context: AssetExecutionContext,
+    clean_buses_data: pd.DataFrame,
+    fetch_stops_data: pd.DataFrame,
+    fetch_routes_data: pd.DataFrame,
+):
+    """Detects stop arrivals by interpolating between consecutive bus fixes."""
+    arrivals = detect_stop_arrivals(
+        clean_buses_data, line_stops(fetch_routes_data, fetch_stops_data)
+    )
+    context.add_output_metadata(
+        {
+            "Arrivals": metadata.stratified_preview(arrivals, "Lines"),
+            "Number of arrivals": len(arrivals),
+        }
+    )
+    return arrivals
+
+
+def segment_travel_times(
+    context: AssetExecutionContext,
+    bus_stop_arrivals: pd.DataFrame,
+    fetch_routes_data: pd.DataFrame,
+):
+    """Aggregates stop-to-stop travel times per line, segment and hour."""
+    traversals = segment_traversals(
+        bus_stop_arrivals, stop_sequences(fetch_routes_data)
+    )
+    matrix = travel_time_matrix(traversals)
+    save_travel_time_matrix(matrix, TRAVEL_TIME_MATRIX_PATH)
+    context.add_output_metadata(
+        {
+            "Travel times": metadata.preview(matrix, sort_by="count"),
+            "Segments": len(matrix),
+            "Traversals": len(traversals),
+        }
+    )
+    return matrix
+
+
+def analyze_headways(
+    context: AssetExecutionContext,
+    bus_stop_arrivals: pd.DataFrame,
+    fetch_timetables_data: pd.DataFrame,
+):
+    """Analyzes headways and bunching of consecutive vehicles at each stop."""
+    headways = compute_headways(
+        bus_stop_arrivals, scheduled_departures(fetch_timetables_data)
+    )
+    summary = headways_per_line_hour(headways)
+    context.add_output_metadata(
+        {
+            "Headways per line and hour": metadata.stratified_preview(summary, "line"),
+            "Bunching share": float(headways["is_bunched"].mean()),
+        }
+    )
+    return summary
+
+
+def process_time(time_str, base_date):
+    """Converts time string to datetime object, adjusting for hours >24."""
+    hours, minutes, seconds = map(int, time_str.split(":"))
+    additional_days, corrected_hours = divmod(hours, 24)
+    corrected_datetime = datetime(
+        base_date.year,
+        base_date.month,
+        base_date.day,
+        corrected_hours,
+        minutes,
+        seconds,
+    )
+    corrected_datetime += timedelta(days=additional_days)
+    return corrected_datetime
+
+
+def find_punctuality(route_df: pd.DataFrame, buses_df: pd.DataFrame) -> pd.DataFrame:
+    """Calculates lateness for buses at stops based on timetables."""
+    buses_df["lateness"] = np.nan
+    for index, bus in buses_df.iterrows():
+        if bus["is_at_stop"]:
+            base_date = datetime.strptime(bus["Time"].split(" ")[0], "%Y-%m-%d")
+            scheduled_times_df = route_df.loc[
+                (route_df["nr_zespolu"] == bus["nearest_stop"])
+                & (route_df["nr_przystanku"] == bus["nearest_stop_number"])
+                & (route_df["route"] == bus["Lines"]),
+                ["times", "bus_id"],
+            ]
+            if scheduled_times_df.empty:
+                continue
+            scheduled_times = scheduled_times_df.iloc[0]["times"]
+            is_first_stop = scheduled_times_df.iloc[0]["bus_id"] == 1
+            if is_first_stop:
+                lateness = 0  # Zero lateness at first stop
+            else:
+                if len(scheduled_times) == 0:
+                    continue
+                actual_time = datetime.strptime(bus["Time"], "%Y-%m-%d %H:%M:%S")
+                processed_times = [
+                    process_time(time, base_date) for time in scheduled_times
+                ]
+                preceding_times = [
+                    time
+                    for time in processed_times
+                    if time <= actual_time + timedelta(minutes=2)
+                ]
+                closest_preceding_time = (
+                    max(preceding_times)
+                    if preceding_times
+                    else min(
+                        processed_times,
+                        key=lambda x: abs((x - actual_time).total_seconds()),
+                    )
+                )
+                lateness = (actual_time - closest_preceding_time).total_seconds() / 60
+            buses_df.at[index, "lateness"] = lateness
+    return buses_df
+
+
+def export_punctuality_rows(
+    context: AssetExecutionContext, punctuality_df: pd.DataFrame, path: str, config
+) -> None:
+    """Writes at-stop lateness rows to the sink described by a PunctualityExportConfig."""
+    if config is None:
+        rows = export_punctuality(punctuality_df, path)
+    elif not config.enabled:
+        return
+    else:
+        path = config.path or path
+        rows = export_punctuality(
+            punctuality_df,
+            path,
+            fmt=config.fmt,
+            columns=config.columns,
+            partition_by=config.partition_by,
+            compression=config.compression,
+            append=config.append,
+        )
+    context.add_output_metadata({"Exported rows": rows, "Export path": path})
+
+
+def analyze_bus_punctuality(
+    context: AssetExecutionContext,
+    buses_with_nearest_stops: pd.DataFrame,
+    fetch_stops_data: pd.DataFrame,
+    fetch_timetables_data: pd.DataFrame,
+    export_config=None,
+):
+    """Analyzes bus punctuality based on nearest stop and timetable data."""
+    routes_df = pd.merge(
+        fetch_timetables_data,
+        fetch_stops_data,
+        how="left",
+        left_on=["nr_zespolu", "nr_przystanku"],
+        right_on=["zespol", "slupek"],
+    )
+    buses_df = find_punctuality(routes_df, buses_with_nearest_stops)
+    export_punctuality_rows(context, buses_df, PUNCTUALITY_EXPORT_PATH, export_config)
+    context.add_output_metadata(
+        {
+            "Punctuality": metadata.preview(buses_df),
+            "Average lateness": float(buses_df["lateness"].mean()),
+            "Lateness histogram": metadata.histogram(
+                buses_df["lateness"], bins=12, value_range=(-30, 90)
+            ),
+        }
+    )
+    return buses_df
+
+
+def analyze_arrival_punctuality(
+    context: AssetExecutionContext,
+    bus_stop_arrivals: pd.DataFrame,
+    fetch_stops_data: pd.DataFrame,
+    fetch_timetables_data: pd.DataFrame,
+    export_config=None,
+):
+    """Analyzes punctuality of the interpolated stop arrivals."""
+    routes_df = pd.merge(
+        fetch_timetables_data,
+        fetch_stops_data,
+        how="left",
+        left_on=["nr_zespolu", "nr_przystanku"],
+        right_on=["zespol", "slupek"],
+    )
+    arrivals_df = find_punctuality(routes_df, bus_stop_arrivals)
+    export_punctuality_rows(
+        context, arrivals_df, ARRIVAL_PUNCTUALITY_EXPORT_PATH, export_config
+    )
+    context.add_output_metadata(
+        {
+            "Punctuality": metadata.preview(arrivals_df),
+            "Average lateness": float(arrivals_df["lateness"].mean()),
+            "Lateness histogram": metadata.histogram(
+                arrivals_df["lateness"], bins=12, value_range=(-30, 90)
+            ),
+        }
+    )
+    return arrivals_df
+
+
+def lateness_speed_cube(
+    context: AssetExecutionContext, analyze_bus_punctuality: pd.DataFrame
+) -> str:
+    """Materializes lateness and speed aggregates per line, stop, hour and weekday."""
+    cube = MetricCube.from_punctuality(analyze_bus_punctuality)
+    cube.save(METRIC_CUBE_PATH)
+    context.add_output_metadata(
+        {
+            "Lateness and speed per hour": metadata.preview(
+                cube.rollup(["hour"]), rows=24
+            ),
+            "Cells": len(cube.cells),
+        }
+    )
+    return METRIC_CUBE_PATH
@@ -1,24 +1,62 @@
-"""Assets module for bus analysis project."""
-
-import datetime
-from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
-import folium
-from dagster import asset, get_dagster_logger, MetadataValue, AssetExecutionContext
-from sklearn.metrics.pairwise import haversine_distances
+"""Assets module for bus analysis project.
+
+Only the asset graph is defined here. The computations live in
+``bus_analysis.analysis`` and are imported inside each asset on first use,
+so loading the code location (``dagster dev``, run workers, sensor ticks)
+does not import pandas, numpy, scikit-learn or folium.
+"""
+
+# pylint: disable=import-outside-toplevel
+
+from typing import List, Optional
+from dagster import asset, get_dagster_logger, AssetExecutionContext, Config
 from .resources import WarsawApiResource
-from .utils.geo_utils import haversine
 
 log = get_dagster_logger()
 
 
+class SpeedViolationConfig(Config):
+    """Run configuration of analyze_speed_violation_by_location."""
+
+    # Count distinct vehicles per stop exactly instead of with HyperLogLog
+    # sketches, e.g. to validate the sketch estimates.
+    exact_counts: bool = False
+
+
+class PunctualityExportConfig(Config):
+    """Export sink of the at-stop lateness rows of the punctuality assets."""
+
+    enabled: bool = True
+    path: Optional[str] = None  # defaults to ../data/<asset name without analyze_>
+    fmt: str = "parquet"  # or "csv" (gzip-compressed)
+    columns: Optional[List[str]] = None  # defaults to export.EXPORT_COLUMNS
+    partition_by: List[str] = ["date", "line"]  # any of date, line, stop
+    compression: Optional[str] = None  # defaults to zstd for parquet
+    append: bool = True
+
+
 @asset(io_manager_key="base_io_manager", group_name="bus")
 def fetch_buses_data(warsaw_api: WarsawApiResource):
     """Fetches buses data over a period of time."""
     return warsaw_api.request_loc_in_time(15)
 
 
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def clean_buses_data(context: AssetExecutionContext, fetch_buses_data):
+    """Drops stale, out-of-area, duplicate and teleporting fixes before analysis."""
+    from . import analysis
+
+    return analysis.clean_buses_data(context, fetch_buses_data)
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def bus_trajectory_store(context: AssetExecutionContext, clean_buses_data) -> str:
+    """Packs bus fixes into a memory-mappable per-vehicle trajectory store."""
+    from . import analysis
+
+    return analysis.bus_trajectory_store(context, clean_buses_data)
+
+
 @asset(io_manager_key="base_io_manager", group_name="bus")
 def fetch_stops_data(warsaw_api: WarsawApiResource):
     """Fetches data for all bus and tram stops."""
@@ -57,265 +95,139 @@ def fetch_timetables_data(warsaw_api: WarsawApiResource, fetch_routes_data):
 @asset(io_manager_key="base_io_manager", group_name="bus")
 def analyze_speed_violation_by_location(
     context: AssetExecutionContext,
-    analyze_bus_speed: pd.DataFrame,
-    buses_with_nearest_stops: pd.DataFrame,
-    fetch_stops_data: pd.DataFrame,
+    config: SpeedViolationConfig,
+    analyze_bus_speed,
+    buses_with_nearest_stops,
+    fetch_stops_data,
 ):
     """Analyzes speed violation by location and creates a map of significant violations."""
-    fetch_stops_data["szer_geo"] = pd.to_numeric(
-        fetch_stops_data["szer_geo"], errors="coerce"
-    )
-    fetch_stops_data["dlug_geo"] = pd.to_numeric(
-        fetch_stops_data["dlug_geo"], errors="coerce"
-    )
-    avg_coords_per_stop = (
-        fetch_stops_data.groupby("zespol")[["szer_geo", "dlug_geo"]]
-        .mean()
-        .reset_index()
-    )
-    too_fast_buses_with_stops = pd.merge(
+    from . import analysis
+
+    return analysis.analyze_speed_violation_by_location(
+        context,
         analyze_bus_speed,
-        buses_with_nearest_stops[["VehicleNumber", "Time", "nearest_stop"]],
-        on=["VehicleNumber", "Time"],
-        how="left",
-    )
-    violations_per_location = too_fast_buses_with_stops.groupby("nearest_stop").size()
-    total_measurements = buses_with_nearest_stops.groupby("nearest_stop")[
-        "VehicleNumber"
-    ].nunique()
-    violation_summary = pd.DataFrame(
-        {
-            "Total Violations": violations_per_location,
-            "Total Measurements": total_measurements,
-        }
-    ).fillna(0)
-    violation_summary["Percentage"] = (
-        100
-        * violation_summary["Total Violations"]
-        / violation_summary["Total Measurements"]
-    )
-    significant_violations = violation_summary[
-        violation_summary["Percentage"] >= 20
-    ].reset_index()
-    significant_violations = significant_violations.merge(
-        avg_coords_per_stop, left_on="nearest_stop", right_on="zespol"
-    )
-    m = folium.Map(location=[52.2296756, 21.0122287], zoom_start=10)
-    for _, row in significant_violations.iterrows():
-        folium.Marker(
-            location=[row["szer_geo"], row["dlug_geo"]],
-            popup=f"""
-            Stop ID: {row['nearest_stop']}
-            \nViolations: {row['Total Violations']}
-            \nMeasurements: {row['Total Measurements']}
-            \nPercentage: {row['Percentage']}%",
-            """,
-            icon=folium.Icon(color="red", icon="info-sign"),
-        ).add_to(m)
-    m.save("../maps/significant_violations_map.html")
-    context.add_output_metadata(
-        {
-            "Significant violations": MetadataValue.md(
-                significant_violations.to_markdown()
-            ),
-            "All the violations": MetadataValue.md(violation_summary.to_markdown()),
-        }
+        buses_with_nearest_stops,
+        fetch_stops_data,
+        exact_counts=config.exact_counts,
     )
-    return significant_violations
 
 
 @asset(io_manager_key="base_io_manager", group_name="bus")
-def analyze_bus_speed(context: AssetExecutionContext, fetch_buses_data: pd.DataFrame):
+def analyze_bus_speed(context: AssetExecutionContext, clean_buses_data):
     """Analyzes bus speeds, identifying buses moving too fast."""
-    buses_data = fetch_buses_data.sort_values(by=["VehicleNumber", "Time"])
-    speeds = [np.nan]
-    for i in range(1, len(buses_data)):
-        if (
-            buses_data.iloc[i]["VehicleNumber"]
-            == buses_data.iloc[i - 1]["VehicleNumber"]
-        ):
-            try:
-                dist = haversine(
-                    buses_data.iloc[i - 1]["Lon"],
-                    buses_data.iloc[i - 1]["Lat"],
-                    buses_data.iloc[i]["Lon"],
-                    buses_data.iloc[i]["Lat"],
-                )
-                time_diff = (
-                    pd.to_datetime(buses_data.iloc[i]["Time"])
-                    - pd.to_datetime(buses_data.iloc[i - 1]["Time"])
-                ).total_seconds() / 3600
-                speed = dist / time_diff if time_diff > 0 else 0
-                speeds.append(speed)
-            except Exception as e:
-                log.info(f"Error calculating speed: {e}")
-                speeds.append(np.nan)
-        else:
-            speeds.append(np.nan)
-    speeds = [speed if speed < 100 else np.nan for speed in speeds]
-    buses_data["Speed"] = speeds
-    too_fast_buses = buses_data[
-        (buses_data["Speed"] > 50)
-    ]
-    help_df = buses_data[(buses_data["Speed"] > 3)]
-    average_bus_speed = float(help_df["Speed"].mean())
-    context.add_output_metadata(
-        {
-            "Too fast buses": MetadataValue.md(too_fast_buses.head().to_markdown()),
-            "All the buses": MetadataValue.md(buses_data.head().to_markdown()),
-            "Average bus speed (not standing)": average_bus_speed,
-        }
-    )
-    return too_fast_buses
-
-
-def find_nearest_stop(stops_df: pd.DataFrame, buses_data: pd.DataFrame) -> pd.DataFrame:
-    """Finds the nearest stop for each bus."""
-    stops_df["lat_rad"], stops_df["lon_rad"] = np.radians(
-        pd.to_numeric(stops_df["szer_geo"], errors="coerce")
-    ), np.radians(pd.to_numeric(stops_df["dlug_geo"], errors="coerce"))
-    buses_data["lat_rad"], buses_data["lon_rad"] = np.radians(
-        pd.to_numeric(buses_data["Lat"], errors="coerce")
-    ), np.radians(pd.to_numeric(buses_data["Lon"], errors="coerce"))
-    buses_data["nearest_stop"] = np.nan
-    buses_data["nearest_stop_number"] = np.nan
-    buses_data["distance_to_stop"] = np.nan
-    buses_data["is_at_stop"] = False
-    for line, group in stops_df.groupby("route"):
-        line_buses = buses_data[
-            (buses_data["Lines"] == line)
-            & buses_data["lat_rad"].notna()
-            & buses_data["lon_rad"].notna()
-        ]
-        if (
-            line_buses.empty
-            or group.empty
-            or group["lat_rad"].isna().all()
-            or group["lon_rad"].isna().all()
-        ):
-            continue
-        bus_coords = line_buses[["lat_rad", "lon_rad"]].to_numpy()
-        stop_coords = group[["lat_rad", "lon_rad"]].dropna().to_numpy()
-        distances = (
-            haversine_distances(bus_coords, stop_coords) * 6371000
-        )  # Earth radius in meters
-        for i, bus_idx in enumerate(line_buses.index):
-            nearest_stop_idx = distances[i].argmin()
-            buses_data.at[bus_idx, "nearest_stop"] = group.iloc[nearest_stop_idx][
-                "nr_zespolu"
-            ]
-            buses_data.at[bus_idx, "nearest_stop_number"] = group.iloc[
-                nearest_stop_idx
-            ]["nr_przystanku"]
-            buses_data.at[bus_idx, "distance_to_stop"] = distances[i, nearest_stop_idx]
-            buses_data.at[bus_idx, "is_at_stop"] = (
-                distances[i, nearest_stop_idx] <= 15
-            )  # 15 meters threshold for being at a stop
-    return buses_data
+    from . import analysis
+
+    return analysis.analyze_bus_speed(context, clean_buses_data)
 
 
 @asset(io_manager_key="base_io_manager", group_name="bus")
 def buses_with_nearest_stops(
     context: AssetExecutionContext,
-    fetch_buses_data,
+    clean_buses_data,
     fetch_stops_data,
     fetch_timetables_data,
 ):
     """Combines bus data with nearest stops and timetables for punctuality analysis."""
-    routes_df = pd.merge(
-        fetch_timetables_data,
-        fetch_stops_data,
-        how="left",
-        left_on=["nr_zespolu", "nr_przystanku"],
-        right_on=["zespol", "slupek"],
+    from . import analysis
+
+    return analysis.buses_with_nearest_stops(
+        context, clean_buses_data, fetch_stops_data, fetch_timetables_data
     )
-    buses_df = find_nearest_stop(routes_df, fetch_buses_data)
-    context.add_output_metadata(
-        {"Nearest stops": MetadataValue.md(buses_df.head().to_markdown())}
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def map_matched_buses(
+    context: AssetExecutionContext,
+    clean_buses_data,
+    fetch_stops_data,
+    fetch_routes_data,
+):
+    """Map-matches bus fixes onto the stop sequence shapes of their lines."""
+    from . import analysis
+
+    return analysis.map_matched_buses(
+        context, clean_buses_data, fetch_stops_data, fetch_routes_data
     )
-    return buses_df
-
-
-def process_time(time_str, base_date):
-    """Converts time string to datetime object, adjusting for hours >24."""
-    hours, minutes, seconds = map(int, time_str.split(":"))
-    additional_days, corrected_hours = divmod(hours, 24)
-    corrected_datetime = datetime(
-        base_date.year,
-        base_date.month,
-        base_date.day,
-        corrected_hours,
-        minutes,
-        seconds,
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def bus_stop_arrivals(
+    context: AssetExecutionContext,
+    clean_buses_data,
+    fetch_stops_data,
+    fetch_routes_data,
+):
+    """Detects stop arrivals by interpolating between consecutive bus fixes."""
+    from . import analysis
+
+    return analysis.bus_stop_arrivals(
+        context, clean_buses_data, fetch_stops_data, fetch_routes_data
     )
-    corrected_datetime += timedelta(days=additional_days)
-    return corrected_datetime
-
-
-def find_punctuality(route_df: pd.DataFrame, buses_df: pd.DataFrame) -> pd.DataFrame:
-    """Calculates lateness for buses at stops based on timetables."""
-    buses_df["lateness"] = np.nan
-    for index, bus in buses_df.iterrows():
-        if bus["is_at_stop"]:
-            base_date = datetime.strptime(bus["Time"].split(" ")[0], "%Y-%m-%d")
-            scheduled_times_df = route_df.loc[
-                (route_df["nr_zespolu"] == bus["nearest_stop"])
-                & (route_df["nr_przystanku"] == bus["nearest_stop_number"])
-                & (route_df["route"] == bus["Lines"]),
-                ["times", "bus_id"],
-            ]
-            if scheduled_times_df.empty:
-                continue
-            scheduled_times = scheduled_times_df.iloc[0]["times"]
-            is_first_stop = scheduled_times_df.iloc[0]["bus_id"] == 1
-            if is_first_stop:
-                lateness = 0  # Zero lateness at first stop
-            else:
-                if len(scheduled_times) == 0:
-                    continue
-                actual_time = datetime.strptime(bus["Time"], "%Y-%m-%d %H:%M:%S")
-                processed_times = [
-                    process_time(time, base_date) for time in scheduled_times
-                ]
-                preceding_times = [
-                    time
-                    for time in processed_times
-                    if time <= actual_time + timedelta(minutes=2)
-                ]
-                closest_preceding_time = (
-                    max(preceding_times)
-                    if preceding_times
-                    else min(
-                        processed_times,
-                        key=lambda x: abs((x - actual_time).total_seconds()),
-                    )
-                )
-                lateness = (actual_time - closest_preceding_time).total_seconds() / 60
-            buses_df.at[index, "lateness"] = lateness
-    buses_df.to_csv("../data/punctuality.csv")
-    return buses_df
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def segment_travel_times(
+    context: AssetExecutionContext, bus_stop_arrivals, fetch_routes_data
+):
+    """Aggregates stop-to-stop travel times per line, segment and hour."""
+    from . import analysis
+
+    return analysis.segment_travel_times(context, bus_stop_arrivals, fetch_routes_data)
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def analyze_headways(
+    context: AssetExecutionContext, bus_stop_arrivals, fetch_timetables_data
+):
+    """Analyzes headways and bunching of consecutive vehicles at each stop."""
+    from . import analysis
+
+    return analysis.analyze_headways(context, bus_stop_arrivals, fetch_timetables_data)
 
 
 @asset(io_manager_key="base_io_manager", group_name="bus")
 def analyze_bus_punctuality(
     context: AssetExecutionContext,
-    buses_with_nearest_stops: pd.DataFrame,
-    fetch_stops_data: pd.DataFrame,
-    fetch_timetables_data: pd.DataFrame,
+    config: PunctualityExportConfig,
+    buses_with_nearest_stops,
+    fetch_stops_data,
+    fetch_timetables_data,
 ):
     """Analyzes bus punctuality based on nearest stop and timetable data."""
-    routes_df = pd.merge(
-        fetch_timetables_data,
+    from . import analysis
+
+    return analysis.analyze_bus_punctuality(
+        context,
+        buses_with_nearest_stops,
         fetch_stops_data,
-        how="left",
-        left_on=["nr_zespolu", "nr_przystanku"],
-        right_on=["zespol", "slupek"],
+        fetch_timetables_data,
+        export_config=config,
     )
-    buses_df = find_punctuality(routes_df, buses_with_nearest_stops)
-    context.add_output_metadata(
-        {
-            "Punctuality": MetadataValue.md(buses_df.head().to_markdown()),
-            "Average lateness": float(buses_df["lateness"].mean()),
-        }
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def analyze_arrival_punctuality(
+    context: AssetExecutionContext,
+    config: PunctualityExportConfig,
+    bus_stop_arrivals,
+    fetch_stops_data,
+    fetch_timetables_data,
+):
+    """Analyzes punctuality of the interpolated stop arrivals."""
+    from . import analysis
+
+    return analysis.analyze_arrival_punctuality(
+        context,
+        bus_stop_arrivals,
+        fetch_stops_data,
+        fetch_timetables_data,
+        export_config=config,
     )
-    return buses_df
\ No newline at end of file
+
+
+@asset(io_manager_key="base_io_manager", group_name="bus")
+def lateness_speed_cube(context: AssetExecutionContext, analyze_bus_punctuality) -> str:
+    """Materializes lateness and speed aggregates per line, stop, hour and weekday."""
+    from . import analysis
+
+    return analysis.lateness_speed_cube(context, analyze_bus_punctuality)
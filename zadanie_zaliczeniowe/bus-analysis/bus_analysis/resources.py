@@ -1,12 +1,19 @@
-"""Module for accessing Warsaw public transport API."""
+"""Module for accessing Warsaw public transport API.
+
+``requests`` and ``pandas`` are imported inside the request methods so that
+loading the code location stays cheap.
+"""
+
+# pylint: disable=import-outside-toplevel
 
 import time
-import requests
-import pandas as pd
+from datetime import datetime
+from zoneinfo import ZoneInfo
 from dagster import ConfigurableResource, get_dagster_logger
 
 API_URL = "https://api.um.warszawa.pl/api/action/"
 TYPE = "1"  # 1 for buses, 2 for trams
+WARSAW_TZ = ZoneInfo("Europe/Warsaw")
 
 
 def flatten_data_routes(data):
@@ -29,6 +36,9 @@ class WarsawApiResource(ConfigurableResource):
 
     def request_loc(self):
         """Requests current location data for buses or trams."""
+        import requests
+        import pandas as pd
+
         params = {
             "resource_id": "f2e5503e-927d-4ad3-9500-4ab9e55deb59",
             "apikey": self.api_key,
@@ -43,6 +53,8 @@ class WarsawApiResource(ConfigurableResource):
 
     def request_loc_in_time(self, minutes):
         """Requests location data for buses or trams over a specified period."""
+        import pandas as pd
+
         buses = pd.DataFrame()
         for _ in range(2 * minutes):
             data = pd.DataFrame()
@@ -52,12 +64,21 @@ class WarsawApiResource(ConfigurableResource):
                 except Exception as e:
                     get_dagster_logger().info(str(e))
                     time.sleep(30)
+            # Vehicle times are Warsaw local time; keep the poll time comparable.
+            data["PollTime"] = datetime.now(WARSAW_TZ).strftime("%Y-%m-%d %H:%M:%S")
             buses = pd.concat([buses, data], ignore_index=True)
-        buses.drop_duplicates(inplace=True)
+        # A report repeated by later polls keeps the time of the first poll.
+        buses.drop_duplicates(
+            subset=[column for column in buses.columns if column != "PollTime"],
+            inplace=True,
+        )
         return buses
 
     def request_stops(self):
         """Requests data for all bus and tram stops."""
+        import requests
+        import pandas as pd
+
         params = {
             "id": "ab75c33d-3a26-4342-b36a-6e5fef0a3ac3",
             "apikey": self.api_key,
@@ -73,6 +94,8 @@ class WarsawApiResource(ConfigurableResource):
 
     def request_timetables(self, busstop_id, busstop_nr, line):
         """Requests timetable data for a specific bus or tram stop."""
+        import requests
+
         params = {
             "id": "e923fa0e-d96c-43f9-ae6e-60518c9f3238",
             "apikey": self.api_key,
@@ -95,6 +118,9 @@ class WarsawApiResource(ConfigurableResource):
 
     def request_routes(self):
         """Requests data for all bus and tram routes."""
+        import requests
+        import pandas as pd
+
         params = {
             "apikey": self.api_key,
         }
@@ -0,0 +1,39 @@
+"""Column-per-file storage of small derived tables."""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+_SCHEMA = "schema.json"
+
+
+def save_frame(frame: pd.DataFrame, path: str) -> None:
+    """Writes each column of ``frame`` as a separate ``.npy`` file."""
+    os.makedirs(path, exist_ok=True)
+    schema = []
+    for i, column in enumerate(frame.columns):
+        values = frame[column].to_numpy()
+        if values.dtype == object or pd.api.types.is_string_dtype(values.dtype):
+            values = values.astype(str)
+        np.save(os.path.join(path, f"{i}.npy"), values)
+        schema.append(str(column))
+    with open(os.path.join(path, _SCHEMA), "w", encoding="utf-8") as file:
+        json.dump(schema, file)
+
+
+def load_frame(path: str, columns=None, mmap: bool = True) -> pd.DataFrame:
+    """Loads a table written by ``save_frame``, optionally only some columns."""
+    with open(os.path.join(path, _SCHEMA), "r", encoding="utf-8") as file:
+        schema = json.load(file)
+    wanted = schema if columns is None else columns
+    mode = "r" if mmap else None
+    return pd.DataFrame(
+        {
+            column: np.load(
+                os.path.join(path, f"{schema.index(column)}.npy"), mmap_mode=mode
+            )
+            for column in wanted
+        }
+    )
@@ -0,0 +1,182 @@
+"""Pre-aggregated lateness and speed cube with a small query CLI.
+
+Observations are aggregated once per (line, stop group, hour, weekday) cell
+into counts, sums and fixed-bin histograms. Histograms of any set of cells
+can be added together, so rollups over any subset of dimensions, and their
+quantiles, are answered without touching the raw rows. Quantiles are bin
+midpoints, so they are exact to within half a bin width (0.5 minute for
+lateness, 1 km/h for speed) for values inside the binned range.
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .columnar import load_frame, save_frame
+from .geo_utils import calculate_speeds
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+DIMENSIONS = ["line", "stop", "hour", "weekday"]
+DIMENSION_TYPES = {"line": str, "stop": str, "hour": int, "weekday": int}
+SPEED_LIMIT = 50  # km/h, same threshold as analyze_bus_speed
+BINS = {
+    "lateness": np.arange(-30.0, 91.0, 1.0),  # minutes
+    "speed": np.arange(0.0, 102.0, 2.0),  # km/h
+}
+
+
+def _histogram(cells: np.ndarray, values: np.ndarray, edges: np.ndarray):
+    """Counts values per (cell, bin) pair, clamping values outside the edges."""
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 2)
+    keys = cells.astype(np.int64) * (len(edges) - 1) + bins
+    unique, counts = np.unique(keys, return_counts=True)
+    return pd.DataFrame(
+        {
+            "cell": (unique // (len(edges) - 1)).astype(np.int32),
+            "bin": (unique % (len(edges) - 1)).astype(np.int16),
+            "count": counts.astype(np.int32),
+        }
+    )
+
+
+def _quantiles(hist: np.ndarray, edges: np.ndarray, quantiles) -> dict:
+    """Reads quantiles off dense (group, bin) histograms."""
+    midpoints = (edges[:-1] + edges[1:]) / 2
+    cumulative = np.cumsum(hist, axis=1)
+    total = cumulative[:, -1:]
+    result = {}
+    for q in quantiles:
+        position = np.argmax(cumulative >= q * total, axis=1)
+        result[q] = np.where(total[:, 0] > 0, midpoints[position], np.nan)
+    return result
+
+
+class MetricCube:
+    """Cells with per-metric counts and sums plus sparse histograms."""
+
+    def __init__(self, cells: pd.DataFrame, histograms: dict):
+        self.cells = cells
+        self.histograms = histograms
+
+    @classmethod
+    def from_punctuality(cls, punctuality_df: pd.DataFrame) -> "MetricCube":
+        """Builds the cube from the frame returned by ``analyze_bus_punctuality``."""
+        moment = pd.to_datetime(
+            punctuality_df["Time"], format=TIME_FORMAT, errors="coerce"
+        )
+        frame = pd.DataFrame(
+            {
+                "line": punctuality_df["Lines"].astype(str),
+                "stop": punctuality_df["nearest_stop"],
+                "hour": moment.dt.hour,
+                "weekday": moment.dt.weekday,
+                "lateness": punctuality_df["lateness"],
+                "speed": calculate_speeds(punctuality_df),
+            }
+        ).dropna(subset=["hour", "stop"])
+        # Only after dropna: astype(str) turns a missing stop into "nan"
+        frame = frame.astype({"stop": str, "hour": np.int8, "weekday": np.int8})
+        frame["violations"] = (frame["speed"] > SPEED_LIMIT).astype(np.int32)
+
+        codes = frame.groupby(DIMENSIONS, sort=True).ngroup().to_numpy()
+        grouped = frame.groupby(codes)
+        cells = grouped[DIMENSIONS].first().reset_index(drop=True)
+        for metric in BINS:
+            cells[f"{metric}_count"] = grouped[metric].count().to_numpy(np.int32)
+            cells[f"{metric}_sum"] = grouped[metric].sum().to_numpy(np.float64)
+        cells["violations"] = grouped["violations"].sum().to_numpy(np.int32)
+
+        histograms = {}
+        for metric, edges in BINS.items():
+            present = frame[metric].notna().to_numpy()
+            histograms[metric] = _histogram(
+                codes[present], frame[metric].to_numpy()[present], edges
+            )
+        return cls(cells, histograms)
+
+    def save(self, path: str) -> None:
+        """Writes cells and histograms as column-per-file tables."""
+        save_frame(self.cells, os.path.join(path, "cells"))
+        for metric, hist in self.histograms.items():
+            save_frame(hist, os.path.join(path, metric))
+
+    @classmethod
+    def load(cls, path: str) -> "MetricCube":
+        """Loads a cube written by ``save``."""
+        cells = load_frame(os.path.join(path, "cells"))
+        histograms = {metric: load_frame(os.path.join(path, metric)) for metric in BINS}
+        return cls(cells, histograms)
+
+    def rollup(self, by=(), filters=None, quantiles=(0.5, 0.9)) -> pd.DataFrame:
+        """Aggregates the cells matching ``filters`` grouped by ``by``.
+
+        ``filters`` maps a dimension to an allowed value or list of values.
+        The result holds counts, means, speed violations and quantiles of
+        lateness and speed for each group.
+        """
+        by = list(by)
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dimension, allowed in (filters or {}).items():
+            allowed = allowed if isinstance(allowed, (list, tuple, set)) else [allowed]
+            allowed = [DIMENSION_TYPES[dimension](value) for value in allowed]
+            mask &= self.cells[dimension].isin(allowed).to_numpy()
+
+        selected = self.cells[mask]
+        if by:
+            group = selected.groupby(by, sort=True).ngroup().to_numpy()
+            result = selected.groupby(by, sort=True)[self._measures()].sum()
+        else:
+            group = np.zeros(len(selected), dtype=np.int64)
+            measures = selected[self._measures()]
+            result = measures.sum().to_frame().T.astype(measures.dtypes)
+        cell_group = np.full(len(self.cells), -1, dtype=np.int64)
+        cell_group[np.flatnonzero(mask)] = group
+
+        for metric, edges in BINS.items():
+            result[f"{metric}_mean"] = (
+                result[f"{metric}_sum"] / result[f"{metric}_count"]
+            )
+            dense = self._dense_histogram(metric, cell_group, len(result), edges)
+            for q, values in _quantiles(dense, edges, quantiles).items():
+                result[f"{metric}_p{round(q * 100)}"] = values
+        return result.reset_index() if by else result.reset_index(drop=True)
+
+    def _measures(self):
+        return [column for column in self.cells.columns if column not in DIMENSIONS]
+
+    def _dense_histogram(self, metric, cell_group, n_groups, edges):
+        hist = self.histograms[metric]
+        groups = cell_group[hist["cell"].to_numpy()]
+        keep = groups >= 0
+        n_bins = len(edges) - 1
+        flat = np.bincount(
+            groups[keep] * n_bins + hist["bin"].to_numpy()[keep],
+            weights=hist["count"].to_numpy()[keep],
+            minlength=n_groups * n_bins,
+        )
+        return flat.reshape(n_groups, n_bins)
+
+
+def main(argv=None):
+    """Answers a rollup query against a saved cube from the command line."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("path", help="directory written by MetricCube.save")
+    parser.add_argument("--by", nargs="*", default=[], choices=DIMENSIONS)
+    for dimension in DIMENSIONS:
+        parser.add_argument(f"--{dimension}", nargs="+")
+    parser.add_argument("--quantiles", nargs="+", type=float, default=[0.5, 0.9])
+    args = parser.parse_args(argv)
+
+    filters = {
+        dimension: getattr(args, dimension)
+        for dimension in DIMENSIONS
+        if getattr(args, dimension)
+    }
+    result = MetricCube.load(args.path).rollup(args.by, filters, args.quantiles)
+    print(result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Live arrival time estimates from stored segment travel times.
+
+``EtaService`` keeps the stop sequence of every line variant with cumulative
+travel times per hour of day, built once from the travel time matrix. Each
+position update places every vehicle on the variants of its line it can be
+following, so an ETA query only reads a few arrays of the queried line.
+"""
+
+import argparse
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .quality import clean_positions
+from .route_shapes import RouteShapes
+from .travel_times import KEY, load_travel_time_matrix
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+HOURS = 24
+MAX_OFF_ROUTE_M = 100  # farther from a variant's stop sequence: not on it
+MAX_FIX_AGE_S = 5 * 60  # vehicles silent for longer are forgotten
+REPLAY_POLL = "30s"  # poll interval assumed for captures without PollTime
+DEFAULT_SPEED_MPS = 18 / 3.6  # for segments without observed travel times
+
+
+class Eta(NamedTuple):
+    """Estimated arrival of one vehicle at the queried stop."""
+
+    vehicle: str
+    brigade: str
+    direction: str
+    seconds: float  # from the query time, 0 if already due
+    arrival: pd.Timestamp
+
+
+def _segment_times(shapes: RouteShapes, matrix: pd.DataFrame) -> np.ndarray:
+    """Travel time in seconds of every shape segment, per hour.
+
+    Hours without observations use the segment's median over the other
+    hours; segments never observed assume DEFAULT_SPEED_MPS.
+    """
+    stops = shapes.vertices
+    start, end = shapes.segment_stop, shapes.segment_stop + 1
+    segments = pd.DataFrame(
+        {
+            "line": stops["route"].to_numpy()[start],
+            "from_stop": stops["nr_zespolu"].to_numpy()[start],
+            "from_stop_number": stops["nr_przystanku"].to_numpy()[start],
+            "to_stop": stops["nr_zespolu"].to_numpy()[end],
+            "to_stop_number": stops["nr_przystanku"].to_numpy()[end],
+        }
+    )
+    observed = matrix.pivot_table(
+        index=list(segments.columns), columns="hour", values="p50", aggfunc="first"
+    ).reindex(columns=range(HOURS))
+    times = observed.reindex(pd.MultiIndex.from_frame(segments)).to_numpy(float)
+    median = pd.DataFrame(times).median(axis=1).to_numpy()
+    fallback = np.where(
+        np.isnan(median), shapes.segment_length / DEFAULT_SPEED_MPS, median
+    )
+    return np.where(np.isnan(times), fallback[:, None], times).T
+
+
+class EtaService:
+    """In-memory ETA index of line variants and current vehicle positions."""
+
+    def __init__(
+        self,
+        matrix: pd.DataFrame,
+        routes_df: pd.DataFrame,
+        stops_df: pd.DataFrame,
+    ):
+        self.shapes = shapes = RouteShapes.from_routes(
+            routes_df, stops_df, reach=MAX_OFF_ROUTE_M
+        )
+        # cumulative[hour, i]: seconds from the variant's first stop to stop i
+        self.cumulative = np.zeros((HOURS, len(shapes.vertices)))
+        self.cumulative[:, shapes.segment_stop + 1] = _segment_times(shapes, matrix)
+        for start, end in zip(shapes.offsets[:-1], shapes.offsets[1:]):
+            self.cumulative[:, start:end] = np.cumsum(
+                self.cumulative[:, start:end], axis=1
+            )
+        lines, first_variant = shapes.lines, shapes.first_variant
+        n_variants = np.diff(np.r_[first_variant, len(shapes.variant_line)])
+
+        # (line, stop, stop number or None) -> stop index on each line variant
+        self.targets = {}
+        variant = np.repeat(
+            np.arange(len(shapes.variant_line)), np.diff(shapes.offsets)
+        )
+        keys = shapes.vertices.assign(
+            variant=variant,
+            position=np.arange(len(variant)) - shapes.offsets[variant],
+            line=lambda df: lines.searchsorted(df["route"]),
+        ).drop_duplicates(subset=["variant", "nr_zespolu", "nr_przystanku"])
+        for number in (True, False):
+            by_stop = (
+                keys if number else keys.drop_duplicates(["variant", "nr_zespolu"])
+            )
+            for row in by_stop.itertuples(index=False):
+                key = (row.route, row.nr_zespolu, row.nr_przystanku if number else None)
+                if key not in self.targets:
+                    self.targets[key] = np.full(
+                        n_variants[row.line], -1, dtype=np.int64
+                    )
+                self.targets[key][row.variant - first_variant[row.line]] = row.position
+        self.placed = None  # candidate placements of every tracked vehicle
+        self.vehicles = {}  # the same per line, as arrays for queries
+        self.progress = {}  # (vehicle, variant) -> stop index plus fraction
+        self.last_update = None
+
+    @classmethod
+    def load(
+        cls, matrix_path: str, routes_df: pd.DataFrame, stops_df: pd.DataFrame
+    ) -> "EtaService":
+        """Builds the service from a matrix saved by ``segment_travel_times``."""
+        matrix = load_travel_time_matrix(matrix_path, columns=[*KEY, "p50"])
+        return cls(matrix, routes_df, stops_df)
+
+    def refresh(self, api) -> None:
+        """Polls current positions, e.g. from ``WarsawApiResource.request_loc``."""
+        self.update(api.request_loc())
+
+    def replay(self, capture: pd.DataFrame):
+        """Feeds a stored capture poll by poll, yielding each poll's time."""
+        if "PollTime" in capture.columns:
+            polls = capture["PollTime"]
+        else:
+            polls = pd.to_datetime(
+                capture["Time"], format=TIME_FORMAT, errors="coerce"
+            ).dt.ceil(REPLAY_POLL)
+        for poll, positions in capture.groupby(polls, sort=True):
+            self.update(positions)
+            yield poll
+
+    def update(self, positions: pd.DataFrame) -> None:
+        """Places vehicles with new fixes on the variants of their line."""
+        fixes = pd.DataFrame(
+            {
+                "vehicle": positions["VehicleNumber"].astype(str),
+                "brigade": positions["Brigade"].astype(str),
+                "line": positions["Lines"].astype(str),
+                "t": pd.to_datetime(
+                    positions["Time"], format=TIME_FORMAT, errors="coerce"
+                ),
+                "lat": pd.to_numeric(positions["Lat"], errors="coerce"),
+                "lon": pd.to_numeric(positions["Lon"], errors="coerce"),
+            }
+        ).dropna(subset=["t", "lat", "lon"])
+        fixes = fixes.sort_values("t").drop_duplicates("vehicle", keep="last")
+        fixes = fixes[fixes["line"].isin(self.shapes.lines)]
+        if self.placed is not None and not self.placed.empty:
+            known = self.placed.drop_duplicates("vehicle").set_index("vehicle")["time"]
+            fixes = fixes[~(fixes["t"] <= fixes["vehicle"].map(known))]
+        if fixes.empty:
+            return
+        # A single fix with a bogus future time must not age out all others.
+        fixes = fixes[
+            (fixes["t"] - fixes["t"].median()).dt.total_seconds() <= MAX_FIX_AGE_S
+        ]
+        newest = fixes["t"].max()
+        if self.last_update is not None:
+            newest = max(newest, self.last_update)
+
+        placed = self._place(fixes.reset_index(drop=True))
+        if self.placed is not None:
+            placed = pd.concat(
+                [self.placed[~self.placed["vehicle"].isin(fixes["vehicle"])], placed],
+                ignore_index=True,
+            )
+        placed = placed[(newest - placed["time"]).dt.total_seconds() <= MAX_FIX_AGE_S]
+        # Forget the progress of vehicles that aged out with their placements.
+        tracked = set(placed["vehicle"])
+        self.progress = {
+            key: value for key, value in self.progress.items() if key[0] in tracked
+        }
+        placed = placed.sort_values("line", kind="stable").reset_index(drop=True)
+        lines, first = np.unique(placed["line"].to_numpy(), return_index=True)
+        bounds = np.r_[first, len(placed)]
+        columns = {column: placed[column].to_numpy() for column in placed.columns}
+        self.vehicles = {
+            line: {name: values[start:end] for name, values in columns.items()}
+            for line, start, end in zip(lines, bounds[:-1], bounds[1:])
+        }
+        self.placed, self.last_update = placed, newest
+
+    def _place(self, fixes: pd.DataFrame) -> pd.DataFrame:
+        """Projects every fix on the shapes of all variants of its line."""
+        candidates = self.shapes.project(fixes["line"], fixes["lat"], fixes["lon"])
+        fix = candidates["fix"].to_numpy()
+        variant = candidates["variant"].to_numpy()
+        segment, t = candidates["segment"].to_numpy(), candidates["fraction"].to_numpy()
+
+        # Keep the variants along which the vehicle moved forward since its
+        # previous fix; if it stood still, those it did not move backward on;
+        # if it moved backward on all of them, it started a new trip.
+        vehicle = fixes["vehicle"].to_numpy()[fix]
+        progress = segment + t
+        previous = np.array(
+            [self.progress.get((name, v), np.nan) for name, v in zip(vehicle, variant)]
+        ).reshape(-1)
+        forward = progress > previous
+        stayed = progress == previous
+        by_vehicle = pd.DataFrame({"forward": forward, "stayed": stayed}).groupby(
+            vehicle
+        )
+        moved = by_vehicle["forward"].transform("any").to_numpy()
+        stood = by_vehicle["stayed"].transform("any").to_numpy()
+        keep = np.where(moved, forward, np.where(stood, stayed, True))
+        self.progress.update(zip(zip(vehicle[keep], variant[keep]), progress[keep]))
+
+        line = fixes["line"].to_numpy()[fix]
+        return pd.DataFrame(
+            {
+                "vehicle": vehicle,
+                "brigade": fixes["brigade"].to_numpy()[fix],
+                "line": line,
+                "local": variant
+                - self.shapes.first_variant[self.shapes.lines.searchsorted(line)],
+                "variant": variant,
+                "segment": segment,
+                "fraction": t,
+                "hour": fixes["t"].dt.hour.to_numpy()[fix],
+                "time": fixes["t"].to_numpy()[fix],
+            }
+        )[keep]
+
+    def eta(self, line, stop, stop_number=None, now=None) -> list:
+        """Arrivals of vehicles of ``line`` at ``stop``, soonest first.
+
+        ``now`` defaults to the newest fix of the last update, so replayed
+        captures are answered as at the time they were recorded.
+        """
+        line = str(line)
+        stop_number = None if stop_number is None else str(stop_number)
+        target = self.targets.get((line, str(stop), stop_number))
+        state = self.vehicles.get(line)
+        if target is None or not state:
+            return []
+        stop_index = target[state["local"]]
+        ahead = stop_index > state["segment"]
+        if not ahead.any():
+            return []
+
+        offset = self.shapes.offsets[state["variant"][ahead]]
+        hour, segment = state["hour"][ahead], offset + state["segment"][ahead]
+        at_segment_start = self.cumulative[hour, segment]
+        seconds = (
+            self.cumulative[hour, offset + stop_index[ahead]]
+            - at_segment_start
+            - state["fraction"][ahead]
+            * (self.cumulative[hour, segment + 1] - at_segment_start)
+        )
+        arrival = state["time"][ahead] + (seconds * 1e3).astype("timedelta64[ms]")
+        order = np.argsort(arrival, kind="stable")
+        vehicles = state["vehicle"][ahead][order]
+        _, first = np.unique(vehicles, return_index=True)
+        order = order[np.sort(first)]
+
+        now = pd.Timestamp(self.last_update if now is None else now).to_datetime64()
+        wait = (arrival[order] - now) / np.timedelta64(1, "s")
+        return [
+            Eta(vehicle, brigade, direction, max(float(s), 0.0), pd.Timestamp(at))
+            for vehicle, brigade, direction, s, at in zip(
+                state["vehicle"][ahead][order],
+                state["brigade"][ahead][order],
+                self.shapes.variant_direction[state["variant"][ahead][order]],
+                wait,
+                arrival[order],
+            )
+        ]
+
+
+def main(argv=None):
+    """Answers an ETA query from a stored capture or live API positions."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("line")
+    parser.add_argument("stop", help="stop group id (zespol)")
+    parser.add_argument("--stop-number", help="stop post number (slupek)")
+    parser.add_argument("--matrix", default="../data/travel_time_matrix")
+    parser.add_argument("--routes", default="../data/fetch_routes_data")
+    parser.add_argument("--stops", default="../data/fetch_stops_data")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--capture", help="pickled fetch_buses_data to replay")
+    source.add_argument("--api-key", help="query live positions")
+    args = parser.parse_args(argv)
+
+    service = EtaService.load(
+        args.matrix, pd.read_pickle(args.routes), pd.read_pickle(args.stops)
+    )
+    if args.capture:
+        capture, _ = clean_positions(pd.read_pickle(args.capture))
+        for _ in service.replay(capture):
+            pass
+    else:
+        from ..resources import (  # pylint: disable=import-outside-toplevel
+            WarsawApiResource,
+        )
+
+        service.refresh(WarsawApiResource(api_key=args.api_key))
+    for eta in service.eta(args.line, args.stop, args.stop_number):
+        print(
+            f"{eta.vehicle:>6} brigade {eta.brigade:>4} {eta.direction:<10}"
+            f" {eta.arrival:%H:%M:%S} (in {eta.seconds / 60:.1f} min)"
+        )
+
+
+if __name__ == "__main__":
+    main()
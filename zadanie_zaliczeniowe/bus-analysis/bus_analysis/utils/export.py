@@ -0,0 +1,140 @@
+"""Partitioned export of punctuality rows for use outside Dagster."""
+
+import importlib.util
+import os
+import shutil
+
+import pandas as pd
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+EXPORT_COLUMNS = [
+    "VehicleNumber",
+    "Lines",
+    "Brigade",
+    "Time",
+    "nearest_stop",
+    "nearest_stop_number",
+    "distance_to_stop",
+    "lateness",
+]
+# Identifiers with leading zeros must stay strings when read back from CSV.
+ID_TYPES = {
+    column: str
+    for column in [
+        "VehicleNumber",
+        "Lines",
+        "Brigade",
+        "nearest_stop",
+        "nearest_stop_number",
+    ]
+}
+# Partition keys and the punctuality columns they are derived from.
+PARTITIONS = {
+    "date": lambda df: df["Time"].astype(str).str[:10],
+    "line": lambda df: df["Lines"].astype(str),
+    "stop": lambda df: df["nearest_stop"].astype(str),
+}
+FORMATS = {
+    # format: (file suffix, default compression)
+    "parquet": (".parquet", "zstd"),
+    "csv": (".csv.gz", "gzip"),
+}
+PARQUET_ENGINES = ("pyarrow", "fastparquet")
+
+
+def export_rows(punctuality_df: pd.DataFrame) -> pd.DataFrame:
+    """Rows worth exporting: fixes at a stop with a computed lateness."""
+    return punctuality_df[
+        punctuality_df["is_at_stop"].astype(bool) & punctuality_df["lateness"].notna()
+    ]
+
+
+def _check_format(fmt: str) -> None:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and not any(
+        importlib.util.find_spec(engine) for engine in PARQUET_ENGINES
+    ):
+        raise ImportError(
+            "Parquet export needs pyarrow or fastparquet installed; "
+            'install one of them or export with fmt="csv"'
+        )
+
+
+def _write(frame: pd.DataFrame, path: str, fmt: str, compression) -> None:
+    if fmt == "parquet":
+        frame.to_parquet(path, compression=compression, index=False)
+    else:
+        frame.to_csv(path, compression=compression, index=False)
+
+
+def export_punctuality(
+    punctuality_df: pd.DataFrame,
+    path: str,
+    fmt: str = "parquet",
+    columns=None,
+    partition_by=("date", "line"),
+    compression=None,
+    append: bool = True,
+) -> int:
+    """Writes the at-stop rows of ``punctuality_df`` into a partitioned dataset.
+
+    Partitions are hive-style directories (``date=2024-02-19/line=190``).
+    Each capture writes one file per partition, named after its last fix,
+    so appending a new capture adds files while re-exporting the same
+    capture replaces its own. With ``append=False`` the dataset is cleared
+    first. A capture without a single valid timestamp cannot be named, so
+    nothing is written and the dataset is left as it is. Returns the number
+    of exported rows.
+    """
+    _check_format(fmt)
+    suffix, default_compression = FORMATS[fmt]
+    compression = compression or default_compression
+
+    rows = export_rows(punctuality_df)
+    keys = pd.DataFrame({key: PARTITIONS[key](rows) for key in partition_by})
+    rows = rows[list(columns or EXPORT_COLUMNS)]
+    last_fix = pd.to_datetime(
+        punctuality_df["Time"], format=TIME_FORMAT, errors="coerce"
+    ).max()
+    if pd.isna(last_fix):
+        return 0
+    name = f"part-{last_fix.strftime('%Y%m%dT%H%M%S')}{suffix}"
+
+    if not append:
+        shutil.rmtree(path, ignore_errors=True)
+    if not partition_by:
+        os.makedirs(path, exist_ok=True)
+        _write(rows, os.path.join(path, name), fmt, compression)
+        return len(rows)
+    for values, part in rows.groupby([keys[key] for key in partition_by]):
+        directory = os.path.join(
+            path, *(f"{key}={value}" for key, value in zip(partition_by, values))
+        )
+        os.makedirs(directory, exist_ok=True)
+        _write(part, os.path.join(directory, name), fmt, compression)
+    return len(rows)
+
+
+def load_punctuality_export(path: str, fmt: str = "parquet") -> pd.DataFrame:
+    """Reads every file of an exported dataset, adding the partition keys."""
+    _check_format(fmt)
+    suffix = FORMATS[fmt][0]
+    frames = []
+    for root, _, files in sorted(os.walk(path)):
+        keys = dict(
+            part.split("=", 1)
+            for part in os.path.relpath(root, path).split(os.sep)
+            if "=" in part
+        )
+        for file in sorted(files):
+            if not file.endswith(suffix):
+                continue
+            file = os.path.join(root, file)
+            frame = (
+                pd.read_parquet(file)
+                if fmt == "parquet"
+                else pd.read_csv(file, dtype=ID_TYPES)
+            )
+            frames.append(frame.assign(**keys))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -1,5 +1,8 @@
 from math import radians, cos, sin, asin, sqrt
 
+import numpy as np
+import pandas as pd
+
 
 # Funkcja pomocnicza do obliczania odległości między punktami geograficznymi
 def haversine(lon1, lat1, lon2, lat2):
@@ -35,3 +38,79 @@ def calculate_speed(df):
         speed = dist / time_diff
         speeds.append(speed)
     return speeds
+
+
+# Środek Warszawy, względem którego rzutujemy współrzędne na płaszczyznę
+WARSAW_CENTER = (52.2296756, 21.0122287)
+EARTH_RADIUS_M = 6371000
+
+
+def project_to_plane(lat, lon, origin=WARSAW_CENTER):
+    """
+    Rzutuje współrzędne w stopniach na lokalną płaszczyznę (x, y) w metrach.
+
+    Rzut równoodległościowy jest dokładny do ułamka procenta w skali miasta,
+    więc odległości i rzuty na odcinki można liczyć zwykłą geometrią płaską.
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat0, lon0 = np.radians(origin[0]), np.radians(origin[1])
+    x = (lon - lon0) * np.cos(lat0) * EARTH_RADIUS_M
+    y = (lat - lat0) * EARTH_RADIUS_M
+    return x, y
+
+
+def unproject_from_plane(x, y, origin=WARSAW_CENTER):
+    """
+    Odwrotność project_to_plane: zamienia (x, y) w metrach na stopnie.
+    """
+    lat0, lon0 = np.radians(origin[0]), np.radians(origin[1])
+    lat = np.degrees(np.asarray(y, dtype=float) / EARTH_RADIUS_M + lat0)
+    lon = np.degrees(
+        np.asarray(x, dtype=float) / (EARTH_RADIUS_M * np.cos(lat0)) + lon0
+    )
+    return lat, lon
+
+
+def haversine_vectorized(lon1, lat1, lon2, lat2):
+    """
+    Wektorowa wersja haversine dla tablic współrzędnych w stopniach, wynik w km.
+    """
+    lon1, lat1, lon2, lat2 = (
+        np.radians(np.asarray(value, dtype=float)) for value in (lon1, lat1, lon2, lat2)
+    )
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * np.arcsin(np.sqrt(a)) * EARTH_RADIUS_M / 1000
+
+
+def calculate_speeds(df, max_speed=100):
+    """
+    Prędkość (km/h) każdego pomiaru względem poprzedniego pomiaru tego samego
+    pojazdu, tak jak w analyze_bus_speed, ale bez pętli po wierszach.
+
+    Zwraca serię zgodną z indeksem df; NaN dla pierwszego pomiaru pojazdu
+    i dla prędkości od max_speed wzwyż (anomalie).
+    """
+    times = pd.to_datetime(df["Time"], format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    order = np.lexsort((times.to_numpy(), df["VehicleNumber"].astype(str).to_numpy()))
+    vehicles = df["VehicleNumber"].astype(str).to_numpy()[order]
+    stamps = times.to_numpy()[order]
+    seconds = np.where(
+        np.isnat(stamps), np.nan, stamps.astype("datetime64[s]").astype(float)
+    )
+    lat = pd.to_numeric(df["Lat"], errors="coerce").to_numpy()[order]
+    lon = pd.to_numeric(df["Lon"], errors="coerce").to_numpy()[order]
+
+    dist = haversine_vectorized(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    hours = np.diff(seconds) / 3600
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = np.where(hours > 0, dist / hours, 0.0)
+    speed[vehicles[1:] != vehicles[:-1]] = np.nan
+    speed[speed >= max_speed] = np.nan
+
+    result = np.full(len(df), np.nan)
+    result[order[1:]] = speed
+    return pd.Series(result, index=df.index)
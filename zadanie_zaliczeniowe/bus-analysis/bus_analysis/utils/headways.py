@@ -0,0 +1,130 @@
+"""Headways between consecutive vehicles of a line at a stop."""
+
+import numpy as np
+import pandas as pd
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+BUNCHING_RATIO = 0.25  # observed headway below this share of the scheduled one
+DAY_S = 24 * 3600
+GROUP_STRIDE = 4 * DAY_S  # timetables run past midnight, keep groups apart
+# Arrivals before this time of day belong to the previous service day, whose
+# timetable lists them as 24:xx and later
+SERVICE_DAY_START_S = 4 * 3600
+KEY = ["line", "stop", "stop_number"]
+
+
+def _group_codes(observed: pd.DataFrame, scheduled: pd.DataFrame):
+    """Assigns one shared integer code per (line, stop, stop number)."""
+    keys = pd.concat([observed[KEY], scheduled[KEY]], ignore_index=True)
+    codes = keys.groupby(KEY, sort=False).ngroup().to_numpy()
+    return codes[: len(observed)], codes[len(observed) :]
+
+
+def _sorted_diff(codes: np.ndarray, seconds: np.ndarray):
+    """Sorts events by group and time, then diffs them within each group."""
+    keys = codes.astype(np.int64) * GROUP_STRIDE + seconds
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    gaps = np.diff(keys)
+    same_group = np.diff(codes[order]) == 0
+    return keys, order, gaps, same_group
+
+
+def _seconds_of_day(times: pd.Series) -> np.ndarray:
+    """Parses "HH:MM:SS" strings (hours may exceed 23) into seconds."""
+    text = times.to_numpy().astype("U8")
+    if (np.char.str_len(text) == 8).all():
+        digits = text.view(np.uint32).reshape(-1, 8).astype(np.int64) - ord("0")
+        hours = digits[:, 0] * 10 + digits[:, 1]
+        minutes = digits[:, 3] * 10 + digits[:, 4]
+        return hours * 3600 + minutes * 60 + digits[:, 6] * 10 + digits[:, 7]
+    parts = times.str.split(":", expand=True).astype(int)
+    return (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy()
+
+
+def _service_time(moment: pd.Series):
+    """Service day of each arrival and its seconds since that day's midnight."""
+    day = (moment - pd.Timedelta(seconds=SERVICE_DAY_START_S)).dt.normalize()
+    seconds = (moment - day).dt.total_seconds().astype(np.int64)
+    return day, seconds.to_numpy()
+
+
+def scheduled_departures(timetables_df: pd.DataFrame) -> pd.DataFrame:
+    """Explodes timetable lists into one row per scheduled departure."""
+    exploded = timetables_df[["route", "nr_zespolu", "nr_przystanku", "times"]]
+    exploded = exploded.explode("times").dropna(subset=["times"])
+    return pd.DataFrame(
+        {
+            "line": exploded["route"].astype(str).to_numpy(),
+            "stop": exploded["nr_zespolu"].to_numpy(),
+            "stop_number": exploded["nr_przystanku"].to_numpy(),
+            "seconds": _seconds_of_day(exploded["times"]),
+        }
+    )
+
+
+def compute_headways(
+    arrivals: pd.DataFrame, scheduled: pd.DataFrame, ratio=BUNCHING_RATIO
+) -> pd.DataFrame:
+    """Computes observed headways and compares them with the timetable.
+
+    Arrivals and scheduled departures are each sorted once by
+    (line, stop, time) and headways are the differences of neighbours in the
+    same group. The scheduled headway for an arrival is the gap between the
+    two timetable departures around it. Arrival times are counted from the
+    midnight of their service day, like timetable times, and headways never
+    span two service days.
+    """
+    moment = pd.to_datetime(arrivals["Time"], format=TIME_FORMAT)
+    service_day, seconds = _service_time(moment)
+    observed = pd.DataFrame(
+        {
+            "line": arrivals["Lines"].astype(str).to_numpy(),
+            "stop": arrivals["nearest_stop"].to_numpy(),
+            "stop_number": arrivals["nearest_stop_number"].to_numpy(),
+            "service_day": service_day.to_numpy(),
+            "seconds": seconds,
+            "VehicleNumber": arrivals["VehicleNumber"].to_numpy(),
+        }
+    )
+    obs_codes, sched_codes = _group_codes(observed, scheduled)
+    day_index, days = pd.factorize(service_day)
+
+    _, order, gaps, same_group = _sorted_diff(
+        obs_codes * max(len(days), 1) + day_index, seconds
+    )
+    sched_keys, _, sched_gaps, sched_same = _sorted_diff(
+        sched_codes, scheduled["seconds"].to_numpy()
+    )
+
+    follower = observed.iloc[order[1:]][same_group].reset_index(drop=True)
+    follower["headway"] = gaps[same_group]
+
+    # Scheduled headway: gap ending at the first departure at or after arrival.
+    arrival_keys = (
+        obs_codes[order[1:]][same_group] * GROUP_STRIDE + follower["seconds"].to_numpy()
+    )
+    position = np.searchsorted(sched_keys, arrival_keys, side="left")
+    usable = (position > 0) & (position < len(sched_keys))
+    gap_index = np.clip(position - 1, 0, max(len(sched_gaps) - 1, 0))
+    if len(sched_gaps):
+        usable &= sched_same[gap_index]
+        scheduled_headway = np.where(usable, sched_gaps[gap_index], np.nan)
+    else:
+        scheduled_headway = np.full(len(follower), np.nan)
+    follower["scheduled_headway"] = scheduled_headway
+    follower["is_bunched"] = follower["headway"] < ratio * scheduled_headway
+    follower["hour"] = (follower["seconds"] // 3600 % 24).astype(np.int8)
+    return follower
+
+
+def headways_per_line_hour(headways: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates headways and bunching per line and hour of the day."""
+    summary = headways.groupby(["line", "hour"]).agg(
+        headways=("headway", "size"),
+        mean_headway=("headway", "mean"),
+        mean_scheduled_headway=("scheduled_headway", "mean"),
+        bunched=("is_bunched", "sum"),
+    )
+    summary["bunching_share"] = summary["bunched"] / summary["headways"]
+    return summary.reset_index()
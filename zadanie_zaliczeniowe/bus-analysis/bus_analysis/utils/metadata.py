@@ -0,0 +1,85 @@
+"""Bounded previews, summaries and histograms for asset output metadata.
+
+Rendering whole frames into metadata makes materializations slow and the
+event log large, so every table put into metadata goes through these
+helpers, which never render more than MAX_PREVIEW_ROWS rows.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from dagster import MetadataValue
+
+PREVIEW_ROWS = 5
+MAX_PREVIEW_ROWS = 50
+MAX_CELL_CHARS = 40  # longer texts (e.g. timetable lists) are cut
+SUMMARY_QUANTILES = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+def _markdown(frame: pd.DataFrame) -> MetadataValue:
+    frame = frame.head(MAX_PREVIEW_ROWS).copy()
+    for column in frame.select_dtypes(include=["object", "string"]).columns:
+        text = frame[column].astype(str)
+        frame[column] = text.where(
+            text.str.len() <= MAX_CELL_CHARS, text.str[: MAX_CELL_CHARS - 1] + "…"
+        )
+    return MetadataValue.md(frame.to_markdown())
+
+
+def preview(
+    frame: pd.DataFrame, rows=PREVIEW_ROWS, sort_by=None, ascending=False
+) -> MetadataValue:
+    """The first ``rows`` rows, or the top ones by ``sort_by``, as markdown."""
+    rows = min(rows, MAX_PREVIEW_ROWS)
+    if sort_by is None:
+        return _markdown(frame.head(rows))
+    if ascending:
+        return _markdown(frame.nsmallest(rows, sort_by))
+    return _markdown(frame.nlargest(rows, sort_by))
+
+
+def stratified_preview(frame: pd.DataFrame, by, rows=PREVIEW_ROWS) -> MetadataValue:
+    """One row of each of up to ``rows`` groups spread evenly over all groups."""
+    rows = min(rows, MAX_PREVIEW_ROWS)
+    group = frame.groupby(by, sort=True).ngroup().to_numpy()
+    n_groups = group.max() + 1 if len(group) else 0
+    chosen = np.unique(np.linspace(0, max(n_groups - 1, 0), rows).astype(int))
+    _, first = np.unique(group, return_index=True)
+    return _markdown(frame.iloc[np.sort(first[chosen[chosen < len(first)]])])
+
+
+def summary(frame: pd.DataFrame, columns=None) -> MetadataValue:
+    """Count, mean, standard deviation and quantiles of numeric columns.
+
+    The statistics are computed with numpy on the columns converted to
+    one float matrix, instead of going through describe.
+    """
+    columns = columns or list(frame.select_dtypes("number").columns)
+    values = frame[columns].to_numpy(dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+        stats = np.vstack(
+            [
+                np.count_nonzero(~np.isnan(values), axis=0),
+                np.nanmean(values, axis=0),
+                np.nanstd(values, axis=0, ddof=1),
+                np.nanquantile(values, SUMMARY_QUANTILES, axis=0),
+            ]
+        )
+    index = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+    return _markdown(pd.DataFrame(stats, index=index, columns=columns))
+
+
+def histogram(values, bins=10, value_range=None) -> MetadataValue:
+    """Counts of ``values`` in equal-width bins as a markdown table.
+
+    Values outside ``value_range`` are counted in the first or last bin.
+    """
+    values = pd.to_numeric(pd.Series(values), errors="coerce").dropna().to_numpy()
+    if value_range is not None:
+        values = np.clip(values, *value_range)
+    bins = min(bins, MAX_PREVIEW_ROWS)
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    labels = [f"{low:g} to {high:g}" for low, high in zip(edges[:-1], edges[1:])]
+    return _markdown(pd.DataFrame({"count": counts}, index=labels))
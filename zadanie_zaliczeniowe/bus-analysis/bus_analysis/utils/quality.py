@@ -0,0 +1,106 @@
+"""Vectorized data-quality rules for raw bus position captures."""
+
+import numpy as np
+import pandas as pd
+
+from .geo_utils import haversine_vectorized
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_FIX_AGE = pd.Timedelta(minutes=5)  # fix older than this at poll time is stale
+MAX_FIX_LEAD = pd.Timedelta(minutes=1)  # tolerated clock skew into the future
+CAPTURE_LENGTH = pd.Timedelta(minutes=15)  # as requested by fetch_buses_data
+# Area served by ZTM Warsaw, including suburban lines.
+SERVICE_AREA = {"lat": (51.90, 52.60), "lon": (20.40, 21.60)}
+MAX_SPEED = 100  # km/h, same anomaly threshold as analyze_bus_speed
+
+
+def _stale(buses_df: pd.DataFrame, times: pd.Series) -> pd.Series:
+    """Flags fixes too old (or too far in the future) relative to their poll."""
+    if "PollTime" in buses_df.columns:
+        polled = pd.to_datetime(
+            buses_df["PollTime"], format=TIME_FORMAT, errors="coerce"
+        )
+        return (polled - times > MAX_FIX_AGE) | (times - polled > MAX_FIX_LEAD)
+    # Older captures do not record the poll time: every poll happened within
+    # CAPTURE_LENGTH of the capture's median fix.
+    median = times.median()
+    return (times < median - CAPTURE_LENGTH - MAX_FIX_AGE) | (
+        times > median + CAPTURE_LENGTH + MAX_FIX_LEAD
+    )
+
+
+def _teleports(frame: pd.DataFrame, max_speed: float) -> np.ndarray:
+    """Flags fixes reached and left at an implausible speed (single-fix spikes)."""
+    order = np.lexsort((frame["t"].to_numpy(), frame["VehicleNumber"].to_numpy()))
+    vehicles = frame["VehicleNumber"].to_numpy()[order]
+    seconds = frame["t"].to_numpy()[order].astype("datetime64[s]").astype(float)
+    lat, lon = frame["lat"].to_numpy()[order], frame["lon"].to_numpy()[order]
+
+    km = haversine_vectorized(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    hours = np.diff(seconds) / 3600
+    with np.errstate(divide="ignore", invalid="ignore"):
+        too_fast = (vehicles[1:] == vehicles[:-1]) & (km / hours > max_speed)
+    incoming = np.concatenate([[False], too_fast])
+    outgoing = np.concatenate([too_fast, [False]])
+    spike = incoming & outgoing
+    # A jump right after the first fix or right before the last one is blamed
+    # on the end fix, unless its neighbour is already a spike.
+    first = np.concatenate([[True], vehicles[1:] != vehicles[:-1]])
+    last = np.concatenate([vehicles[1:] != vehicles[:-1], [True]])
+    after_spike = np.concatenate([[False], spike[:-1]])
+    before_spike = np.concatenate([spike[1:], [False]])
+    before_last = np.concatenate([last[1:], [True]])
+    spike |= (incoming & last & ~after_spike) | (
+        outgoing & first & ~before_spike & ~before_last
+    )
+
+    flagged = np.zeros(len(frame), dtype=bool)
+    flagged[order] = spike
+    return flagged
+
+
+def clean_positions(buses_df: pd.DataFrame, max_speed: float = MAX_SPEED):
+    """Drops invalid, stale, out-of-area, duplicate and teleporting fixes.
+
+    Rules are applied in order and each one only sees the rows kept by the
+    previous ones. Returns the cleaned frame and the number of rows dropped
+    by every rule.
+    """
+    times = pd.to_datetime(buses_df["Time"], format=TIME_FORMAT, errors="coerce")
+    lat = pd.to_numeric(buses_df["Lat"], errors="coerce")
+    lon = pd.to_numeric(buses_df["Lon"], errors="coerce")
+
+    rules = {
+        "invalid": times.isna() | lat.isna() | lon.isna(),
+        "stale": _stale(buses_df, times),
+        "out_of_area": ~(
+            lat.between(*SERVICE_AREA["lat"]) & lon.between(*SERVICE_AREA["lon"])
+        ),
+    }
+    keep = np.ones(len(buses_df), dtype=bool)
+    dropped = {}
+    for rule, mask in rules.items():
+        mask = mask.to_numpy() & keep
+        dropped[rule] = int(mask.sum())
+        keep &= ~mask
+
+    # Copies of a fix dropped above must not make a later copy a duplicate
+    duplicate = np.zeros(len(buses_df), dtype=bool)
+    duplicate[keep] = buses_df[keep].duplicated(subset=["VehicleNumber", "Time"])
+    dropped["duplicate"] = int(duplicate.sum())
+    keep &= ~duplicate
+
+    frame = pd.DataFrame(
+        {
+            "VehicleNumber": buses_df["VehicleNumber"].astype(str).to_numpy()[keep],
+            "t": times.to_numpy()[keep],
+            "lat": lat.to_numpy()[keep],
+            "lon": lon.to_numpy()[keep],
+        }
+    )
+    teleport = np.zeros(len(buses_df), dtype=bool)
+    teleport[np.flatnonzero(keep)] = _teleports(frame, max_speed)
+    dropped["teleport"] = int(teleport.sum())
+    keep &= ~teleport
+
+    return buses_df[keep].reset_index(drop=True), dropped
@@ -0,0 +1,252 @@
+"""Route shapes of line variants and map-matching of bus fixes onto them."""
+
+import numpy as np
+import pandas as pd
+
+from .geo_utils import project_to_plane
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_OFFSET_M = 100  # fixes farther from every shape of their line are not matched
+CELL_SIZE_M = 250  # side of the grid cells indexing shape segments
+STOP_RADIUS_M = 15  # same threshold as is_at_stop in find_nearest_stop
+
+
+def shape_vertices(routes_df: pd.DataFrame, stops_df: pd.DataFrame) -> pd.DataFrame:
+    """Ordered stops with coordinates of every line and direction.
+
+    ``routes_df`` holds the flattened ``public_transport_routes`` rows, see
+    ``flatten_data_routes``. Stops without coordinates are skipped.
+    """
+    stops = stops_df[["zespol", "slupek", "szer_geo", "dlug_geo"]].assign(
+        szer_geo=lambda df: pd.to_numeric(df["szer_geo"], errors="coerce"),
+        dlug_geo=lambda df: pd.to_numeric(df["dlug_geo"], errors="coerce"),
+    )
+    routes = (
+        routes_df[["route", "direction", "bus_id", "nr_zespolu", "nr_przystanku"]]
+        .assign(
+            route=lambda df: df["route"].astype(str),
+            order=lambda df: pd.to_numeric(df["bus_id"], errors="coerce"),
+            odleglosc=pd.to_numeric(
+                routes_df.get("odleglosc", np.nan), errors="coerce"
+            ),
+        )
+        .merge(
+            stops.drop_duplicates(subset=["zespol", "slupek"]),
+            how="inner",
+            left_on=["nr_zespolu", "nr_przystanku"],
+            right_on=["zespol", "slupek"],
+        )
+        .dropna(subset=["order", "szer_geo", "dlug_geo"])
+        .sort_values(["route", "direction", "order"], kind="stable")
+        .reset_index(drop=True)
+    )
+    routes["x"], routes["y"] = project_to_plane(routes["szer_geo"], routes["dlug_geo"])
+    return routes
+
+
+class RouteShapes:
+    """Stop polylines of every line variant with a grid index of their segments.
+
+    Vertices of all variants are stored in one table ordered by line and
+    direction; variant ``v`` spans rows ``offsets[v]:offsets[v + 1]`` and
+    ``along[i]`` is the route distance in meters from its first stop to
+    stop ``i``. Segment ``s`` runs from vertex ``segment_stop[s]`` to the
+    next one. The grid maps (line, cell) to the segments passing within
+    ``reach`` meters of the cell, so matching a fix only projects it onto
+    the few segments of its own line near it.
+    """
+
+    def __init__(self, vertices: pd.DataFrame, reach=MAX_OFFSET_M, cell=CELL_SIZE_M):
+        self.vertices = vertices
+        self.reach, self.cell = reach, cell
+        variant = vertices.groupby(["route", "direction"], sort=False).ngroup()
+        variant = variant.to_numpy()
+        first = np.flatnonzero(np.r_[True, np.diff(variant) != 0])
+        self.offsets = np.r_[first, len(vertices)]
+        self.variant_line = vertices["route"].to_numpy()[first]
+        self.variant_direction = vertices["direction"].to_numpy()[first]
+        self.x, self.y = vertices["x"].to_numpy(), vertices["y"].to_numpy()
+        self.lines, self.first_variant = np.unique(self.variant_line, return_index=True)
+
+        self.segment_stop = np.flatnonzero(np.diff(variant) == 0)
+        self.segment_variant = variant[self.segment_stop]
+        # Route distance from the timetable where it increases, else straight.
+        following = self.segment_stop + 1
+        route = np.diff(vertices["odleglosc"].to_numpy(float))[self.segment_stop]
+        straight = np.hypot(
+            self.x[following] - self.x[self.segment_stop],
+            self.y[following] - self.y[self.segment_stop],
+        )
+        self.segment_length = np.where(route > 0, route, straight)
+        self.along = np.zeros(len(vertices))
+        self.along[following] = self.segment_length
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            self.along[start:end] = np.cumsum(self.along[start:end])
+        self._build_grid()
+
+    @classmethod
+    def from_routes(cls, routes_df, stops_df, reach=MAX_OFFSET_M) -> "RouteShapes":
+        """Builds the shapes of all lines of ``fetch_routes_data``."""
+        return cls(shape_vertices(routes_df, stops_df), reach=reach)
+
+    def _build_grid(self) -> None:
+        start, end = self.segment_stop, self.segment_stop + 1
+        self.origin = (self.x.min() - self.reach, self.y.min() - self.reach)
+        low_x = self._cell_of(np.minimum(self.x[start], self.x[end]) - self.reach, 0)
+        high_x = self._cell_of(np.maximum(self.x[start], self.x[end]) + self.reach, 0)
+        low_y = self._cell_of(np.minimum(self.y[start], self.y[end]) - self.reach, 1)
+        high_y = self._cell_of(np.maximum(self.y[start], self.y[end]) + self.reach, 1)
+        self.n_cells_x = int(high_x.max()) + 1
+        self.n_cells = self.n_cells_x * (int(high_y.max()) + 1)
+
+        width, height = high_x - low_x + 1, high_y - low_y + 1
+        segment = np.repeat(np.arange(len(start)), width * height)
+        within = np.arange(len(segment)) - np.repeat(
+            np.cumsum(width * height) - width * height, width * height
+        )
+        cells = (low_y[segment] + within // width[segment]) * self.n_cells_x + (
+            low_x[segment] + within % width[segment]
+        )
+        line = self.lines.searchsorted(self.variant_line[self.segment_variant])
+        keys = line[segment] * self.n_cells + cells
+        order = np.argsort(keys, kind="stable")
+        self.grid_keys, self.grid_start = np.unique(keys[order], return_index=True)
+        self.grid_start = np.r_[self.grid_start, len(order)]
+        self.grid_segments = segment[order]
+
+    def _cell_of(self, values, axis):
+        cell = np.floor((values - self.origin[axis]) / self.cell)
+        return np.nan_to_num(cell, nan=-1).astype(np.int64)
+
+    def project(self, lines, lat, lon) -> pd.DataFrame:
+        """Projects fixes onto every variant of their line passing within reach.
+
+        Returns one row per (fix, variant) pair with the fix position in
+        ``lines``, the variant, the segment index within the variant, the
+        fraction of the segment covered, the route distance from the first
+        stop and the distance of the fix from the shape.
+        """
+        lines = np.asarray(lines, dtype=str)
+        x, y = project_to_plane(np.asarray(lat, float), np.asarray(lon, float))
+        line = np.minimum(self.lines.searchsorted(lines), len(self.lines) - 1)
+        cell_x, cell_y = self._cell_of(x, 0), self._cell_of(y, 1)
+        inside = (
+            (self.lines[line] == lines)
+            & (cell_x >= 0)
+            & (cell_x < self.n_cells_x)
+            & (cell_y >= 0)
+            & (cell_y * self.n_cells_x < self.n_cells)
+        )
+        keys = line * self.n_cells + cell_y * self.n_cells_x + cell_x
+        slot = np.minimum(self.grid_keys.searchsorted(keys), len(self.grid_keys) - 1)
+        found = inside & (self.grid_keys[slot] == keys)
+        first = np.where(found, self.grid_start[slot], 0)
+        counts = np.where(found, self.grid_start[slot + 1] - first, 0)
+
+        fix = np.repeat(np.arange(len(lines)), counts)
+        pick = np.arange(len(fix)) - np.repeat(np.cumsum(counts) - counts, counts)
+        segment = self.grid_segments[np.repeat(first, counts) + pick]
+        stop = self.segment_stop[segment]
+        ax, ay = self.x[stop], self.y[stop]
+        dx, dy = self.x[stop + 1] - ax, self.y[stop + 1] - ay
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = ((x[fix] - ax) * dx + (y[fix] - ay) * dy) / (dx**2 + dy**2)
+        t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+        offset = np.hypot(ax + t * dx - x[fix], ay + t * dy - y[fix])
+
+        # The closest segment of every (fix, variant) pair, if close enough.
+        variant = self.segment_variant[segment]
+        pair = fix * len(self.variant_line) + variant
+        order = np.lexsort((offset, pair))
+        _, closest = np.unique(pair[order], return_index=True)
+        best = order[closest]
+        best = best[offset[best] <= self.reach]
+        stop = stop[best]
+        return pd.DataFrame(
+            {
+                "fix": fix[best],
+                "variant": variant[best],
+                "segment": stop - self.offsets[variant[best]],
+                "fraction": t[best],
+                "along_route_m": self.along[stop]
+                + t[best] * self.segment_length[segment[best]],
+                "offset_m": offset[best],
+            }
+        )
+
+    def match(self, buses_df: pd.DataFrame) -> pd.DataFrame:
+        """Map-matches every fix to the closest variant shape of its line.
+
+        Returns, aligned with ``buses_df``, the matched direction, the route
+        distance from its first stop, the distance from the shape and the
+        stop closest along the route; unmatched fixes hold NaN. Unlike
+        ``find_nearest_stop`` a stop only matches if it lies on the shape
+        the bus follows, not merely close to it, e.g. on a parallel street.
+        """
+        candidates = self.project(
+            buses_df["Lines"].astype(str),
+            pd.to_numeric(buses_df["Lat"], errors="coerce"),
+            pd.to_numeric(buses_df["Lon"], errors="coerce"),
+        )
+        best = candidates.sort_values(["fix", "offset_m"], kind="stable")
+        best = best.drop_duplicates("fix")
+        fix, variant = best["fix"].to_numpy(), best["variant"].to_numpy()
+        start = self.offsets[variant] + best["segment"].to_numpy()
+        nearer_end = start + (best["fraction"].to_numpy() > 0.5)
+        to_stop = np.hypot(
+            best["along_route_m"].to_numpy() - self.along[nearer_end],
+            best["offset_m"].to_numpy(),
+        )
+
+        matched = pd.DataFrame(
+            {
+                "direction": None,
+                "along_route_m": np.nan,
+                "offset_m": np.nan,
+                "nearest_stop": None,
+                "nearest_stop_number": None,
+                "distance_to_stop": np.nan,
+                "is_at_stop": False,
+            },
+            index=pd.RangeIndex(len(buses_df)),
+        )
+        matched.loc[fix, "direction"] = self.variant_direction[variant]
+        matched.loc[fix, "along_route_m"] = best["along_route_m"].to_numpy()
+        matched.loc[fix, "offset_m"] = best["offset_m"].to_numpy()
+        matched.loc[fix, "nearest_stop"] = self.vertices["nr_zespolu"].to_numpy()[
+            nearer_end
+        ]
+        matched.loc[fix, "nearest_stop_number"] = self.vertices[
+            "nr_przystanku"
+        ].to_numpy()[nearer_end]
+        matched.loc[fix, "distance_to_stop"] = to_stop
+        matched.loc[fix, "is_at_stop"] = to_stop <= STOP_RADIUS_M
+        return matched.set_axis(buses_df.index)
+
+
+def route_speeds(
+    buses_df: pd.DataFrame, matched: pd.DataFrame, max_speed=100
+) -> pd.Series:
+    """Speed in km/h along the route between consecutive matched fixes.
+
+    Only pairs of fixes of the same vehicle matched to the same direction
+    count; the first fix of a run, unmatched fixes and speeds above
+    ``max_speed`` either way (a jump to another part of a looping shape)
+    get NaN, as anomalies do in ``calculate_speeds``.
+    """
+    frame = pd.DataFrame(
+        {
+            "vehicle": buses_df["VehicleNumber"].astype(str),
+            "t": pd.to_datetime(buses_df["Time"], format=TIME_FORMAT, errors="coerce"),
+            "direction": matched["direction"],
+            "along": matched["along_route_m"],
+        }
+    ).sort_values(["vehicle", "t"], kind="stable")
+    previous = frame.shift()
+    same_run = (frame["vehicle"] == previous["vehicle"]) & (
+        frame["direction"] == previous["direction"]
+    )
+    seconds = (frame["t"] - previous["t"]).dt.total_seconds()
+    speed = (frame["along"] - previous["along"]) / seconds * 3.6
+    valid = same_run & (seconds > 0) & (speed.abs() <= max_speed)
+    return speed.where(valid).reindex(buses_df.index)
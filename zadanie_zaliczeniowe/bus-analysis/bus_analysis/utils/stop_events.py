@@ -0,0 +1,174 @@
+"""Detection of stop arrivals between consecutive GPS fixes."""
+
+import numpy as np
+import pandas as pd
+
+from .geo_utils import project_to_plane, unproject_from_plane
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+STOP_RADIUS_M = 15  # same threshold as is_at_stop in find_nearest_stop
+MAX_GAP_S = 300  # do not interpolate across gaps in reporting longer than this
+CHUNK_SIZE = 1_000_000  # segment x stop pairs evaluated at once
+
+ARRIVAL_COLUMNS = [
+    "VehicleNumber",
+    "Lines",
+    "Brigade",
+    "Time",
+    "Lat",
+    "Lon",
+    "nearest_stop",
+    "nearest_stop_number",
+    "distance_to_stop",
+    "is_at_stop",
+    "dwell_seconds",
+]
+
+
+def line_stops(routes_df: pd.DataFrame, stops_df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the distinct stops served by each line with their coordinates."""
+    stops = stops_df[["zespol", "slupek", "szer_geo", "dlug_geo"]].assign(
+        szer_geo=lambda df: pd.to_numeric(df["szer_geo"], errors="coerce"),
+        dlug_geo=lambda df: pd.to_numeric(df["dlug_geo"], errors="coerce"),
+    )
+    return (
+        routes_df[["route", "nr_zespolu", "nr_przystanku"]]
+        .drop_duplicates()
+        .merge(
+            stops,
+            how="inner",
+            left_on=["nr_zespolu", "nr_przystanku"],
+            right_on=["zespol", "slupek"],
+        )
+        .dropna(subset=["szer_geo", "dlug_geo"])
+        .drop_duplicates(subset=["route", "nr_zespolu", "nr_przystanku"])
+        .reset_index(drop=True)
+    )
+
+
+def _segments(buses_df: pd.DataFrame, max_gap: float) -> pd.DataFrame:
+    """Builds one row per pair of consecutive fixes of the same vehicle and line."""
+    fixes = pd.DataFrame(
+        {
+            "VehicleNumber": buses_df["VehicleNumber"].astype(str),
+            "Lines": buses_df["Lines"].astype(str),
+            "Brigade": buses_df["Brigade"].astype(str),
+            "t": pd.to_datetime(buses_df["Time"], format=TIME_FORMAT, errors="coerce"),
+            "lat": pd.to_numeric(buses_df["Lat"], errors="coerce"),
+            "lon": pd.to_numeric(buses_df["Lon"], errors="coerce"),
+        }
+    ).dropna(subset=["t", "lat", "lon"])
+    fixes = fixes.sort_values(["VehicleNumber", "t"], kind="stable").drop_duplicates(
+        subset=["VehicleNumber", "t"]
+    )
+    fixes["t"] = fixes["t"].to_numpy().astype("datetime64[s]").astype(np.int64)
+    fixes["x"], fixes["y"] = project_to_plane(fixes["lat"], fixes["lon"])
+
+    start = fixes.iloc[:-1].reset_index(drop=True)
+    end = fixes.iloc[1:].reset_index(drop=True)
+    dt = end["t"] - start["t"]
+    valid = (
+        (start["VehicleNumber"] == end["VehicleNumber"])
+        & (start["Lines"] == end["Lines"])
+        & (dt > 0)
+        & (dt <= max_gap)
+    )
+    segments = start[valid].assign(
+        dx=(end["x"] - start["x"])[valid],
+        dy=(end["y"] - start["y"])[valid],
+        dt=dt[valid],
+    )
+    segments["segment"] = np.flatnonzero(valid.to_numpy())
+    return segments.reset_index(drop=True)
+
+
+def _match_line(segments: pd.DataFrame, stops: pd.DataFrame, radius: float):
+    """Projects every stop of a line onto every segment of that line in chunks."""
+    stop_x, stop_y = project_to_plane(stops["szer_geo"], stops["dlug_geo"])
+    hits = []
+    rows_per_chunk = max(1, CHUNK_SIZE // len(stops))
+    for first in range(0, len(segments), rows_per_chunk):
+        chunk = segments.iloc[first : first + rows_per_chunk]
+        ax, ay = chunk["x"].to_numpy()[:, None], chunk["y"].to_numpy()[:, None]
+        dx, dy = chunk["dx"].to_numpy()[:, None], chunk["dy"].to_numpy()[:, None]
+        length2 = dx**2 + dy**2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = ((stop_x - ax) * dx + (stop_y - ay) * dy) / length2
+        t = np.clip(np.nan_to_num(t), 0.0, 1.0)
+        distance = np.hypot(ax + t * dx - stop_x, ay + t * dy - stop_y)
+        seg_idx, stop_idx = np.nonzero(distance <= radius)
+        hits.append(
+            (
+                seg_idx + first,
+                stop_idx,
+                t[seg_idx, stop_idx],
+                distance[seg_idx, stop_idx],
+            )
+        )
+    seg_idx, stop_idx, t, distance = (np.concatenate(parts) for parts in zip(*hits))
+    matched = segments.iloc[seg_idx].reset_index(drop=True)
+    return matched.assign(
+        Time=matched["t"] + t * matched["dt"],
+        x=matched["x"] + t * matched["dx"],
+        y=matched["y"] + t * matched["dy"],
+        nearest_stop=stops["nr_zespolu"].to_numpy()[stop_idx],
+        nearest_stop_number=stops["nr_przystanku"].to_numpy()[stop_idx],
+        distance_to_stop=distance,
+    )
+
+
+def _collapse_visits(events: pd.DataFrame) -> pd.DataFrame:
+    """Merges detections of one stop on consecutive segments into one arrival."""
+    events = events.sort_values(
+        ["VehicleNumber", "nearest_stop", "nearest_stop_number", "segment"]
+    ).reset_index(drop=True)
+    key = events[["VehicleNumber", "nearest_stop", "nearest_stop_number"]]
+    same_stop = (key == key.shift()).all(axis=1)
+    new_visit = ~(same_stop & (events["segment"].diff() <= 1))
+    visit = new_visit.cumsum()
+    grouped = events.groupby(visit)
+    arrivals = events[new_visit.to_numpy()].reset_index(drop=True)
+    arrivals["dwell_seconds"] = (
+        grouped["Time"].max() - grouped["Time"].min()
+    ).to_numpy()
+    arrivals["distance_to_stop"] = grouped["distance_to_stop"].min().to_numpy()
+    return arrivals
+
+
+def detect_stop_arrivals(
+    buses_df: pd.DataFrame,
+    stops_per_line: pd.DataFrame,
+    radius: float = STOP_RADIUS_M,
+    max_gap: float = MAX_GAP_S,
+) -> pd.DataFrame:
+    """Detects stop passages between consecutive fixes and interpolates their time.
+
+    Each segment between two fixes of a vehicle is assumed to be driven at
+    constant speed. A stop of the vehicle's line whose projection onto the
+    segment lies within ``radius`` meters counts as visited, at the time
+    interpolated at the projection point. The result has one row per visit,
+    with the columns ``find_punctuality`` expects.
+    """
+    segments = _segments(buses_df, max_gap)
+    matches = []
+    for line, stops in stops_per_line.groupby("route"):
+        line_segments = segments[segments["Lines"] == str(line)]
+        if line_segments.empty:
+            continue
+        matches.append(_match_line(line_segments, stops, radius))
+    matches = [match for match in matches if not match.empty]
+    if not matches:
+        return pd.DataFrame(columns=ARRIVAL_COLUMNS)
+
+    arrivals = _collapse_visits(pd.concat(matches, ignore_index=True))
+    arrivals["Time"] = arrivals["Time"].round().astype(np.int64).astype("datetime64[s]")
+    arrivals["Time"] = pd.Series(arrivals["Time"]).dt.strftime(TIME_FORMAT)
+    arrivals["Lat"], arrivals["Lon"] = unproject_from_plane(
+        arrivals["x"], arrivals["y"]
+    )
+    arrivals["is_at_stop"] = True
+    return (
+        arrivals.sort_values(["VehicleNumber", "Time"])
+        .reset_index(drop=True)
+        .loc[:, ARRIVAL_COLUMNS]
+    )
@@ -0,0 +1,170 @@
+"""Compact, memory-mappable per-vehicle store of GPS fixes."""
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+COORD_SCALE = 1_000_000  # 1e-6 degree is roughly 0.1 m in Warsaw
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_ARRAYS = ("vehicles", "lines", "brigades", "offsets", "base_time")
+_COLUMNS = ("time", "lat", "lon", "line", "brigade")
+
+
+class Trajectory(NamedTuple):
+    """Decoded fixes of a single vehicle."""
+
+    vehicle: str
+    time: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    line: np.ndarray
+
+
+class TrajectoryStore:
+    """Struct-of-arrays store of bus fixes grouped by vehicle.
+
+    Fixes of one vehicle occupy the contiguous range
+    ``offsets[i]:offsets[i + 1]`` of every per-fix column and are sorted by time.
+    Timestamps are stored as int32 seconds relative to the vehicle's first fix
+    (``base_time``), coordinates as int32 multiples of ``1 / COORD_SCALE`` degree
+    and lines/brigades as int32 codes into small string tables.
+    """
+
+    def __init__(self, tables: dict, columns: dict):
+        self.vehicles = tables["vehicles"]
+        self.lines = tables["lines"]
+        self.brigades = tables["brigades"]
+        self.offsets = tables["offsets"]
+        self.base_time = tables["base_time"]
+        self.columns = columns
+        self._index = {str(v): i for i, v in enumerate(self.vehicles)}
+
+    @classmethod
+    def from_frame(cls, buses_df: pd.DataFrame) -> "TrajectoryStore":
+        """Builds the store from the frame returned by ``fetch_buses_data``."""
+        frame = pd.DataFrame(
+            {
+                "vehicle": buses_df["VehicleNumber"].astype(str),
+                "time": pd.to_datetime(
+                    buses_df["Time"], format=TIME_FORMAT, errors="coerce"
+                ),
+                "lat": pd.to_numeric(buses_df["Lat"], errors="coerce"),
+                "lon": pd.to_numeric(buses_df["Lon"], errors="coerce"),
+                "line": buses_df["Lines"].astype(str),
+                "brigade": buses_df["Brigade"].astype(str),
+            }
+        ).dropna(subset=["time", "lat", "lon"])
+        frame = frame.sort_values(["vehicle", "time"], kind="stable")
+
+        seconds = frame["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        vehicle_codes, vehicles = pd.factorize(frame["vehicle"], sort=True)
+        line_codes, lines = pd.factorize(frame["line"], sort=True)
+        brigade_codes, brigades = pd.factorize(frame["brigade"], sort=True)
+
+        counts = np.bincount(vehicle_codes, minlength=len(vehicles))
+        offsets = np.zeros(len(vehicles) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        base_time = seconds[offsets[:-1]]
+
+        tables = {
+            "vehicles": np.asarray(vehicles, dtype=str),
+            "lines": np.asarray(lines, dtype=str),
+            "brigades": np.asarray(brigades, dtype=str),
+            "offsets": offsets,
+            "base_time": base_time,
+        }
+        columns = {
+            "time": (seconds - np.repeat(base_time, counts)).astype(np.int32),
+            "lat": np.round(frame["lat"].to_numpy() * COORD_SCALE).astype(np.int32),
+            "lon": np.round(frame["lon"].to_numpy() * COORD_SCALE).astype(np.int32),
+            "line": line_codes.astype(np.int32),
+            "brigade": brigade_codes.astype(np.int32),
+        }
+        return cls(tables, columns)
+
+    def save(self, path: str) -> None:
+        """Writes the store as a directory of ``.npy`` files."""
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        for name in _COLUMNS:
+            np.save(os.path.join(path, f"{name}.npy"), self.columns[name])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "TrajectoryStore":
+        """Opens a saved store, memory-mapping the per-fix columns by default."""
+        mode = "r" if mmap else None
+        tables = {name: np.load(os.path.join(path, f"{name}.npy")) for name in _ARRAYS}
+        columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in _COLUMNS
+        }
+        return cls(tables, columns)
+
+    def __len__(self) -> int:
+        return len(self.vehicles)
+
+    @property
+    def n_fixes(self) -> int:
+        """Total number of stored fixes."""
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """Size of all stored arrays in bytes."""
+        arrays = [getattr(self, name) for name in _ARRAYS] + list(self.columns.values())
+        return int(sum(array.nbytes for array in arrays))
+
+    def vehicle_slice(self, vehicle: str, start=None, end=None) -> slice:
+        """Returns the range of fixes of ``vehicle`` within ``[start, end)``."""
+        i = self._index[str(vehicle)]
+        first, last = int(self.offsets[i]), int(self.offsets[i + 1])
+        times = self.columns["time"][first:last]
+        if start is not None:
+            first += int(np.searchsorted(times, self._relative(i, start), "left"))
+        if end is not None:
+            last = int(self.offsets[i]) + int(
+                np.searchsorted(times, self._relative(i, end), "left")
+            )
+        return slice(first, max(first, last))
+
+    def vehicle(self, vehicle: str, start=None, end=None) -> Trajectory:
+        """Decodes the fixes of ``vehicle``, optionally limited to a time range."""
+        i = self._index[str(vehicle)]
+        return self._decode(i, self.vehicle_slice(vehicle, start, end))
+
+    def iter_vehicles(self, start=None, end=None):
+        """Yields a ``Trajectory`` per vehicle, optionally limited to a time range."""
+        for vehicle in self.vehicles:
+            yield self.vehicle(vehicle, start, end)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Decodes the whole store back into a ``fetch_buses_data``-like frame."""
+        counts = np.diff(self.offsets)
+        seconds = np.repeat(self.base_time, counts) + self.columns["time"]
+        return pd.DataFrame(
+            {
+                "Lines": self.lines[self.columns["line"]],
+                "Lon": self.columns["lon"] / COORD_SCALE,
+                "VehicleNumber": np.repeat(self.vehicles, counts),
+                "Time": seconds.astype("datetime64[s]").astype(str),
+                "Lat": self.columns["lat"] / COORD_SCALE,
+                "Brigade": self.brigades[self.columns["brigade"]],
+            }
+        ).assign(Time=lambda df: df["Time"].str.replace("T", " "))
+
+    def _relative(self, i: int, moment) -> int:
+        seconds = np.datetime64(pd.Timestamp(moment), "s").astype(np.int64)
+        return int(seconds - self.base_time[i])
+
+    def _decode(self, i: int, rows: slice) -> Trajectory:
+        seconds = self.base_time[i] + self.columns["time"][rows].astype(np.int64)
+        return Trajectory(
+            vehicle=str(self.vehicles[i]),
+            time=seconds.astype("datetime64[s]"),
+            lat=self.columns["lat"][rows] / COORD_SCALE,
+            lon=self.columns["lon"][rows] / COORD_SCALE,
+            line=self.lines[self.columns["line"][rows]],
+        )
@@ -0,0 +1,91 @@
+"""Stop-to-stop travel times aggregated from detected stop arrivals."""
+
+import numpy as np
+import pandas as pd
+
+from .columnar import load_frame, save_frame
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+MAX_SEGMENT_S = 30 * 60  # longer gaps mean a missed stop or a layover
+PERCENTILES = (0.1, 0.5, 0.9)
+KEY = ["line", "from_stop", "from_stop_number", "to_stop", "to_stop_number", "hour"]
+
+
+def stop_sequences(routes_df: pd.DataFrame) -> pd.DataFrame:
+    """Returns each pair of consecutive stops on every line and direction."""
+    routes = routes_df[
+        ["route", "direction", "bus_id", "nr_zespolu", "nr_przystanku"]
+    ].assign(order=lambda df: pd.to_numeric(df["bus_id"], errors="coerce"))
+    routes = routes.sort_values(["route", "direction", "order"], kind="stable")
+    following = routes.groupby(["route", "direction"])[
+        ["nr_zespolu", "nr_przystanku"]
+    ].shift(-1)
+    return (
+        pd.DataFrame(
+            {
+                "line": routes["route"].astype(str),
+                "direction": routes["direction"],
+                "from_stop": routes["nr_zespolu"],
+                "from_stop_number": routes["nr_przystanku"],
+                "to_stop": following["nr_zespolu"],
+                "to_stop_number": following["nr_przystanku"],
+            }
+        )
+        .dropna(subset=["to_stop"])
+        .reset_index(drop=True)
+    )
+
+
+def segment_traversals(
+    arrivals: pd.DataFrame, sequences: pd.DataFrame, max_segment=MAX_SEGMENT_S
+) -> pd.DataFrame:
+    """Pairs consecutive arrivals of a vehicle that form a segment of its line."""
+    arrivals = arrivals.assign(
+        t=pd.to_datetime(arrivals["Time"], format=TIME_FORMAT)
+    ).sort_values(["VehicleNumber", "t"], kind="stable")
+    following = arrivals.shift(-1)
+    same_run = (arrivals["VehicleNumber"] == following["VehicleNumber"]) & (
+        arrivals["Lines"] == following["Lines"]
+    )
+    seconds = (following["t"] - arrivals["t"]).dt.total_seconds()
+    traversals = pd.DataFrame(
+        {
+            "line": arrivals["Lines"].astype(str),
+            "from_stop": arrivals["nearest_stop"],
+            "from_stop_number": arrivals["nearest_stop_number"],
+            "to_stop": following["nearest_stop"],
+            "to_stop_number": following["nearest_stop_number"],
+            "hour": arrivals["t"].dt.hour.astype(np.int8),
+            "travel_time": seconds,
+        }
+    )[same_run & (seconds > 0) & (seconds <= max_segment)]
+    pairs = sequences.drop(columns="direction").drop_duplicates()
+    return traversals.merge(pairs, on=KEY[:-1], how="inner")
+
+
+def travel_time_matrix(traversals: pd.DataFrame) -> pd.DataFrame:
+    """Aggregates traversals per line, segment and hour with percentiles."""
+    grouped = traversals.groupby(KEY, observed=True)["travel_time"]
+    matrix = grouped.agg(count="size", mean="mean")
+    # reindex keeps the percentile columns when there are no traversals
+    quantiles = (
+        grouped.quantile(list(PERCENTILES))
+        .unstack()
+        .reindex(columns=list(PERCENTILES))
+        .rename(columns=lambda q: f"p{round(q * 100)}")
+    )
+    matrix = matrix.join(quantiles).reset_index()
+    matrix["count"] = matrix["count"].astype(np.int32)
+    for column in ["mean", *quantiles.columns]:
+        matrix[column] = matrix[column].astype(np.float32)
+    return matrix
+
+
+def save_travel_time_matrix(matrix: pd.DataFrame, path: str) -> None:
+    """Stores the matrix column by column for fast partial loading."""
+    save_frame(matrix, path)
+
+
+def load_travel_time_matrix(path: str, columns=None) -> pd.DataFrame:
+    """Loads a matrix written by ``save_travel_time_matrix``."""
+    return load_frame(path, columns=columns)
@@ -0,0 +1,52 @@
+import pandas as pd
+from bus_analysis.utils.cube import MetricCube
+
+
+def test_rollup_matches_raw_rows(tmp_path):
+    punctuality = pd.DataFrame(
+        {
+            "Lines": ["190", "190", "190", "523"],
+            "VehicleNumber": ["1", "1", "1", "2"],
+            "Time": [
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:01:00",
+                "2024-02-19 11:00:00",
+                "2024-02-20 10:00:00",
+            ],
+            "Lat": [52.2, 52.21, 52.21, 52.3],
+            "Lon": [21.0, 21.0, 21.0, 21.1],
+            "nearest_stop": ["1001", "1001", "1002", "1001"],
+            "lateness": [2.2, 4.1, None, -1.4],
+        }
+    )
+    MetricCube.from_punctuality(punctuality).save(tmp_path)
+    cube = MetricCube.load(tmp_path)
+
+    by_line = cube.rollup(["line"], quantiles=[0.5]).set_index("line")
+    monday = cube.rollup(filters={"weekday": 0, "hour": [10, 11]})
+
+    assert by_line.loc["190", "lateness_count"] == 2
+    assert by_line.loc["190", "lateness_mean"] == 3.15
+    assert by_line.loc["190", "lateness_p50"] == 2.5
+    assert by_line.loc["190", "violations"] == 1  # 1.1 km in a minute
+    assert monday["lateness_count"].tolist() == [2]
+    assert monday["speed_count"].tolist() == [2]
+
+
+def test_fixes_without_a_stop_are_left_out():
+    punctuality = pd.DataFrame(
+        {
+            "Lines": ["190", "190"],
+            "VehicleNumber": ["1", "1"],
+            "Time": ["2024-02-19 10:00:00", "2024-02-19 10:01:00"],
+            "Lat": [52.2, 52.2],
+            "Lon": [21.0, 21.0],
+            "nearest_stop": pd.Series(["1001", None], dtype=object),
+            "lateness": [2.0, 3.0],
+        }
+    )
+
+    cells = MetricCube.from_punctuality(punctuality).cells
+
+    assert cells["stop"].tolist() == ["1001"]
+    assert cells["lateness_count"].tolist() == [1]
@@ -0,0 +1,97 @@
+import pandas as pd
+from bus_analysis.utils.eta import EtaService
+
+
+def make_service():
+    # Three stops 0.004 deg (about 270 m) apart along 52.2 N, served both ways.
+    stops_df = pd.DataFrame(
+        {
+            "zespol": ["1001", "1002", "1003"],
+            "slupek": ["01", "01", "01"],
+            "szer_geo": ["52.2", "52.2", "52.2"],
+            "dlug_geo": ["21.000", "21.004", "21.008"],
+        }
+    )
+    routes_df = pd.DataFrame(
+        {
+            "route": ["190"] * 6,
+            "direction": ["A"] * 3 + ["B"] * 3,
+            "bus_id": ["1", "2", "3"] * 2,
+            "nr_zespolu": ["1001", "1002", "1003", "1003", "1002", "1001"],
+            "nr_przystanku": ["01"] * 6,
+        }
+    )
+    matrix = pd.DataFrame(
+        {
+            "line": ["190", "190"],
+            "from_stop": ["1001", "1002"],
+            "from_stop_number": ["01", "01"],
+            "to_stop": ["1002", "1003"],
+            "to_stop_number": ["01", "01"],
+            "hour": [10, 10],
+            "p50": [60.0, 60.0],
+        }
+    )
+    return EtaService(matrix, routes_df, stops_df)
+
+
+def positions(time, lon):
+    return pd.DataFrame(
+        {
+            "Lines": ["190"],
+            "Lon": [lon],
+            "VehicleNumber": ["1001"],
+            "Time": [time],
+            "Lat": [52.2],
+            "Brigade": ["1"],
+        }
+    )
+
+
+class StubApi:
+    def __init__(self, *polls):
+        self.polls = list(polls)
+
+    def request_loc(self):
+        return self.polls.pop(0)
+
+
+def test_eta_adds_remaining_segment_and_following_segments():
+    service = make_service()
+    service.refresh(StubApi(positions("2024-02-19 10:00:00", 21.002)))
+
+    # Halfway through 1001 -> 1002 (60 s), then 1002 -> 1003 (60 s).
+    (eta,) = [e for e in service.eta("190", "1003") if e.direction == "A"]
+
+    assert eta.vehicle == "1001"
+    assert eta.seconds == 90
+    assert eta.arrival == pd.Timestamp("2024-02-19 10:01:30")
+
+
+def test_replay_keeps_only_the_direction_of_travel():
+    service = make_service()
+    capture = pd.concat(
+        [
+            positions("2024-02-19 10:00:00", 21.001),
+            positions("2024-02-19 10:00:30", 21.002),
+        ]
+    )
+
+    polls = list(service.replay(capture))
+
+    assert len(polls) == 2
+    assert [e.direction for e in service.eta("190", "1003")] == ["A"]
+    assert service.eta("190", "1001") == []
+    assert service.eta("190", "1003", now="2024-02-19 10:00:50")[0].seconds == 70
+
+
+def test_progress_of_stale_vehicles_is_forgotten():
+    service = make_service()
+    other = positions("2024-02-19 10:10:00", 21.002).assign(VehicleNumber="2002")
+    service.update(positions("2024-02-19 10:00:00", 21.002))
+    assert {vehicle for vehicle, _ in service.progress} == {"1001"}
+
+    service.update(other)
+
+    assert {vehicle for vehicle, _ in service.progress} == {"2002"}
+    assert [e.vehicle for e in service.eta("190", "1003")] == ["2002"]
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+from bus_analysis.utils import export
+from bus_analysis.utils.export import export_punctuality, load_punctuality_export
+
+
+def make_punctuality(day):
+    return pd.DataFrame(
+        {
+            "VehicleNumber": ["1001", "1001", "1002"],
+            "Lines": ["190", "190", "523"],
+            "Brigade": ["01", "01", "02"],
+            "Time": [f"{day} 10:00:00", f"{day} 10:01:00", f"{day} 10:02:00"],
+            "nearest_stop": ["1001", "1002", "1001"],
+            "nearest_stop_number": ["01", "01", "02"],
+            "distance_to_stop": [5.0, 40.0, 3.0],
+            "is_at_stop": [True, False, True],
+            "lateness": [1.5, None, -0.5],
+        }
+    )
+
+
+def test_only_at_stop_rows_are_exported_per_partition(tmp_path):
+    rows = export_punctuality(make_punctuality("2024-02-19"), tmp_path, fmt="csv")
+
+    exported = load_punctuality_export(tmp_path, fmt="csv")
+
+    assert rows == 2
+    assert sorted(exported["line"]) == ["190", "523"]
+    assert set(exported["date"]) == {"2024-02-19"}
+    assert exported.sort_values("line")["Brigade"].tolist() == ["01", "02"]
+    assert (tmp_path / "date=2024-02-19" / "line=190").is_dir()
+
+
+def test_append_adds_captures_and_reexport_replaces_own_files(tmp_path):
+    export_punctuality(make_punctuality("2024-02-19"), tmp_path, fmt="csv")
+    export_punctuality(make_punctuality("2024-02-20"), tmp_path, fmt="csv")
+    export_punctuality(make_punctuality("2024-02-20"), tmp_path, fmt="csv")
+    assert len(load_punctuality_export(tmp_path, fmt="csv")) == 4
+
+    export_punctuality(
+        make_punctuality("2024-02-20"),
+        tmp_path,
+        fmt="csv",
+        columns=["Time", "lateness"],
+        append=False,
+    )
+    exported = load_punctuality_export(tmp_path, fmt="csv")
+    assert len(exported) == 2
+    assert list(exported.columns) == ["Time", "lateness", "date", "line"]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    export_punctuality(make_punctuality("2024-02-19"), tmp_path)
+
+    exported = load_punctuality_export(tmp_path)
+
+    assert len(exported) == 2
+    assert exported.sort_values("line")["Brigade"].tolist() == ["01", "02"]
+
+
+def test_parquet_without_engine_fails_before_touching_the_dataset(
+    tmp_path, monkeypatch
+):
+    export_punctuality(make_punctuality("2024-02-19"), tmp_path, fmt="csv")
+    monkeypatch.setattr(export.importlib.util, "find_spec", lambda name: None)
+
+    with pytest.raises(ImportError, match='fmt="csv"'):
+        export_punctuality(make_punctuality("2024-02-20"), tmp_path, append=False)
+    assert len(load_punctuality_export(tmp_path, fmt="csv")) == 2
+
+
+def test_capture_without_timestamps_exports_nothing(tmp_path):
+    export_punctuality(make_punctuality("2024-02-19"), tmp_path, fmt="csv")
+    empty = make_punctuality("2024-02-20").iloc[:0]
+    unparseable = make_punctuality("2024-02-20").assign(Time="not a time")
+
+    for capture in (empty, unparseable):
+        rows = export_punctuality(capture, tmp_path, fmt="csv", append=False)
+        assert rows == 0
+    assert len(load_punctuality_export(tmp_path, fmt="csv")) == 2
@@ -0,0 +1,74 @@
+import pandas as pd
+from bus_analysis.utils.headways import (
+    compute_headways,
+    headways_per_line_hour,
+    scheduled_departures,
+)
+
+
+def test_headways_and_bunching_against_timetable():
+    arrivals = pd.DataFrame(
+        {
+            "VehicleNumber": ["3", "1", "2", "4"],
+            "Lines": ["190", "190", "190", "523"],
+            "Time": [
+                "2024-02-19 10:11:00",
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:10:00",
+                "2024-02-19 10:05:00",
+            ],
+            "nearest_stop": ["1001"] * 4,
+            "nearest_stop_number": ["01"] * 4,
+        }
+    )
+    timetables = pd.DataFrame(
+        {
+            "route": ["190", "523"],
+            "nr_zespolu": ["1001", "1001"],
+            "nr_przystanku": ["01", "01"],
+            "times": [["09:50:00", "10:00:00", "10:10:00", "10:20:00"], []],
+        }
+    )
+
+    headways = compute_headways(arrivals, scheduled_departures(timetables))
+    summary = headways_per_line_hour(headways)
+
+    assert headways["VehicleNumber"].tolist() == ["2", "3"]
+    assert headways["headway"].tolist() == [600, 60]
+    assert headways["scheduled_headway"].tolist() == [600, 600]
+    assert headways["is_bunched"].tolist() == [False, True]
+    assert summary["bunching_share"].tolist() == [0.5]
+
+
+def test_arrivals_after_midnight_match_24h_timetable_times():
+    arrivals = pd.DataFrame(
+        {
+            "VehicleNumber": ["1", "2", "3", "4"],
+            "Lines": ["N01"] * 4,
+            "Time": [
+                "2024-02-19 23:59:00",
+                "2024-02-20 00:10:00",
+                "2024-02-20 00:11:00",
+                # Next evening: no headway back to the previous night
+                "2024-02-20 23:59:00",
+            ],
+            "nearest_stop": ["1001"] * 4,
+            "nearest_stop_number": ["01"] * 4,
+        }
+    )
+    timetables = pd.DataFrame(
+        {
+            "route": ["N01"],
+            "nr_zespolu": ["1001"],
+            "nr_przystanku": ["01"],
+            "times": [["23:50:00", "24:00:00", "24:10:00", "24:20:00"]],
+        }
+    )
+
+    headways = compute_headways(arrivals, scheduled_departures(timetables))
+
+    assert headways["VehicleNumber"].tolist() == ["2", "3"]
+    assert headways["headway"].tolist() == [660, 60]
+    assert headways["scheduled_headway"].tolist() == [600, 600]
+    assert headways["is_bunched"].tolist() == [False, True]
+    assert headways["hour"].tolist() == [0, 0]
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from bus_analysis import analysis
+from bus_analysis.utils.hll import HyperLogLogSet
+
+
+def test_estimates_close_to_exact_counts():
+    frame = pd.DataFrame(
+        {
+            "stop": np.repeat(["1001", "1002", "1003"], [5, 500, 5000]),
+            "vehicle": np.concatenate([np.arange(5), np.arange(500), np.arange(5000)]),
+        }
+    )
+
+    estimate = HyperLogLogSet.from_frame(frame, "stop", "vehicle").estimate()
+    exact = frame.groupby("stop")["vehicle"].nunique()
+
+    assert estimate.round()["1001"] == 5
+    assert estimate.to_numpy() == pytest.approx(exact.to_numpy(), rel=0.1)
+
+
+def test_merge_of_saved_captures_counts_union(tmp_path):
+    monday, tuesday = HyperLogLogSet(), HyperLogLogSet()
+    monday.update(["1001"] * 300, range(300))
+    tuesday.update(["1001"] * 300 + ["1002"], list(range(200, 500)) + [7])
+    monday.save(tmp_path / "monday")
+    tuesday.save(tmp_path / "tuesday")
+
+    merged = HyperLogLogSet.load(tmp_path / "monday").merge(
+        HyperLogLogSet.load(tmp_path / "tuesday")
+    )
+
+    assert list(merged.keys) == ["1001", "1002"]
+    assert merged.estimate()["1001"] == pytest.approx(500, rel=0.1)
+    assert merged.estimate().round()["1002"] == 1
+
+
+def _capture(time, vehicles, stops=None):
+    return pd.DataFrame(
+        {
+            "Time": [time] * len(vehicles),
+            "nearest_stop": stops or ["1001"] * len(vehicles),
+            "Lines": ["190"] * len(vehicles),
+            "VehicleNumber": vehicles,
+        }
+    )
+
+
+def test_merged_violation_summary_counts_distinct_vehicles(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis, "VEHICLE_SKETCHES_PATH", str(tmp_path))
+    # Vehicle 2 speeds at stop 1001 twice in each capture, vehicle 9 is the
+    # only one seen at stop 1002 and speeds there every time
+    for day, vehicles in (("19", ["1", "2"]), ("20", ["2", "3"])):
+        time = f"2024-02-{day} 10:00:00"
+        analysis.save_capture_sketches(
+            _capture(time, vehicles + ["9"], ["1001", "1001", "1002"]),
+            _capture(time, ["2", "2", "9", "9"], ["1001", "1001", "1002", "1002"]),
+        )
+
+    summary = analysis.merged_violation_summary(str(tmp_path))
+
+    assert summary.loc["1001", "Violating Vehicles"] == 1
+    assert summary.loc["1001", "Vehicles"] == 3
+    assert summary.loc["1001", "Percentage"] == pytest.approx(100 / 3)
+    assert summary.loc["1002", "Percentage"] == 100
+    assert summary["Percentage"].between(0, 100).all()
+
+
+def test_capture_without_timestamps_is_not_stored(tmp_path, monkeypatch):
+    monkeypatch.setattr(analysis, "VEHICLE_SKETCHES_PATH", str(tmp_path))
+
+    sketches = analysis.save_capture_sketches(
+        _capture("not a time", ["1", "2"]), _capture("not a time", [])
+    )
+
+    assert sketches.estimate().round()["1001"] == 2
+    assert list(tmp_path.iterdir()) == []
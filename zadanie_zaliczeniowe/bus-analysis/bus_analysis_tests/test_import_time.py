@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = {"pandas", "numpy", "sklearn", "scipy", "folium", "requests"}
+IMPORT_BUDGET_US = 500_000  # on top of importing dagster itself
+
+
+def import_times():
+    """Cumulative import time in microseconds per module of a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bus_analysis"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, _, total, name = line.replace("import time:", "|").split("|")
+        cumulative.setdefault(name.strip(), int(total))
+    return cumulative
+
+
+def test_code_location_does_not_import_heavy_libraries():
+    imported = {name.split(".")[0] for name in import_times()}
+
+    assert not imported & HEAVY_MODULES
+
+
+def test_code_location_import_time_budget():
+    times = import_times()
+
+    assert times["bus_analysis"] - times["dagster"] < IMPORT_BUDGET_US
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from bus_analysis.utils import metadata
+
+
+def test_preview_is_bounded_and_sorted():
+    frame = pd.DataFrame({"stop": [str(i) for i in range(1000)], "count": range(1000)})
+
+    table = metadata.preview(frame, rows=1000, sort_by="count").value
+
+    assert len(table.splitlines()) == 2 + metadata.MAX_PREVIEW_ROWS
+    assert "| 999 " in table.splitlines()[2]
+
+
+def test_summary_matches_describe():
+    frame = pd.DataFrame({"a": [1.0, 2.0, np.nan, 7.0], "b": [0, 5, 5, 10]})
+
+    table = metadata.summary(frame).value
+
+    assert table == metadata._markdown(frame.describe()).value
+
+
+def test_histogram_clamps_to_range_and_stratified_preview_spreads_groups():
+    lateness = pd.Series([-100, 0, 1, 2, 200])
+    frame = pd.DataFrame({"line": list("aabbccdd"), "value": range(8)})
+
+    histogram = metadata.histogram(lateness, bins=2, value_range=(-30, 90)).value
+    sample = metadata.stratified_preview(frame, "line", rows=2).value
+
+    assert [row.split("|")[-2].strip() for row in histogram.splitlines()[2:]] == [
+        "4",
+        "1",
+    ]
+    assert "| a " in sample and "| d " in sample and "| b " not in sample
+
+
+def test_long_texts_are_cut():
+    frame = pd.DataFrame(
+        {
+            "stops": ["1001, " * 20, "1002"],
+            "names": pd.Series(["x" * 100, "y"], dtype=object),
+        }
+    )
+
+    table = metadata.preview(frame).value
+
+    assert table.count("…") == 2
+    assert "1001, " * 20 not in table and "x" * 100 not in table
+    assert "| 1002 " in table
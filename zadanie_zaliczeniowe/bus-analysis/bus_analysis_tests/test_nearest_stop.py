@@ -0,0 +1,29 @@
+import pandas as pd
+from bus_analysis.analysis import find_nearest_stop
+
+
+def test_repeated_positions_share_the_nearest_stop():
+    # The bus waits at the first stop for two polls, then drives to the second.
+    buses_df = pd.DataFrame(
+        {
+            "Lines": ["190"] * 3,
+            "Lat": [52.2, 52.2, 52.21],
+            "Lon": [21.0, 21.0, 21.0],
+        }
+    )
+    stops_df = pd.DataFrame(
+        {
+            "route": ["190", "190"],
+            "nr_zespolu": ["1001", "1002"],
+            "nr_przystanku": ["01", "02"],
+            "szer_geo": ["52.2", "52.21"],
+            "dlug_geo": ["21.0", "21.0001"],
+        }
+    )
+
+    result = find_nearest_stop(stops_df, buses_df)
+
+    assert result["nearest_stop"].tolist() == ["1001", "1001", "1002"]
+    assert result["nearest_stop_number"].tolist() == ["01", "01", "02"]
+    assert result["is_at_stop"].tolist() == [True, True, True]
+    assert result["distance_to_stop"].iloc[2] > 6
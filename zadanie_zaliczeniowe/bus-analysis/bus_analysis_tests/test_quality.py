@@ -0,0 +1,77 @@
+import pandas as pd
+from bus_analysis.utils.quality import clean_positions
+
+
+def make_buses(times, lats, lons, polls=None):
+    buses_df = pd.DataFrame(
+        {
+            "Lines": ["190"] * len(times),
+            "Lon": lons,
+            "VehicleNumber": ["1001"] * len(times),
+            "Time": times,
+            "Lat": lats,
+            "Brigade": ["1"] * len(times),
+        }
+    )
+    if polls is not None:
+        buses_df["PollTime"] = polls
+    return buses_df
+
+
+def test_teleport_spike_is_dropped():
+    # The third fix jumps about 11 km away for 10 seconds and comes back.
+    buses_df = make_buses(
+        [
+            "2024-02-19 10:00:00",
+            "2024-02-19 10:00:10",
+            "2024-02-19 10:00:20",
+            "2024-02-19 10:00:30",
+        ],
+        [52.2, 52.2001, 52.3, 52.2002],
+        [21.0, 21.0, 21.0, 21.0],
+    )
+
+    cleaned, dropped = clean_positions(buses_df)
+
+    assert cleaned["Lat"].tolist() == [52.2, 52.2001, 52.2002]
+    assert dropped["teleport"] == 1
+
+
+def test_stale_invalid_and_out_of_area_fixes_are_dropped():
+    buses_df = make_buses(
+        [
+            "2024-02-19 10:00:00",
+            "2024-02-19 09:00:00",
+            "not a time",
+            "2024-02-19 10:00:20",
+        ],
+        [52.2, 52.2, 52.2, 50.0],
+        [21.0, 21.0, 21.0, 21.0],
+        polls=["2024-02-19 10:00:05"] * 4,
+    )
+
+    cleaned, dropped = clean_positions(buses_df)
+
+    assert cleaned["Time"].tolist() == ["2024-02-19 10:00:00"]
+    assert dropped == {
+        "invalid": 1,
+        "stale": 1,
+        "out_of_area": 1,
+        "duplicate": 0,
+        "teleport": 0,
+    }
+
+
+def test_duplicate_of_a_dropped_fix_is_kept():
+    # The first copy of the 10:00:00 fix is out of area, the second is valid.
+    buses_df = make_buses(
+        ["2024-02-19 10:00:00", "2024-02-19 10:00:00", "2024-02-19 10:00:00"],
+        [50.0, 52.2, 52.2],
+        [21.0, 21.0, 21.0],
+    )
+
+    cleaned, dropped = clean_positions(buses_df)
+
+    assert cleaned["Lat"].tolist() == [52.2]
+    assert dropped["out_of_area"] == 1
+    assert dropped["duplicate"] == 1
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from bus_analysis.utils.route_shapes import RouteShapes, route_speeds
+
+
+def make_shapes():
+    # Line 190 runs along 52.2 N; line 523 along a parallel street 80 m north.
+    stops_df = pd.DataFrame(
+        {
+            "zespol": ["1001", "1002", "1003", "2001", "2002"],
+            "slupek": ["01", "01", "01", "01", "01"],
+            "szer_geo": ["52.2", "52.2", "52.2", "52.20072", "52.20072"],
+            "dlug_geo": ["21.000", "21.004", "21.008", "21.000", "21.008"],
+        }
+    )
+    routes_df = pd.DataFrame(
+        {
+            "route": ["190", "190", "190", "523", "523"],
+            "direction": ["A", "A", "A", "B", "B"],
+            "bus_id": ["1", "2", "3", "1", "2"],
+            "nr_zespolu": ["1001", "1002", "1003", "2001", "2002"],
+            "nr_przystanku": ["01"] * 5,
+        }
+    )
+    return RouteShapes.from_routes(routes_df, stops_df)
+
+
+def test_fixes_match_only_their_own_line_shape():
+    buses_df = pd.DataFrame(
+        {
+            "Lines": ["523", "523", "190"],
+            "VehicleNumber": ["2", "2", "3"],
+            "Time": [
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:00:30",
+                "2024-02-19 10:00:00",
+            ],
+            # Both 523 fixes are closer to line 190's street than to their
+            # own; the 190 fix is far off its route.
+            "Lat": [52.2001, 52.2001, 52.21],
+            "Lon": [21.003, 21.006, 21.004],
+        }
+    )
+
+    matched = make_shapes().match(buses_df)
+    speeds = route_speeds(buses_df, matched)
+
+    assert matched["direction"].tolist()[:2] == ["B", "B"]
+    assert matched["nearest_stop"].tolist()[:2] == ["2001", "2002"]
+    assert matched["along_route_m"].iloc[0] == pytest.approx(204.7, abs=1)
+    assert pd.isna(matched["direction"].iloc[2])
+    assert speeds.iloc[1] == pytest.approx(24.6, abs=0.1)
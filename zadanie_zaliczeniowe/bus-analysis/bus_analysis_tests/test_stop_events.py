@@ -0,0 +1,58 @@
+import pandas as pd
+from bus_analysis.analysis import find_punctuality
+from bus_analysis.utils.stop_events import detect_stop_arrivals, line_stops
+
+
+def make_inputs():
+    # Bus drives east along 52.2 N; the stop lies halfway between two fixes.
+    buses_df = pd.DataFrame(
+        {
+            "Lines": ["190"] * 3,
+            "Lon": [21.000, 21.004, 21.008],
+            "VehicleNumber": ["1001"] * 3,
+            "Time": [
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:00:30",
+                "2024-02-19 10:01:00",
+            ],
+            "Lat": [52.2, 52.2, 52.2],
+            "Brigade": ["1"] * 3,
+        }
+    )
+    stops_df = pd.DataFrame(
+        {
+            "zespol": ["1001", "1002"],
+            "slupek": ["01", "01"],
+            "szer_geo": ["52.20005", "52.21"],
+            "dlug_geo": ["21.002", "21.002"],
+        }
+    )
+    routes_df = pd.DataFrame(
+        {
+            "route": ["190", "190"],
+            "nr_zespolu": ["1001", "1002"],
+            "nr_przystanku": ["01", "01"],
+            "bus_id": ["2", "3"],
+        }
+    )
+    return buses_df, stops_df, routes_df
+
+
+def test_arrival_is_interpolated_between_fixes():
+    buses_df, stops_df, routes_df = make_inputs()
+
+    arrivals = detect_stop_arrivals(buses_df, line_stops(routes_df, stops_df))
+
+    assert arrivals["nearest_stop"].tolist() == ["1001"]
+    assert arrivals["Time"].tolist() == ["2024-02-19 10:00:15"]
+    assert arrivals["distance_to_stop"].iloc[0] < 6
+
+
+def test_arrivals_feed_find_punctuality():
+    buses_df, stops_df, routes_df = make_inputs()
+    arrivals = detect_stop_arrivals(buses_df, line_stops(routes_df, stops_df))
+    routes_df["times"] = [["10:00:00"], ["10:05:00"]]
+
+    result = find_punctuality(routes_df, arrivals)
+
+    assert result["lateness"].tolist() == [0.25]
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from bus_analysis.utils.trajectory_store import TrajectoryStore
+
+
+@pytest.fixture
+def buses_df():
+    return pd.DataFrame(
+        {
+            "Lines": ["190", "190", "523", "190", "523"],
+            "Lon": [21.0, 21.001, 20.95, 21.002, 20.951],
+            "VehicleNumber": ["1001", "1001", "2002", "1001", "2002"],
+            "Time": [
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:00:30",
+                "2024-02-19 10:00:10",
+                "2024-02-19 10:01:00",
+                "2024-02-19 10:00:40",
+            ],
+            "Lat": [52.2, 52.201, 52.25, 52.202, 52.251],
+            "Brigade": ["1", "1", "7", "1", "7"],
+        }
+    )
+
+
+def test_round_trip_through_mmap(buses_df, tmp_path):
+    TrajectoryStore.from_frame(buses_df).save(tmp_path)
+    store = TrajectoryStore.load(tmp_path)
+
+    assert isinstance(store.columns["lat"], np.memmap)
+    assert store.columns["time"].dtype == np.int32
+    expected = buses_df.sort_values(["VehicleNumber", "Time"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        store.to_frame(), expected, check_dtype=False, check_exact=False
+    )
+
+
+def test_vehicle_time_range_slicing(buses_df):
+    store = TrajectoryStore.from_frame(buses_df)
+
+    trajectory = store.vehicle("1001", "2024-02-19 10:00:15", "2024-02-19 10:01:00")
+
+    assert len(store) == 2
+    assert trajectory.time.astype(str).tolist() == ["2024-02-19T10:00:30"]
+    assert trajectory.lat.tolist() == [52.201]
+    assert store.vehicle_slice("2002") == slice(3, 5)
@@ -0,0 +1,69 @@
+import pandas as pd
+from bus_analysis.utils.travel_times import (
+    load_travel_time_matrix,
+    save_travel_time_matrix,
+    segment_traversals,
+    stop_sequences,
+    travel_time_matrix,
+)
+
+
+def test_matrix_from_consecutive_arrivals(tmp_path):
+    routes_df = pd.DataFrame(
+        {
+            "route": ["190"] * 3,
+            "direction": ["A"] * 3,
+            "bus_id": ["1", "2", "10"],
+            "nr_zespolu": ["1001", "1002", "1003"],
+            "nr_przystanku": ["01"] * 3,
+        }
+    )
+    arrivals = pd.DataFrame(
+        {
+            "VehicleNumber": ["1", "1", "1", "2", "2"],
+            "Lines": ["190"] * 5,
+            "Time": [
+                "2024-02-19 10:00:00",
+                "2024-02-19 10:01:00",
+                "2024-02-19 10:04:00",
+                "2024-02-19 10:30:00",
+                "2024-02-19 10:32:00",
+            ],
+            "nearest_stop": ["1001", "1002", "1003", "1001", "1002"],
+            "nearest_stop_number": ["01"] * 5,
+        }
+    )
+
+    matrix = travel_time_matrix(segment_traversals(arrivals, stop_sequences(routes_df)))
+    save_travel_time_matrix(matrix, tmp_path)
+    loaded = load_travel_time_matrix(tmp_path).set_index(["from_stop", "to_stop"])
+
+    assert loaded.loc[("1001", "1002"), "count"] == 2
+    assert loaded.loc[("1001", "1002"), "p50"] == 90
+    assert loaded.loc[("1002", "1003"), "mean"] == 180
+
+
+def test_matrix_without_traversals():
+    routes_df = pd.DataFrame(
+        {
+            "route": ["190"] * 2,
+            "direction": ["A"] * 2,
+            "bus_id": ["1", "2"],
+            "nr_zespolu": ["1001", "1002"],
+            "nr_przystanku": ["01"] * 2,
+        }
+    )
+    arrivals = pd.DataFrame(
+        {
+            "VehicleNumber": ["1"],
+            "Lines": ["190"],
+            "Time": ["2024-02-19 10:00:00"],
+            "nearest_stop": ["1001"],
+            "nearest_stop_number": ["01"],
+        }
+    )
+
+    matrix = travel_time_matrix(segment_traversals(arrivals, stop_sequences(routes_df)))
+
+    assert matrix.empty
+    assert list(matrix.columns[-5:]) == ["count", "mean", "p10", "p50", "p90"]
@@ -13,6 +13,7 @@ setup(
             "scikit-learn",
             "folium",
             "pylint",
+            "pyarrow",
         ]
     },
 )
@@ -1 +1 @@
-pytest ulamek_testy.py
\ No newline at end of file
+pytest ulamek_testy.py ulamek_array_testy.py ulamek_binarny_testy.py ulamek_redukcja_testy.py
\ No newline at end of file
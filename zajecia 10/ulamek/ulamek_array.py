@@ -0,0 +1,249 @@
+import sys
+
+import numpy as np
+
+from .ulamek_rozszerzony import Ułamek
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def _max_abs(tablica):
+    if len(tablica) == 0:
+        return 0
+    return max(int(tablica.max()), -int(tablica.min()))
+
+
+def _bezpieczne(*pary):
+    # Sprowadza tablice do typu object, jeśli suma iloczynów par może
+    # przekroczyć zakres int64; inaczej zostawia je jako int64.
+    granica = sum(_max_abs(a) * _max_abs(b) for a, b in pary)
+    if granica <= INT64_MAX:
+        return lambda tablica: tablica
+    return lambda tablica: tablica.astype(object)
+
+
+class UłamekArray:
+    """Wektor ułamków trzymany w dwóch tablicach: liczników i mianowników.
+
+    Tablice mają typ int64, a gdy wynik działania mógłby wyjść poza jego
+    zakres, typ object (liczby całkowite Pythona dowolnej wielkości).
+    """
+
+    __slots__ = ("licznik", "mianownik")
+
+    def __init__(self, licznik, mianownik=None):
+        licznik = self._tablica(licznik)
+        if mianownik is None:
+            mianownik = np.ones(len(licznik), dtype=np.int64)
+        mianownik = self._tablica(mianownik)
+        assert np.all(mianownik != 0), "Mianownik nie może być zerowy"
+        if licznik.dtype != mianownik.dtype:
+            licznik, mianownik = licznik.astype(object), mianownik.astype(object)
+        gcd = np.gcd(licznik, mianownik)
+        gcd = np.where(mianownik < 0, -gcd, gcd)
+        self.licznik = self._zwez(licznik // gcd)
+        self.mianownik = self._zwez(mianownik // gcd)
+        if self.licznik.dtype != self.mianownik.dtype:
+            self.licznik = self.licznik.astype(object)
+            self.mianownik = self.mianownik.astype(object)
+
+    @staticmethod
+    def _tablica(wartosci):
+        wartosci = np.asarray(wartosci)
+        if wartosci.dtype == object:
+            return UłamekArray._zwez(wartosci)
+        return wartosci.astype(np.int64)
+
+    @staticmethod
+    def _zwez(tablica):
+        # Wraca do int64, gdy wszystkie wartości się w nim mieszczą.
+        if tablica.dtype == object and _max_abs(tablica) <= INT64_MAX:
+            return tablica.astype(np.int64)
+        return tablica
+
+    @classmethod
+    def z_ulamkow(cls, ulamki):
+        liczniki = [u.licznik for u in ulamki]
+        mianowniki = [u.mianownik for u in ulamki]
+        return cls(np.array(liczniki, dtype=object), np.array(mianowniki, dtype=object))
+
+    def do_listy(self):
+        return [Ułamek(int(l), int(m)) for l, m in zip(self.licznik, self.mianownik)]
+
+    def __len__(self):
+        return len(self.licznik)
+
+    def __getitem__(self, indeks):
+        if isinstance(indeks, (int, np.integer)):
+            return Ułamek(int(self.licznik[indeks]), int(self.mianownik[indeks]))
+        return UłamekArray(self.licznik[indeks], self.mianownik[indeks])
+
+    def __str__(self):
+        return (
+            "["
+            + ", ".join(f"{l}/{m}" for l, m in zip(self.licznik, self.mianownik))
+            + "]"
+        )
+
+    def __repr__(self):
+        return f"UłamekArray({self.licznik!r}, {self.mianownik!r})"
+
+    def _pary(self, other):
+        # Drugi argument jako para tablic: UłamekArray, Ułamek lub liczba całkowita.
+        if isinstance(other, UłamekArray):
+            return other.licznik, other.mianownik
+        if isinstance(other, Ułamek):
+            return np.array([other.licznik], dtype=object), np.array(
+                [other.mianownik], dtype=object
+            )
+        if isinstance(other, (int, np.integer)):
+            return np.array([int(other)], dtype=object), np.array([1], dtype=object)
+        return NotImplemented
+
+    def _dzialanie(self, other, wynik):
+        pary = self._pary(other)
+        if pary is NotImplemented:
+            return NotImplemented
+        l1, m1 = self.licznik, self.mianownik
+        l2, m2 = (self._zwez(t) for t in pary)
+        return wynik(l1, m1, l2, m2)
+
+    def __add__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, m2), (l2, m1), (m1, m2))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l1 * m2 + l2 * m1, m1 * m2)
+
+        return self._dzialanie(other, wynik)
+
+    def __sub__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, m2), (l2, m1), (m1, m2))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l1 * m2 - l2 * m1, m1 * m2)
+
+        return self._dzialanie(other, wynik)
+
+    def __mul__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, l2), (m1, m2))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l1 * l2, m1 * m2)
+
+        return self._dzialanie(other, wynik)
+
+    def __truediv__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, m2), (m1, l2))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l1 * m2, m1 * l2)
+
+        return self._dzialanie(other, wynik)
+
+    def __rsub__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, m2), (l2, m1), (m1, m2))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l2 * m1 - l1 * m2, m1 * m2)
+
+        return self._dzialanie(other, wynik)
+
+    def __rtruediv__(self, other):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l2, m1), (m2, l1))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return UłamekArray(l2 * m1, m2 * l1)
+
+        return self._dzialanie(other, wynik)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    # Porównania, element po elemencie; wynikiem jest tablica bool
+    def _porownaj(self, other, porownanie):
+        def wynik(l1, m1, l2, m2):
+            typ = _bezpieczne((l1, m2), (l2, m1))
+            l1, m1, l2, m2 = typ(l1), typ(m1), typ(l2), typ(m2)
+            return np.asarray(porownanie(l1 * m2, l2 * m1), dtype=bool)
+
+        return self._dzialanie(other, wynik)
+
+    def __eq__(self, other):
+        return self._porownaj(other, np.equal)
+
+    def __ne__(self, other):
+        return self._porownaj(other, np.not_equal)
+
+    def __lt__(self, other):
+        return self._porownaj(other, np.less)
+
+    def __le__(self, other):
+        return self._porownaj(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._porownaj(other, np.greater)
+
+    def __ge__(self, other):
+        return self._porownaj(other, np.greater_equal)
+
+    __hash__ = None
+
+    # Redukcje parami (drzewo), żeby pośrednie mianowniki rosły powoli
+    def _redukuj(self, dzialanie, neutralny):
+        wektor = self
+        while len(wektor) > 1:
+            polowa = len(wektor) // 2
+            reszta = wektor[2 * polowa :]
+            wektor = dzialanie(wektor[:polowa], wektor[polowa : 2 * polowa])
+            if len(reszta):
+                wektor = UłamekArray(
+                    np.concatenate([wektor.licznik, reszta.licznik]),
+                    np.concatenate([wektor.mianownik, reszta.mianownik]),
+                )
+        return wektor[0] if len(wektor) else neutralny
+
+    def suma(self):
+        return self._redukuj(UłamekArray.__add__, Ułamek(0, 1))
+
+    def iloczyn(self):
+        return self._redukuj(UłamekArray.__mul__, Ułamek(1, 1))
+
+
+def generuj_ulamki(n):
+    return UłamekArray(np.random.randint(1, 11, n), np.random.randint(1, 11, n))
+
+
+def wykonaj_operacje(ulamki, k):
+    # To samo co pętla ulamki[i] += ulamki[(i + 1) % n]: każdy element poza
+    # ostatnim dodaje jeszcze niezmieniony następny, a ostatni już
+    # zmieniony pierwszy.
+    n = len(ulamki)
+    if n == 0:
+        return
+    for _ in range(k):
+        poczatek = ulamki[:-1] + ulamki[1:]
+        pierwszy = poczatek[0:1] if n > 1 else ulamki[0:1]
+        ostatni = ulamki[n - 1 :] + pierwszy
+        wynik = UłamekArray(
+            np.concatenate([poczatek.licznik, ostatni.licznik]),
+            np.concatenate([poczatek.mianownik, ostatni.mianownik]),
+        )
+        ulamki.licznik, ulamki.mianownik = wynik.licznik, wynik.mianownik
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(
+            "Użycie: python -m ulamek.ulamek_array [n-liczba ulamkow] [k-liczba petli]"
+        )
+        sys.exit(1)
+
+    n = int(sys.argv[1])
+    k = int(sys.argv[2])
+
+    ulamki = generuj_ulamki(n)
+    wykonaj_operacje(ulamki, k)
+
+
+if __name__ == "__main__":
+    main()
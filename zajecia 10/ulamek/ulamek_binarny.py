@@ -0,0 +1,150 @@
+import shutil
+import struct
+import tempfile
+
+import numpy as np
+
+from .ulamek_array import UłamekArray
+from .ulamek_rozszerzony import Ułamek
+
+# Plik: nagłówek (znacznik, liczba ułamków, przesunięcie części z dużymi
+# liczbami), potem dla każdego ułamka para int64 (licznik, mianownik).
+# Ułamek, który nie mieści się w int64, ma zamiast licznika ZNACZNIK_DUZEJ,
+# a zamiast mianownika przesunięcie swojego wpisu w części z dużymi
+# liczbami, zapisanej za wszystkimi parami: długość i bajty licznika,
+# długość i bajty mianownika.
+ZNACZNIK = b"ULAMEK1\0"
+NAGLOWEK = struct.Struct("<8sQQ")
+DLUGOSC = struct.Struct("<I")
+REKORD = np.dtype([("licznik", "<i8"), ("mianownik", "<i8")])
+ZNACZNIK_DUZEJ = np.iinfo(np.int64).min
+MIN_INT64 = ZNACZNIK_DUZEJ + 1
+MAX_INT64 = np.iinfo(np.int64).max
+ROZMIAR_PORCJI = 65536
+
+
+def _do_bajtow(liczba):
+    dane = liczba.to_bytes((liczba.bit_length() + 8) // 8, "little", signed=True)
+    return DLUGOSC.pack(len(dane)) + dane
+
+
+def _z_bajtow(plik):
+    (dlugosc,) = DLUGOSC.unpack(plik.read(DLUGOSC.size))
+    return int.from_bytes(plik.read(dlugosc), "little", signed=True)
+
+
+def zapisz_ulamki(ulamki, nazwa_pliku):
+    # ulamki może być dowolnym iterowalnym, także generatorem; w pamięci
+    # jest naraz tylko jedna porcja par.
+    liczba = 0
+    with open(nazwa_pliku, "wb") as plik, tempfile.TemporaryFile() as duze:
+        plik.write(NAGLOWEK.pack(ZNACZNIK, 0, 0))
+        porcja = []
+        for ulamek in ulamki:
+            licznik, mianownik = ulamek.licznik, ulamek.mianownik
+            if not (MIN_INT64 <= licznik <= MAX_INT64 and mianownik <= MAX_INT64):
+                porcja.append((ZNACZNIK_DUZEJ, duze.tell()))
+                duze.write(_do_bajtow(licznik) + _do_bajtow(mianownik))
+            else:
+                porcja.append((licznik, mianownik))
+            if len(porcja) == ROZMIAR_PORCJI:
+                plik.write(np.array(porcja, dtype=REKORD).tobytes())
+                liczba += len(porcja)
+                porcja = []
+        plik.write(np.array(porcja, dtype=REKORD).tobytes())
+        liczba += len(porcja)
+
+        poczatek_duzych = plik.tell()
+        duze.seek(0)
+        shutil.copyfileobj(duze, plik)
+        plik.seek(0)
+        plik.write(NAGLOWEK.pack(ZNACZNIK, liczba, poczatek_duzych))
+    return liczba
+
+
+def _naglowek(plik):
+    znacznik, liczba, poczatek_duzych = NAGLOWEK.unpack(plik.read(NAGLOWEK.size))
+    if znacznik != ZNACZNIK:
+        raise ValueError("Niepoprawny plik ułamków")
+    return liczba, poczatek_duzych
+
+
+def _ulamek(licznik, mianownik, duze, poczatek_duzych):
+    if licznik == ZNACZNIK_DUZEJ:
+        duze.seek(poczatek_duzych + mianownik)
+        licznik = _z_bajtow(duze)
+        mianownik = _z_bajtow(duze)
+        return Ułamek(licznik, mianownik)
+    return Ułamek.from_pair(licznik, mianownik)
+
+
+def czytaj_ulamki(nazwa_pliku, rozmiar_porcji=ROZMIAR_PORCJI):
+    # Generator czytający plik porcjami, dla plików większych niż pamięć
+    with open(nazwa_pliku, "rb") as plik, open(nazwa_pliku, "rb") as duze:
+        liczba, poczatek_duzych = _naglowek(plik)
+        while liczba:
+            ile = min(liczba, rozmiar_porcji)
+            porcja = np.frombuffer(plik.read(ile * REKORD.itemsize), dtype=REKORD)
+            for licznik, mianownik in porcja.tolist():
+                yield _ulamek(licznik, mianownik, duze, poczatek_duzych)
+            liczba -= ile
+
+
+def wczytaj_ulamki(nazwa_pliku):
+    return list(czytaj_ulamki(nazwa_pliku))
+
+
+class UłamkiZPliku:
+    """Ułamki z pliku zmapowanego w pamięci, tworzone dopiero przy odczycie."""
+
+    def __init__(self, nazwa_pliku):
+        with open(nazwa_pliku, "rb") as plik:
+            liczba, self.poczatek_duzych = _naglowek(plik)
+        if liczba:
+            self.pary = np.memmap(
+                nazwa_pliku,
+                dtype=REKORD,
+                mode="r",
+                offset=NAGLOWEK.size,
+                shape=(liczba,),
+            )
+        else:
+            self.pary = np.empty(0, dtype=REKORD)  # pustego pliku nie da się mapować
+        self._duze = open(nazwa_pliku, "rb")
+
+    def __len__(self):
+        return len(self.pary)
+
+    def __getitem__(self, indeks):
+        if isinstance(indeks, slice):
+            return [self[i] for i in range(*indeks.indices(len(self)))]
+        licznik, mianownik = self.pary[indeks].tolist()
+        return _ulamek(licznik, mianownik, self._duze, self.poczatek_duzych)
+
+    def __iter__(self):
+        for poczatek in range(0, len(self), ROZMIAR_PORCJI):
+            porcja = self.pary[poczatek : poczatek + ROZMIAR_PORCJI].tolist()
+            for licznik, mianownik in porcja:
+                yield _ulamek(licznik, mianownik, self._duze, self.poczatek_duzych)
+
+    def do_tablicy(self):
+        # Cały plik jako UłamekArray, bez tworzenia obiektów Ułamek
+        licznik = np.array(self.pary["licznik"])
+        mianownik = np.array(self.pary["mianownik"])
+        duze = np.flatnonzero(licznik == ZNACZNIK_DUZEJ)
+        if len(duze):
+            licznik, mianownik = licznik.astype(object), mianownik.astype(object)
+            for i in duze:
+                ulamek = self[int(i)]
+                licznik[i], mianownik[i] = ulamek.licznik, ulamek.mianownik
+        return UłamekArray(licznik, mianownik)
+
+    def close(self):
+        self._duze.close()
+        self.pary = np.empty(0, dtype=REKORD)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *wyjatek):
+        self.close()
@@ -0,0 +1,59 @@
+import operator
+from concurrent.futures import ProcessPoolExecutor
+
+from .ulamek_rozszerzony import Ułamek, ograniczona_precyzja
+
+# Porcji na proces: kilka, żeby wolniejszy proces nie wstrzymywał reszty
+PORCJI_NA_PROCES = 4
+
+
+def _drzewo(ulamki, dzialanie, neutralny):
+    # Łączy sąsiednie pary, potem pary wyników itd., więc pośrednie
+    # mianowniki rosną równomiernie, a nie od pierwszego ułamka. Używa
+    # dzialanie zamiast +=, żeby nie zmieniać ułamków z wejścia.
+    poziom = list(ulamki)
+    while len(poziom) > 1:
+        nastepny = [
+            dzialanie(poziom[i], poziom[i + 1]) for i in range(0, len(poziom) - 1, 2)
+        ]
+        if len(poziom) % 2:
+            nastepny.append(poziom[-1])
+        poziom = nastepny
+    return poziom[0] if poziom else neutralny
+
+
+def _redukuj_porcje(porcja, dzialanie, neutralny, maks_mianownik):
+    # Uruchamiane w procesie potomnym, który nie musi znać ustawień rodzica
+    with ograniczona_precyzja(maks_mianownik):
+        return _drzewo(porcja, dzialanie, neutralny)
+
+
+def _redukuj(ulamki, dzialanie, neutralny, procesy, rozmiar_porcji):
+    if not procesy or procesy < 2:
+        return _drzewo(ulamki, dzialanie, neutralny)
+    ulamki = list(ulamki)
+    if rozmiar_porcji is None:
+        rozmiar_porcji = max(1, -(-len(ulamki) // (procesy * PORCJI_NA_PROCES)))
+    porcje = [
+        ulamki[i : i + rozmiar_porcji] for i in range(0, len(ulamki), rozmiar_porcji)
+    ]
+    n = len(porcje)
+    with ProcessPoolExecutor(max_workers=procesy) as pula:
+        czesciowe = pula.map(
+            _redukuj_porcje,
+            porcje,
+            [dzialanie] * n,
+            [neutralny] * n,
+            [Ułamek.maks_mianownik] * n,
+        )
+        return _drzewo(czesciowe, dzialanie, neutralny)
+
+
+def sum_fractions(ulamki, procesy=None, rozmiar_porcji=None):
+    # Z procesy > 1 porcje listy są sumowane równolegle w osobnych
+    # procesach, a ich sumy łączone na końcu.
+    return _redukuj(ulamki, operator.add, Ułamek(0, 1), procesy, rozmiar_porcji)
+
+
+def prod_fractions(ulamki, procesy=None, rozmiar_porcji=None):
+    return _redukuj(ulamki, operator.mul, Ułamek(1, 1), procesy, rozmiar_porcji)
@@ -1,11 +1,28 @@
 import math
 import random
 import sys
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Ułamki o liczniku i mianowniku nie większych co do modułu niż
+# MAKS_WSPOLNY są w from_pair współdzielone; pamiętanych jest najwyżej
+# ROZMIAR_PAMIECI ostatnio używanych.
+MAKS_WSPOLNY = 1024
+ROZMIAR_PAMIECI = 4096
 
 
 class Ułamek:
     __slots__ = ("licznik", "mianownik")
 
+    # Tryb ograniczonej precyzji (domyślnie wyłączony): gdy maks_mianownik
+    # jest ustawiony, wynik każdego działania jest zastępowany najlepszym
+    # przybliżeniem o mianowniku nie większym niż maks_mianownik. Błąd
+    # jednego działania jest nie większy niż 1 / (2 * maks_mianownik); przy
+    # dodawaniu i odejmowaniu błędy argumentów się sumują, więc suma k
+    # ułamków różni się od dokładnej o co najwyżej k / (2 * maks_mianownik).
+    # Mianowniki nie rosną wtedy bez końca i koszt działania nie zależy od k.
+    maks_mianownik = None
+
     def __init__(self, licznik, mianownik):
         assert mianownik != 0, "Mianownik nie może być zerowy"
         gcd = math.gcd(licznik, mianownik)
@@ -21,25 +38,78 @@ class Ułamek:
     def __repr__(self):
         return f"Ułamek({self.licznik}, {self.mianownik})"
 
+    def przybliz(self, maks_mianownik):
+        # Najbliższy ułamek o mianowniku <= maks_mianownik (jak
+        # Fraction.limit_denominator), wyznaczany z ułamka łańcuchowego.
+        assert maks_mianownik >= 1, "Maksymalny mianownik musi być dodatni"
+        if self.mianownik <= maks_mianownik:
+            return self
+        return Ułamek(*_przybliz(self.licznik, self.mianownik, maks_mianownik))
+
     def __add__(self, other):
-        new_licznik = self.licznik * other.mianownik + other.licznik * self.mianownik
-        new_mianownik = self.mianownik * other.mianownik
-        return Ułamek(new_licznik, new_mianownik)
+        if type(other) is not Ułamek:
+            other = _operand(other)
+            if other is None:
+                return NotImplemented
+        licznik, mianownik = _suma(
+            self.licznik, self.mianownik, other.licznik, other.mianownik
+        )
+        return _skrocony(licznik, mianownik)
 
     def __sub__(self, other):
-        new_licznik = self.licznik * other.mianownik - other.licznik * self.mianownik
-        new_mianownik = self.mianownik * other.mianownik
-        return Ułamek(new_licznik, new_mianownik)
+        if type(other) is not Ułamek:
+            other = _operand(other)
+            if other is None:
+                return NotImplemented
+        licznik, mianownik = _suma(
+            self.licznik, self.mianownik, -other.licznik, other.mianownik
+        )
+        return _skrocony(licznik, mianownik)
 
     def __mul__(self, other):
-        new_licznik = self.licznik * other.licznik
-        new_mianownik = self.mianownik * other.mianownik
-        return Ułamek(new_licznik, new_mianownik)
+        if type(other) is not Ułamek:
+            other = _operand(other)
+            if other is None:
+                return NotImplemented
+        licznik, mianownik = _iloczyn(
+            self.licznik, self.mianownik, other.licznik, other.mianownik
+        )
+        return _skrocony(licznik, mianownik)
 
     def __truediv__(self, other):
-        new_licznik = self.licznik * other.mianownik
-        new_mianownik = self.mianownik * other.licznik
-        return Ułamek(new_licznik, new_mianownik)
+        if type(other) is not Ułamek:
+            other = _operand(other)
+            if other is None:
+                return NotImplemented
+        licznik, mianownik = _iloczyn(
+            self.licznik, self.mianownik, *_odwrotnosc(other.licznik, other.mianownik)
+        )
+        return _skrocony(licznik, mianownik)
+
+    def __radd__(self, other):
+        # Wywoływane tylko dla liczb całkowitych po lewej stronie
+        if not isinstance(other, int):
+            return NotImplemented
+        a, b = self.licznik, self.mianownik
+        return _skrocony(*_suma(other, 1, a, b))
+
+    def __rsub__(self, other):
+        if not isinstance(other, int):
+            return NotImplemented
+        a, b = self.licznik, self.mianownik
+        return _skrocony(*_suma(other, 1, -a, b))
+
+    def __rmul__(self, other):
+        if not isinstance(other, int):
+            return NotImplemented
+        a, b = self.licznik, self.mianownik
+        return _skrocony(*_iloczyn(other, 1, a, b))
+
+    def __rtruediv__(self, other):
+        if not isinstance(other, int):
+            return NotImplemented
+        a, b = self.licznik, self.mianownik
+        return _skrocony(*_iloczyn(other, 1, *_odwrotnosc(a, b)))
 
     # Porównania
     def __eq__(self, other):
@@ -57,6 +127,25 @@ class Ułamek:
     def __ge__(self, other):
         return self.licznik * other.mianownik >= other.licznik * self.mianownik
 
+    # Zgodny z __eq__, bo ułamki są zawsze skrócone. Ułamek jest niezmienny:
+    # żadne działanie (także +=) nie zmienia istniejącego obiektu, dlatego
+    # może być kluczem słownika i być współdzielony przez from_pair.
+    def __hash__(self):
+        return hash((self.licznik, self.mianownik))
+
+    @classmethod
+    def from_pair(cls, licznik, mianownik):
+        # Małe ułamki są brane z pamięci podręcznej, więc wiele równych
+        # ułamków to jeden obiekt
+        assert mianownik != 0, "Mianownik nie może być zerowy"
+        gcd = math.gcd(licznik, mianownik)
+        if mianownik < 0:
+            gcd = -gcd
+        licznik, mianownik = licznik // gcd, mianownik // gcd
+        if -MAKS_WSPOLNY <= licznik <= MAKS_WSPOLNY and mianownik <= MAKS_WSPOLNY:
+            return _wspolny(licznik, mianownik)
+        return cls(licznik, mianownik)
+
     def zapisz_do_pliku(self, nazwa_pliku):
         with open(nazwa_pliku, "w") as plik:
             plik.write(f"{self.licznik}/{self.mianownik}")
@@ -69,8 +158,110 @@ class Ułamek:
             return cls(licznik, mianownik)
 
 
+@lru_cache(maxsize=ROZMIAR_PAMIECI)
+def _wspolny(licznik, mianownik):
+    ulamek = object.__new__(Ułamek)
+    ulamek.licznik = licznik
+    ulamek.mianownik = mianownik
+    return ulamek
+
+
+def _operand(other):
+    # Drugi argument działania jako Ułamek albo None, gdy to nie ułamek ani
+    # liczba całkowita. Działania wołają ją tylko, gdy other nie jest
+    # dokładnie Ułamkiem, więc najczęstszy przypadek nie płaci za wywołanie.
+    if isinstance(other, Ułamek):
+        return other
+    if isinstance(other, int):
+        return _skrocony(other, 1)
+    return None
+
+
+def _skrocony(licznik, mianownik):
+    # Zaufany konstruktor dla wyników już skróconych, z dodatnim
+    # mianownikiem: pomija asercję i ponowne liczenie gcd z __init__.
+    if Ułamek.maks_mianownik is not None and mianownik > Ułamek.maks_mianownik:
+        licznik, mianownik = _przybliz(licznik, mianownik, Ułamek.maks_mianownik)
+    ulamek = object.__new__(Ułamek)
+    ulamek.licznik = licznik
+    ulamek.mianownik = mianownik
+    return ulamek
+
+
+# Działania na parach (licznik, mianownik) skróconych, z dodatnim
+# mianownikiem; wyniki też są skrócone, więc nie trzeba ich normalizować.
+def _suma(a, b, c, d):
+    if b == d:
+        if b == 1:
+            return a + c, 1
+        licznik = a + c
+        g = math.gcd(licznik, b)
+        return licznik // g, b // g
+    if d == 1:
+        return a + c * b, b
+    if b == 1:
+        return a * d + c, d
+    # Dzielenie przez gcd mianowników przed mnożeniem daje mniejsze liczby
+    g = math.gcd(b, d)
+    if g == 1:
+        return a * d + b * c, b * d
+    s = b // g
+    t = a * (d // g) + c * s
+    g2 = math.gcd(t, g)
+    if g2 == 1:
+        return t, s * d
+    return t // g2, s * (d // g2)
+
+
+def _iloczyn(a, b, c, d):
+    if b == 1 and d == 1:
+        return a * c, 1
+    g1 = math.gcd(a, d)
+    g2 = math.gcd(c, b)
+    return (a // g1) * (c // g2), (b // g2) * (d // g1)
+
+
+def _odwrotnosc(licznik, mianownik):
+    assert licznik != 0, "Mianownik nie może być zerowy"
+    if licznik < 0:
+        return -mianownik, -licznik
+    return mianownik, licznik
+
+
+def _przybliz(licznik, mianownik, maks_mianownik):
+    p0, q0, p1, q1 = 0, 1, 1, 0
+    n, d = licznik, mianownik
+    while True:
+        a = n // d
+        q2 = q0 + a * q1
+        if q2 > maks_mianownik:
+            break
+        p0, q0, p1, q1 = p1, q1, p0 + a * p1, q2
+        n, d = d, n - a * d
+    k = (maks_mianownik - q0) // q1
+    # Dwaj kandydaci: ostatni redukt i najlepsze przybliżenie pośrednie
+    p2, q2 = p0 + k * p1, q0 + k * q1
+    blad1 = abs(p1 * mianownik - licznik * q1) * q2
+    blad2 = abs(p2 * mianownik - licznik * q2) * q1
+    if blad1 <= blad2:
+        return p1, q1
+    return p2, q2
+
+
+@contextmanager
+def ograniczona_precyzja(maks_mianownik):
+    poprzedni = Ułamek.maks_mianownik
+    Ułamek.maks_mianownik = maks_mianownik
+    try:
+        yield
+    finally:
+        Ułamek.maks_mianownik = poprzedni
+
+
 def generuj_ulamki(n):
-    return [Ułamek(random.randint(1, 10), random.randint(1, 10)) for _ in range(n)]
+    return [
+        Ułamek.from_pair(random.randint(1, 10), random.randint(1, 10)) for _ in range(n)
+    ]
 
 
 def wykonaj_operacje(ulamki, k):
@@ -80,15 +271,20 @@ def wykonaj_operacje(ulamki, k):
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Użycie: python skrypt.py [n-liczba ulamkow] [k-liczba petli]")
+    if len(sys.argv) not in (3, 4):
+        print(
+            "Użycie: python skrypt.py [n-liczba ulamkow] [k-liczba petli]"
+            " [maksymalny mianownik (opcjonalnie)]"
+        )
         sys.exit(1)
 
     n = int(sys.argv[1])
     k = int(sys.argv[2])
+    maks_mianownik = int(sys.argv[3]) if len(sys.argv) == 4 else None
 
     ulamki = generuj_ulamki(n)
-    wykonaj_operacje(ulamki, k)
+    with ograniczona_precyzja(maks_mianownik):
+        wykonaj_operacje(ulamki, k)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+import random
+
+import numpy as np
+import pytest
+from ulamek.ulamek_array import UłamekArray, wykonaj_operacje
+from ulamek.ulamek_rozszerzony import Ułamek
+from ulamek.ulamek_rozszerzony import wykonaj_operacje as wykonaj_operacje_ulamki
+
+
+def test_skracanie_i_znak():
+    ulamki = UłamekArray([2, 3, 0], [-4, 9, 5])
+    assert ulamki.do_listy() == [Ułamek(-1, 2), Ułamek(1, 3), Ułamek(0, 1)]
+    assert ulamki.licznik.dtype == np.int64
+
+
+def test_dzialania_i_porownania():
+    a = UłamekArray([1, 2], [2, 3])
+    b = UłamekArray([1, 1], [3, 6])
+    assert (a + b).do_listy() == [Ułamek(5, 6), Ułamek(5, 6)]
+    assert (a - b).do_listy() == [Ułamek(1, 6), Ułamek(1, 2)]
+    assert (a * b).do_listy() == [Ułamek(1, 6), Ułamek(1, 9)]
+    assert (a / b).do_listy() == [Ułamek(3, 2), Ułamek(4, 1)]
+    assert (a * 2).do_listy() == [Ułamek(1, 1), Ułamek(4, 3)]
+    assert (1 - a).do_listy() == [Ułamek(1, 2), Ułamek(1, 3)]
+    assert (1 / a).do_listy() == [Ułamek(2, 1), Ułamek(3, 2)]
+    assert (Ułamek(1, 3) - a).do_listy() == [Ułamek(-1, 6), Ułamek(-1, 3)]
+    assert (Ułamek(1, 3) / a).do_listy() == [Ułamek(2, 3), Ułamek(1, 2)]
+    assert list(a > Ułamek(1, 2)) == [False, True]
+    assert list(a == UłamekArray([2, 4], [4, 6])) == [True, True]
+
+
+def test_przepelnienie_int64():
+    duze = UłamekArray([2**62], [3])
+    wynik = duze * duze + duze
+    assert wynik.licznik.dtype == object
+    assert wynik[0] == Ułamek(2**124, 9) + Ułamek(2**62, 3)
+    # Po skróceniu wartości mieszczące się w int64 wracają do int64
+    assert (wynik - wynik).licznik.dtype == np.int64
+
+
+def test_suma_i_iloczyn():
+    ulamki = [Ułamek(random.randint(1, 10), random.randint(1, 50)) for _ in range(101)]
+    suma, iloczyn = Ułamek(0, 1), Ułamek(1, 1)
+    for ulamek in ulamki:
+        suma, iloczyn = suma + ulamek, iloczyn * ulamek
+    wektor = UłamekArray.z_ulamkow(ulamki)
+    assert wektor.suma() == suma
+    assert wektor.iloczyn() == iloczyn
+
+
+@pytest.mark.parametrize("n, k", [(1, 3), (2, 2), (10, 1), (100, 4)])
+def test_wykonaj_operacje_jak_petla(n, k):
+    ulamki = [Ułamek(random.randint(1, 10), random.randint(1, 10)) for _ in range(n)]
+    wektor = UłamekArray.z_ulamkow(ulamki)
+    wykonaj_operacje_ulamki(ulamki, k)
+    wykonaj_operacje(wektor, k)
+    assert wektor.do_listy() == ulamki
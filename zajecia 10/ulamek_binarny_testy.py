@@ -0,0 +1,60 @@
+import pytest
+from ulamek.ulamek_binarny import (
+    UłamkiZPliku,
+    czytaj_ulamki,
+    wczytaj_ulamki,
+    zapisz_ulamki,
+)
+from ulamek.ulamek_rozszerzony import Ułamek
+
+ULAMKI = [
+    Ułamek(1, 2),
+    Ułamek(-7, 3),
+    Ułamek(0, 1),
+    Ułamek(2**63 - 1, 2),
+    Ułamek(-(2**63) + 1, 1),
+    # Nie mieszczą się w int64
+    Ułamek(-(2**63), 1),
+    Ułamek(3, 2**64 + 1),
+    Ułamek(-(10**100) - 1, 10**90),
+]
+
+
+@pytest.fixture
+def plik(tmp_path):
+    nazwa_pliku = tmp_path / "ulamki.bin"
+    assert zapisz_ulamki(iter(ULAMKI), nazwa_pliku) == len(ULAMKI)
+    return nazwa_pliku
+
+
+def test_wczytaj_ulamki(plik):
+    assert wczytaj_ulamki(plik) == ULAMKI
+
+
+@pytest.mark.parametrize("rozmiar_porcji", [1, 3, 100])
+def test_czytaj_ulamki_porcjami(plik, rozmiar_porcji):
+    assert list(czytaj_ulamki(plik, rozmiar_porcji)) == ULAMKI
+
+
+def test_ulamki_z_pliku(plik):
+    with UłamkiZPliku(plik) as ulamki:
+        assert len(ulamki) == len(ULAMKI)
+        assert ulamki[-1] == ULAMKI[-1]
+        assert ulamki[4:7] == ULAMKI[4:7]
+        assert list(ulamki) == ULAMKI
+        assert ulamki.do_tablicy().do_listy() == ULAMKI
+
+
+def test_pusty_plik(tmp_path):
+    nazwa_pliku = tmp_path / "pusty.bin"
+    assert zapisz_ulamki([], nazwa_pliku) == 0
+    assert wczytaj_ulamki(nazwa_pliku) == []
+    with UłamkiZPliku(nazwa_pliku) as ulamki:
+        assert len(ulamki) == 0
+
+
+def test_niepoprawny_plik(tmp_path):
+    nazwa_pliku = tmp_path / "tekst.bin"
+    nazwa_pliku.write_bytes(b"1/2" * 10)
+    with pytest.raises(ValueError):
+        wczytaj_ulamki(nazwa_pliku)
@@ -0,0 +1,46 @@
+import random
+from fractions import Fraction
+
+import pytest
+from ulamek.ulamek_redukcja import prod_fractions, sum_fractions
+from ulamek.ulamek_rozszerzony import Ułamek, ograniczona_precyzja
+
+
+@pytest.fixture
+def ulamki():
+    random.seed(0)
+    return [Ułamek(random.randint(-50, 50), random.randint(1, 50)) for _ in range(101)]
+
+
+def _fraction(ulamek):
+    return Fraction(ulamek.licznik, ulamek.mianownik)
+
+
+@pytest.mark.parametrize("procesy, rozmiar_porcji", [(None, None), (2, None), (2, 7)])
+def test_sum_fractions(ulamki, procesy, rozmiar_porcji):
+    wynik = sum_fractions(ulamki, procesy=procesy, rozmiar_porcji=rozmiar_porcji)
+    assert _fraction(wynik) == sum(_fraction(u) for u in ulamki)
+
+
+@pytest.mark.parametrize("procesy", [None, 2])
+def test_prod_fractions(ulamki, procesy):
+    ulamki = [u for u in ulamki if u.licznik != 0][:30]
+    oczekiwany = Fraction(1)
+    for ulamek in ulamki:
+        oczekiwany *= _fraction(ulamek)
+    assert _fraction(prod_fractions(ulamki, procesy=procesy)) == oczekiwany
+
+
+def test_puste_i_wejscie_bez_zmian(ulamki):
+    assert sum_fractions([]) == Ułamek(0, 1)
+    assert prod_fractions([]) == Ułamek(1, 1)
+    kopia = [Ułamek(u.licznik, u.mianownik) for u in ulamki]
+    sum_fractions(ulamki)
+    assert ulamki == kopia
+
+
+def test_ograniczona_precyzja_w_procesach():
+    ulamki = [Ułamek(1, p) for p in (3, 7, 11, 13, 17, 19, 23, 29)]
+    with ograniczona_precyzja(100):
+        wynik = sum_fractions(ulamki, procesy=2, rozmiar_porcji=2)
+    assert wynik.mianownik <= 100
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import mock_open, patch
-from ulamek.ulamek_rozszerzony import Ułamek
+from fractions import Fraction
+from ulamek.ulamek_rozszerzony import Ułamek, ograniczona_precyzja, wykonaj_operacje
 
 
 @pytest.fixture(params=[(1, 2, "1/2"), (3, 4, "3/4"), (2, 3, "2/3")])
@@ -31,3 +32,120 @@ def test_wczytaj_z_pliku(mock_data, expected_ulamek):
     with patch("builtins.open", mock_open(read_data=mock_data)):
         ulamek = Ułamek.wczytaj_z_pliku(nazwa_pliku)
         assert ulamek == expected_ulamek
+
+
+# Test przybliżania ułamka ułamkiem o ograniczonym mianowniku
+@pytest.mark.parametrize(
+    "licznik, mianownik, maks",
+    [(314159, 100000, 7), (-314159, 100000, 113), (1, 3, 10), (10**40 + 1, 10**40, 50)],
+)
+def test_przybliz(licznik, mianownik, maks):
+    wynik = Ułamek(licznik, mianownik).przybliz(maks)
+    oczekiwany = Fraction(licznik, mianownik).limit_denominator(maks)
+    assert wynik == Ułamek(oczekiwany.numerator, oczekiwany.denominator)
+    assert abs(
+        Fraction(licznik, mianownik) - Fraction(wynik.licznik, wynik.mianownik)
+    ) <= Fraction(1, 2 * maks)
+
+
+# Test trybu ograniczonej precyzji
+def test_ograniczona_precyzja():
+    ulamki = [Ułamek(1, p) for p in (3, 7, 11, 13, 17, 19, 23)]
+    dokladne = list(ulamki)
+    wykonaj_operacje(dokladne, 3)
+    with ograniczona_precyzja(1000):
+        wykonaj_operacje(ulamki, 3)
+        assert all(u.mianownik <= 1000 for u in ulamki)
+    assert Ułamek.maks_mianownik is None
+    for ulamek, dokladny in zip(ulamki, dokladne):
+        blad = Fraction(ulamek.licznik, ulamek.mianownik) - Fraction(
+            dokladny.licznik, dokladny.mianownik
+        )
+        assert abs(blad) < Fraction(1, 100)
+
+
+# Test działań z liczbami całkowitymi i działań w miejscu
+@pytest.mark.parametrize(
+    "wyrazenie, oczekiwany",
+    [
+        (lambda: Ułamek(1, 6) + Ułamek(1, 10), Ułamek(4, 15)),
+        (lambda: Ułamek(1, 6) - Ułamek(1, 6), Ułamek(0, 1)),
+        (lambda: Ułamek(4, 9) * Ułamek(3, -8), Ułamek(-1, 6)),
+        (lambda: Ułamek(2, 3) / Ułamek(-4, 9), Ułamek(-3, 2)),
+        (lambda: Ułamek(2, 3) + 1, Ułamek(5, 3)),
+        (lambda: 1 - Ułamek(2, 3), Ułamek(1, 3)),
+        (lambda: 3 * Ułamek(2, 9), Ułamek(2, 3)),
+        (lambda: 2 / Ułamek(-4, 5), Ułamek(-5, 2)),
+    ],
+)
+def test_dzialania(wyrazenie, oczekiwany):
+    wynik = wyrazenie()
+    assert (wynik.licznik, wynik.mianownik) == (
+        oczekiwany.licznik,
+        oczekiwany.mianownik,
+    )
+
+
+def test_dzialania_w_miejscu():
+    ulamek = Ułamek(1, 2)
+    poprzedni = ulamek
+    ulamek += Ułamek(1, 3)
+    ulamek *= 6
+    ulamek -= 1
+    ulamek /= Ułamek(2, 1)
+    assert ulamek == Ułamek(2, 1)
+    assert poprzedni == Ułamek(1, 2)
+
+
+def test_wykonaj_operacje_na_wspoldzielonych():
+    # Jak dla Fraction: += tworzy nowy ułamek, więc ten sam obiekt
+    # powtórzony na liście nie zmienia się we wszystkich miejscach naraz
+    ulamki = [Ułamek(1, 2)] * 3
+    wykonaj_operacje(ulamki, 1)
+    assert ulamki == [Ułamek(1, 1), Ułamek(1, 1), Ułamek(3, 2)]
+
+
+# Test haszowania i współdzielenia małych ułamków
+def test_hash():
+    assert hash(Ułamek(1, 2)) == hash(Ułamek(-2, -4))
+    assert len({Ułamek(1, 2), Ułamek(2, 4), Ułamek(1, 3)}) == 2
+    assert {Ułamek(3, 6): "pół"}[Ułamek(1, 2)] == "pół"
+
+
+def test_hash_i_dzialania_w_miejscu():
+    klucz = Ułamek(1, 2)
+    slownik = {klucz: "pół"}
+    ulamek = klucz
+    ulamek += 1
+    assert ulamek == Ułamek(3, 2) and ulamek is not klucz
+    assert klucz == Ułamek(1, 2)
+    assert slownik[Ułamek(1, 2)] == "pół"
+    assert Ułamek(3, 2) not in slownik
+
+
+def test_hash_bez_skutkow_ubocznych():
+    # += działa tak samo na ułamku haszowanym i niehaszowanym
+    for haszuj in (False, True):
+        x = Ułamek(1, 2)
+        if haszuj:
+            assert x not in {1}
+        y = x
+        x += 1
+        assert type(x) is type(y) is Ułamek
+        assert (x, y) == (Ułamek(3, 2), Ułamek(1, 2))
+
+
+def test_from_pair():
+    pol = Ułamek.from_pair(1, 2)
+    assert Ułamek.from_pair(-3, -6) is pol
+    assert pol == Ułamek(1, 2)
+    assert type(pol) is Ułamek
+    duzy = Ułamek.from_pair(10**6, 3)
+    assert duzy == Ułamek(10**6, 3) and Ułamek.from_pair(10**6, 3) is not duzy
+
+
+def test_from_pair_dzialania_w_miejscu():
+    ulamki = [Ułamek.from_pair(1, 2), Ułamek.from_pair(1, 2)]
+    wykonaj_operacje(ulamki, 2)
+    assert ulamki == [Ułamek(5, 2), Ułamek(4, 1)]
+    assert Ułamek.from_pair(1, 2) == Ułamek(1, 2)
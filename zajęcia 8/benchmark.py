@@ -0,0 +1,152 @@
+import argparse
+import csv
+import gc
+import importlib
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+KATALOG = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, KATALOG)
+sys.path.insert(0, os.path.join(KATALOG, "..", "zajecia 10"))
+
+# nazwa w raporcie: moduł z funkcjami generuj_ulamki i wykonaj_operacje
+IMPLEMENTACJE = {
+    "bez_slots": "ulamek_bez_slots",
+    "ze_slots": "ulamek_ze_slots",
+    "rozszerzony": "ulamek.ulamek_rozszerzony",
+    "array": "ulamek.ulamek_array",
+}
+N_WARTOSCI = [10000, 100000, 500000]
+K_WARTOSCI = [1, 2, 3]
+KOLUMNY = [
+    "implementacja",
+    "n",
+    "k",
+    "czas_generuj_s",
+    "czas_operacje_s",
+    "pamiec_ulamkow_mb",
+    "pamiec_szczytowa_mb",
+    "bloki",
+]
+
+
+def _ziarno(ziarno):
+    random.seed(ziarno)
+    np.random.seed(ziarno)
+
+
+def _wyczysc_pamiec(modul):
+    # Pamięć podręczna funkcji modułu (lru_cache w from_pair) z poprzedniego
+    # pomiaru skracałaby czas generowania i ukrywała alokacje ułamków.
+    for funkcja in vars(modul).values():
+        if hasattr(funkcja, "cache_clear"):
+            funkcja.cache_clear()
+
+
+def zmierz(modul, n, k, powtorzenia=3, ziarno=0):
+    # Czasy to minimum z kilku powtórzeń bez tracemalloc, który spowalnia
+    # alokacje; pamięć mierzona w osobnym przebiegu. Każdy pomiar zaczyna
+    # się z pustą pamięcią podręczną modułu.
+    czasy_generuj, czasy_operacje = [], []
+    for _ in range(powtorzenia):
+        _ziarno(ziarno)
+        _wyczysc_pamiec(modul)
+        gc.collect()
+        start = time.perf_counter()
+        ulamki = modul.generuj_ulamki(n)
+        czasy_generuj.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        modul.wykonaj_operacje(ulamki, k)
+        czasy_operacje.append(time.perf_counter() - start)
+        del ulamki
+
+    _ziarno(ziarno)
+    _wyczysc_pamiec(modul)
+    gc.collect()
+    tracemalloc.start()
+    ulamki = modul.generuj_ulamki(n)
+    pamiec_ulamkow = tracemalloc.get_traced_memory()[0]
+    bloki = sum(s.count for s in tracemalloc.take_snapshot().statistics("filename"))
+    modul.wykonaj_operacje(ulamki, k)
+    pamiec_szczytowa = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del ulamki
+
+    return {
+        "n": n,
+        "k": k,
+        "czas_generuj_s": min(czasy_generuj),
+        "czas_operacje_s": min(czasy_operacje),
+        "pamiec_ulamkow_mb": pamiec_ulamkow / 2**20,
+        "pamiec_szczytowa_mb": pamiec_szczytowa / 2**20,
+        "bloki": bloki,
+    }
+
+
+def uruchom(implementacje, n_wartosci, k_wartosci, powtorzenia=3):
+    wyniki = []
+    for nazwa in implementacje:
+        modul = importlib.import_module(IMPLEMENTACJE[nazwa])
+        for n in n_wartosci:
+            for k in k_wartosci:
+                wynik = {"implementacja": nazwa, **zmierz(modul, n, k, powtorzenia)}
+                print(raport([wynik], naglowek=not wyniki), file=sys.stderr)
+                wyniki.append(wynik)
+    return wyniki
+
+
+def raport(wyniki, naglowek=True):
+    wiersze = [KOLUMNY] if naglowek else []
+    for wynik in wyniki:
+        wiersze.append(
+            [
+                (
+                    f"{wynik[kolumna]:.3f}"
+                    if isinstance(wynik[kolumna], float)
+                    else str(wynik[kolumna])
+                )
+                for kolumna in KOLUMNY
+            ]
+        )
+    szerokosci = [max(len(kolumna), 12) for kolumna in KOLUMNY]
+    return "\n".join(
+        "  ".join(pole.rjust(szerokosc) for pole, szerokosc in zip(wiersz, szerokosci))
+        for wiersz in wiersze
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Porównanie czasu i pamięci implementacji ułamków"
+    )
+    parser.add_argument("--n", type=int, nargs="+", default=N_WARTOSCI)
+    parser.add_argument("--k", type=int, nargs="+", default=K_WARTOSCI)
+    parser.add_argument(
+        "--implementacje",
+        nargs="+",
+        choices=list(IMPLEMENTACJE),
+        default=list(IMPLEMENTACJE),
+    )
+    parser.add_argument("--powtorzenia", type=int, default=3)
+    parser.add_argument("--plik", default="wyniki_benchmarku.txt")
+    parser.add_argument("--csv", help="dodatkowo zapisz wyniki jako CSV")
+    args = parser.parse_args()
+
+    wyniki = uruchom(args.implementacje, args.n, args.k, args.powtorzenia)
+    # Względne ścieżki liczone od katalogu skryptu, a nie bieżącego
+    with open(os.path.join(KATALOG, args.plik), "w") as plik:
+        plik.write(raport(wyniki) + "\n")
+    if args.csv:
+        with open(os.path.join(KATALOG, args.csv), "w", newline="") as plik:
+            writer = csv.DictWriter(plik, fieldnames=KOLUMNY)
+            writer.writeheader()
+            writer.writerows(wyniki)
+
+
+if __name__ == "__main__":
+    main()
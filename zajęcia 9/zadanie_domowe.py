@@ -1,21 +1,77 @@
 import json
+import math
+import re
+from bisect import bisect_left, bisect_right, insort
+from itertools import chain
 
+import numpy as np
+
+# Weights of the features compared by Library.recommend. Year proximity
+# falls to half at YEAR_SCALE years apart.
+GENRE_WEIGHT = 2.0
+CREATOR_WEIGHT = 1.0
+YEAR_WEIGHT = 1.0
+YEAR_SCALE = 10
+
+# Item classes that can be loaded from a file, by the name stored in it
+ITEM_TYPES = {}
+
+def register_item_type(cls):
+    ITEM_TYPES[cls.__name__] = cls
+    return cls
+
+def item_from_record(record):
+    item_class = ITEM_TYPES.get(record['type'])
+    if item_class is None:
+        raise ValueError(f"Unknown item type: {record['type']}")
+    return item_class(**record['data'])
+
+def item_to_record(item):
+    return {'type': type(item).__name__, 'data': item.to_dict()}
+
+def tokenize(text):
+    return re.findall(r'\w+', str(text).lower())
+
+# Reads a JSON Lines catalog one item at a time, without building a Library
+def iter_items(filename, item_type=None):
+    with open(filename, 'r', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                item = item_from_record(json.loads(line))
+                if item_type is None or isinstance(item, item_type):
+                    yield item
+
+@register_item_type
 class Item:
+    # __slots__ instead of __dict__: items are small and there are many of them
+    __slots__ = ('title', 'creator', 'year')
+
     def __init__(self, title, creator, year):
         self.title = title
         self.creator = creator
         self.year = year
 
+    # Attributes in definition order, base class first, as __dict__ had them.
+    def to_dict(self):
+        return {
+            attribute: getattr(self, attribute)
+            for cls in reversed(type(self).__mro__)
+            for attribute in cls.__dict__.get('__slots__', ())
+        }
+
     # Method to print all the classed to prevent redundancy,
     # if any special suffixes like minutes or (ISBN) needed it can
     # be provided in dictionary. 
     def display_info(self, special_suffixes={}):
-        for attribute, value in self.__dict__.items():
+        for attribute, value in self.to_dict().items():
             suffix = special_suffixes.get(attribute, "")
             print(f"{attribute.capitalize()}: {value}{suffix}")
         print()
 
+@register_item_type
 class Book(Item):
+    __slots__ = ('genre', 'isbn')
+
     def __init__(self, title, creator, year, genre, isbn):
         super().__init__(title, creator, year)
         self.genre = genre
@@ -24,7 +80,10 @@ class Book(Item):
     def display_info(self):
         super().display_info(special_suffixes={"isbn": " (ISBN)"})
 
+@register_item_type
 class Movie(Item):
+    __slots__ = ('genre', 'duration')
+
     def __init__(self, title, creator, year, genre, duration):
         super().__init__(title, creator, year)
         self.genre = genre
@@ -37,9 +96,75 @@ class Movie(Item):
 class Library:
     def __init__(self):
         self.items = []
+        # Secondary indexes, kept up to date by add_item. Exact classes are
+        # keys, queries by a class also collect its subclasses.
+        self._by_type = {}
+        self._by_genre = {}
+        self._by_type_genre = {}
+        self._by_creator = {}
+        # Items per year and the distinct years in ascending order
+        self._by_year = {}
+        self._years = []
+        # Range (start, end) of self.items known to be in each JSON Lines file
+        self._saved = {}
+        # Inverted index: token of a title, creator or genre -> positions
+        # in self.items
+        self._postings = {}
+        # Features of every item as codes, turned into arrays on demand
+        self._codes = {}
+        self._features = {'type': [], 'genre': [], 'creator': [], 'year': []}
+        self._arrays = None
+        self._posting_arrays = {}
+        # Position of every item in self.items, by identity
+        self._positions = {}
 
+    # The indexes are built from the item's attributes when it is added and
+    # are not updated later, so an item must not be changed once added
+    # (replace it with a new item instead).
     def add_item(self, item):
         self.items.append(item)
+        self._by_type.setdefault(type(item), []).append(item)
+        self._by_creator.setdefault(item.creator, []).append(item)
+        genre = getattr(item, 'genre', None)
+        if genre is not None:
+            self._by_genre.setdefault(genre, []).append(item)
+            self._by_type_genre.setdefault((type(item), genre), []).append(item)
+        if item.year not in self._by_year:
+            insort(self._years, item.year)
+        self._by_year.setdefault(item.year, []).append(item)
+
+        position = len(self.items) - 1
+        self._positions[id(item)] = position
+        for token in set(tokenize(item.title) + tokenize(item.creator) + tokenize(genre or '')):
+            self._postings.setdefault(token, []).append(position)
+        for feature, value in (('type', type(item)), ('genre', genre), ('creator', item.creator)):
+            self._features[feature].append(self._codes.setdefault((feature, value), len(self._codes)))
+        self._features['year'].append(item.year)
+        self._arrays = None
+
+    def _types(self, item_type):
+        return [cls for cls in self._by_type if issubclass(cls, item_type)]
+
+    def find_by_type(self, item_type):
+        return [item for cls in self._types(item_type) for item in self._by_type[cls]]
+
+    def find_by_genre(self, genre, item_type=None):
+        if item_type is None:
+            return list(self._by_genre.get(genre, []))
+        return [
+            item
+            for cls in self._types(item_type)
+            for item in self._by_type_genre.get((cls, genre), [])
+        ]
+
+    def find_by_creator(self, creator):
+        return list(self._by_creator.get(creator, []))
+
+    def find_by_year(self, start, end):
+        # Items from the years start to end inclusive, oldest first
+        low = bisect_left(self._years, start)
+        high = bisect_right(self._years, end)
+        return [item for year in self._years[low:high] for item in self._by_year[year]]
 
     def display_items(self):
         for item in self.items:
@@ -47,21 +172,102 @@ class Library:
 
     def save_to_file(self, filename):
         with open(filename, 'w') as file:
-            json_data = [{'type': type(item).__name__, 'data': item.__dict__} for item in self.items]
+            json_data = [item_to_record(item) for item in self.items]
             json.dump(json_data, file, indent=4)
 
     def load_from_file(self, filename):
         with open(filename, 'r') as file:
             json_data = json.load(file)
             for item_data in json_data:
-                item_class = globals()[item_data['type']]
-                self.add_item(item_class(**item_data['data']))
+                self.add_item(item_from_record(item_data))
+
+    # JSON Lines: one item per line, written and read as a stream. With
+    # append=True only items not yet saved to (or loaded from) the same
+    # file are written, e.g. items the library had before loading it.
+    def save_to_jsonl(self, filename, append=False):
+        start, end = self._saved.get(filename, (0, 0)) if append else (0, 0)
+        with open(filename, 'a' if append else 'w', encoding='utf-8') as file:
+            for item in chain(self.items[:start], self.items[end:]):
+                file.write(json.dumps(item_to_record(item), ensure_ascii=False) + '\n')
+        self._saved[filename] = (0, len(self.items))
+
+    def load_from_jsonl(self, filename):
+        start = len(self.items)
+        for item in iter_items(filename):
+            self.add_item(item)
+        self._saved[filename] = (start, len(self.items))
+
+    def _feature_arrays(self):
+        if self._arrays is None:
+            self._arrays = {feature: np.array(values) for feature, values in self._features.items()}
+            self._posting_arrays = {}
+        return self._arrays
+
+    def _posting_array(self, token):
+        self._feature_arrays()
+        if token not in self._posting_arrays:
+            self._posting_arrays[token] = np.array(self._postings[token], dtype=np.int64)
+        return self._posting_arrays[token]
+
+    def _candidates(self, item_type):
+        candidates = np.ones(len(self.items), dtype=bool)
+        if item_type is not None:
+            codes = [self._codes[('type', cls)] for cls in self._types(item_type)]
+            candidates &= np.isin(self._feature_arrays()['type'], codes)
+        return candidates
+
+    def _top(self, scores, candidates, k):
+        # Selects the k best with argpartition instead of sorting all the
+        # scores, then orders only those k, ties by position
+        positions = np.flatnonzero(candidates)
+        k = min(k, len(positions))
+        if k == 0:
+            return []
+        top = positions[np.argpartition(-scores[positions], k - 1)[:k]]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(float(scores[position]), self.items[position]) for position in top]
+
+    def search(self, query, k=10, item_type=None):
+        """Top k items matching the words of query, as (score, item) pairs.
+
+        Each matched word adds its inverse document frequency, so rare
+        words weigh more than common ones.
+        """
+        tokens = [token for token in set(tokenize(query)) if token in self._postings]
+        if not tokens:
+            return []
+        postings = [self._posting_array(token) for token in tokens]
+        weights = [math.log(1 + len(self.items) / (1 + len(positions))) for positions in postings]
+        scores = np.bincount(
+            np.concatenate(postings),
+            weights=np.repeat(weights, [len(positions) for positions in postings]),
+            minlength=len(self.items),
+        )
+        return self._top(scores, self._candidates(item_type) & (scores > 0), k)
+
+    def recommend(self, like, k=10, item_type=None):
+        """Top k items most similar to the item like, as (score, item) pairs.
+
+        Genre, creator and year proximity are scored for all items at once
+        on feature arrays; like itself is left out.
+        """
+        arrays = self._feature_arrays()
+        # No genre is not a genre in common: code -1 matches no item
+        genre = getattr(like, 'genre', None)
+        genre = -1 if genre is None else self._codes.get(('genre', genre), -1)
+        creator = self._codes.get(('creator', like.creator), -1)
+        scores = (
+            GENRE_WEIGHT * (arrays['genre'] == genre)
+            + CREATOR_WEIGHT * (arrays['creator'] == creator)
+            + YEAR_WEIGHT / (1 + np.abs(arrays['year'] - like.year) / YEAR_SCALE)
+        )
+        candidates = self._candidates(item_type)
+        if id(like) in self._positions:
+            candidates[self._positions[id(like)]] = False
+        return self._top(scores, candidates, k)
 
 def recommend_movies(library, genre):
-    print(f"Movies similar to genre '{genre}':")
-    for item in library.items:
-        if isinstance(item, Movie) and item.genre == genre:
-            print(f"- {item.title} by {item.creator}, {item.year}")
+    return library.find_by_genre(genre, Movie)
 
 # Example usage
 library = Library()
@@ -72,4 +278,7 @@ library.add_item(Movie("Smoleńsk", "Antoni Krauze", 2016, "Mystery", 120))
 
 library.display_items()
 
-recommend_movies(library, "Sci-Fi")
+genre = "Sci-Fi"
+print(f"Movies similar to genre '{genre}':")
+for item in recommend_movies(library, genre):
+    print(f"- {item.title} by {item.creator}, {item.year}")
@@ -0,0 +1,117 @@
+import pytest
+from zadanie_domowe import Book, Item, Library, Movie, iter_items, recommend_movies
+
+
+def make_library():
+    library = Library()
+    library.add_item(Book("Potop", "Henryk Sienkiewicz", 1886, "Historical Novel", "978-3-16-148410-0"))
+    library.add_item(Movie("Seksmisja", "Juliusz Machulski", 1984, "Sci-Fi", 117))
+    library.add_item(Movie("Kongres", "Ari Folman", 2013, "Sci-Fi", 122))
+    library.add_item(Book("Solaris", "Stanisław Lem", 1961, "Sci-Fi", "978-83-08-04991-8"))
+    library.add_item(Item("Kronika", "Anonim", 1984))
+    return library
+
+
+def titles(items):
+    return [item.title for item in items]
+
+
+# Indexed lookups
+def test_find_by_type_and_genre():
+    library = make_library()
+    assert titles(library.find_by_type(Movie)) == ["Seksmisja", "Kongres"]
+    assert len(library.find_by_type(Item)) == 5
+    assert titles(library.find_by_genre("Sci-Fi")) == ["Seksmisja", "Kongres", "Solaris"]
+    assert titles(library.find_by_genre("Sci-Fi", Book)) == ["Solaris"]
+    assert library.find_by_genre("Western") == []
+
+
+def test_find_by_creator_and_year():
+    library = make_library()
+    assert titles(library.find_by_creator("Stanisław Lem")) == ["Solaris"]
+    assert titles(library.find_by_year(1961, 1984)) == ["Solaris", "Seksmisja", "Kronika"]
+    assert library.find_by_year(1700, 1800) == []
+
+
+def test_to_dict_in_definition_order():
+    movie = Movie("Seksmisja", "Juliusz Machulski", 1984, "Sci-Fi", 117)
+    assert list(movie.to_dict()) == ["title", "creator", "year", "genre", "duration"]
+    with pytest.raises(AttributeError):
+        movie.rating = 5
+
+
+# JSON Lines persistence
+def test_jsonl_round_trip_and_append(tmp_path):
+    filename = tmp_path / "library.jsonl"
+    library = make_library()
+    library.save_to_jsonl(filename)
+    library.add_item(Movie("Smoleńsk", "Antoni Krauze", 2016, "Mystery", 120))
+    library.save_to_jsonl(filename, append=True)
+    library.save_to_jsonl(filename, append=True)
+
+    loaded = Library()
+    loaded.load_from_jsonl(filename)
+    assert [item.to_dict() for item in loaded.items] == [item.to_dict() for item in library.items]
+    assert [type(item) for item in loaded.items] == [type(item) for item in library.items]
+    assert titles(iter_items(filename, Movie)) == ["Seksmisja", "Kongres", "Smoleńsk"]
+
+
+def test_append_after_load_into_non_empty_library(tmp_path):
+    filename = tmp_path / "library.jsonl"
+    stored = Library()
+    stored.add_item(Item("A", "X", 2000))
+    stored.add_item(Item("B", "X", 2001))
+    stored.save_to_jsonl(filename)
+
+    library = Library()
+    library.add_item(Item("N", "Y", 2002))
+    library.load_from_jsonl(filename)
+    library.save_to_jsonl(filename, append=True)
+    assert titles(iter_items(filename)) == ["A", "B", "N"]
+
+    library.add_item(Item("M", "Y", 2003))
+    library.save_to_jsonl(filename, append=True)
+    assert titles(iter_items(filename)) == ["A", "B", "N", "M"]
+
+
+def test_unknown_item_type(tmp_path):
+    filename = tmp_path / "library.jsonl"
+    filename.write_text('{"type": "Painting", "data": {}}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Painting"):
+        Library().load_from_jsonl(filename)
+
+
+# Ranked search and recommendations
+def test_search_ranks_rare_words_first():
+    library = make_library()
+    results = library.search("sci-fi lem")
+    assert titles(item for _, item in results)[0] == "Solaris"
+    assert len(results) == 3
+    assert titles(item for _, item in library.search("sci-fi", item_type=Book)) == ["Solaris"]
+    assert library.search("western") == []
+    assert len(library.search("sci-fi", k=1)) == 1
+
+
+def test_recommend_by_genre_creator_and_year():
+    library = make_library()
+    seksmisja = library.items[1]
+    results = library.recommend(seksmisja, k=2)
+    assert titles(item for _, item in results) == ["Solaris", "Kongres"]
+    assert seksmisja not in [item for _, item in library.recommend(seksmisja)]
+    assert titles(item for _, item in library.recommend(seksmisja, item_type=Movie)) == ["Kongres"]
+
+
+def test_recommend_without_genre_gives_no_genre_bonus():
+    library = make_library()
+    library.add_item(Item("Kronika II", "Anonim", 1990))
+    like = Item("Latopis", "Nestor", 1984)
+    scores = {item.title: score for score, item in library.recommend(like)}
+    assert scores["Kronika"] == scores["Seksmisja"] == 1.0
+    assert scores["Kronika II"] < 1.0
+
+
+def test_recommend_movies_returns_list():
+    library = make_library()
+    movies = recommend_movies(library, "Sci-Fi")
+    assert isinstance(movies, list)
+    assert titles(movies) == ["Seksmisja", "Kongres"]